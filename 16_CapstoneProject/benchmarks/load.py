@@ -0,0 +1,174 @@
+import argparse
+import http.client
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+from urllib.parse import quote, urlsplit
+
+from app.config import Settings
+from app.server import create_server
+from app.sessions import read_session
+from benchmarks.seed import seed_vault, temporary_vault
+
+DEFAULT_CONCURRENCY = (1, 4, 16, 64)
+DEFAULT_REQUESTS = 200
+
+
+def _percentile(latencies: List[float], percentile: float) -> float:
+    index = min(len(latencies) - 1, int(round(percentile / 100 * (len(latencies) - 1))))
+    return latencies[index]
+
+
+def _client(
+    host: str,
+    port: int,
+    path: str,
+    token: str,
+    count: int,
+    latencies: List[float],
+    errors: List[int],
+) -> None:
+    # One keep-alive connection per simulated client.
+    connection = http.client.HTTPConnection(host, port)
+    headers = {"Authorization": f"Bearer {token}"}
+    try:
+        for _ in range(count):
+            started = time.perf_counter()
+            connection.request("GET", path, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            latencies.append(time.perf_counter() - started)
+            if response.status != 200:
+                errors.append(response.status)
+    finally:
+        connection.close()
+
+
+def run_load_test(
+    url: str,
+    token: str,
+    path: str,
+    concurrency_levels: Sequence[int] = DEFAULT_CONCURRENCY,
+    requests_per_client: int = DEFAULT_REQUESTS,
+) -> List[Dict]:
+    address = urlsplit(url)
+    results = []
+    for concurrency in concurrency_levels:
+        latencies: List[float] = []
+        errors: List[int] = []
+        clients = [
+            threading.Thread(
+                target=_client,
+                args=(
+                    address.hostname,
+                    address.port,
+                    path,
+                    token,
+                    requests_per_client,
+                    latencies,
+                    errors,
+                ),
+            )
+            for _ in range(concurrency)
+        ]
+        started = time.perf_counter()
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+        seconds = time.perf_counter() - started
+
+        latencies.sort()
+        results.append(
+            {
+                "concurrency": concurrency,
+                "requests": len(latencies),
+                "errors": len(errors),
+                "seconds": seconds,
+                "requests_per_second": len(latencies) / seconds,
+                "p50_ms": _percentile(latencies, 50) * 1000,
+                "p99_ms": _percentile(latencies, 99) * 1000,
+            }
+        )
+    return results
+
+
+def _first_title(database_path: str) -> str:
+    with sqlite3.connect(database_path) as connection:
+        (title,) = connection.execute(
+            "SELECT title FROM passwords ORDER BY id"
+        ).fetchone()
+    return title
+
+
+def run_local_load_test(
+    rows: int,
+    concurrency_levels: Sequence[int] = DEFAULT_CONCURRENCY,
+    requests_per_client: int = DEFAULT_REQUESTS,
+    path: Optional[str] = None,
+) -> Dict:
+    # Seeds a temporary vault, serves it on a free port and benchmarks it.
+    with temporary_vault() as database_path:
+        seed_vault(database_path, users=1, passwords_per_user=rows)
+        token = read_session(Settings(database_path=database_path))["token"]
+        path = path or f"/passwords/{quote(_first_title(database_path), safe='')}"
+
+        server = create_server(port=0)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            results = run_load_test(
+                f"http://127.0.0.1:{server.server_port}",
+                token,
+                path,
+                concurrency_levels,
+                requests_per_client,
+            )
+        finally:
+            server.shutdown()
+            server.server_close()
+    return {"rows": rows, "path": path, "results": results}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Lasttest für 'serve'")
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument(
+        "--concurrency",
+        default=",".join(str(level) for level in DEFAULT_CONCURRENCY),
+        help="Kommagetrennte Anzahl paralleler Clients",
+    )
+    parser.add_argument("--requests", type=int, default=DEFAULT_REQUESTS)
+    parser.add_argument("--path", help="Pfad, z.B. /passwords oder /search?q=mail")
+    parser.add_argument("--url", help="Laufenden Server testen statt eines Testtresors")
+    parser.add_argument("--token")
+    parser.add_argument("--output", default="load_results.json")
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.concurrency.split(",")]
+    if args.url:
+        report = {
+            "url": args.url,
+            "path": args.path,
+            "results": run_load_test(
+                args.url, args.token, args.path or "/passwords", levels, args.requests
+            ),
+        }
+    else:
+        report = run_local_load_test(args.rows, levels, args.requests, args.path)
+    with open(args.output, "w") as output:
+        json.dump(report, output, indent=2)
+
+    for result in report["results"]:
+        print(
+            f"{result['concurrency']:4} Clients: "
+            f"{result['requests_per_second']:9.0f} req/s"
+            f"  p50 {result['p50_ms']:7.2f} ms  p99 {result['p99_ms']:7.2f} ms"
+            f"  Fehler {result['errors']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
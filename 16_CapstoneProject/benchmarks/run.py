@@ -0,0 +1,155 @@
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import time
+from typing import Callable, Dict, List
+
+from typer.testing import CliRunner
+
+from app.cli import app
+from benchmarks.seed import MASTER_PASSWORD, seed_vault, temporary_vault
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+IMPORT_ROWS = 1000
+
+runner = CliRunner()
+
+
+def _invoke(args: List[str], input: str = None) -> None:
+    result = runner.invoke(app, args, input=input)
+    if result.exit_code != 0:
+        raise RuntimeError(f"{args} fehlgeschlagen: {result.output}")
+
+
+def _time(action: Callable[[int], None], repeats: int) -> Dict[str, float]:
+    timings = []
+    for repeat in range(repeats):
+        started = time.perf_counter()
+        action(repeat)
+        timings.append(time.perf_counter() - started)
+    return {
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "max": max(timings),
+        "repeats": repeats,
+    }
+
+
+def _write_import_file(path: str, size: int) -> None:
+    with open(path, "w") as import_file:
+        import_file.write("title,username,password\n")
+        for number in range(IMPORT_ROWS):
+            import_file.write(f"import-{size}-{number},user{number},pw{number}\n")
+
+
+def _commands(workdir: str, size: int) -> Dict[str, Callable[[int], None]]:
+    import_file = os.path.join(workdir, "import.csv")
+    _write_import_file(import_file, size)
+    return {
+        "login": lambda repeat: _invoke(["login"], input=f"user0\n{MASTER_PASSWORD}\n"),
+        "create_password": lambda repeat: _invoke(
+            ["create_password"], input=f"bench-{repeat}\nbench\nsecret\n"
+        ),
+        "get_passwords": lambda repeat: _invoke(["get_passwords"]),
+        "get_passwords_masked": lambda repeat: _invoke(["get_passwords", "--masked"]),
+        "get_passwords_jsonl": lambda repeat: _invoke(
+            ["get_passwords", "--format", "jsonl"]
+        ),
+        "show": lambda repeat: _invoke(["show", f"bench-{repeat}"]),
+        "show_fuzzy": lambda repeat: _invoke(["show", f"bnech-{repeat}", "--fuzzy"]),
+        "search": lambda repeat: _invoke(["search", "bank"]),
+        "search_prefix": lambda repeat: _invoke(["search", "mail-", "--prefix"]),
+        "update_password": lambda repeat: _invoke(
+            ["update_password"], input=f"bench-{repeat}\nbench2\nsecret2\n"
+        ),
+        "delete_password": lambda repeat: _invoke(
+            ["delete_password"], input=f"bench-{repeat}\n"
+        ),
+        # The first run imports all rows, later runs measure the conflict path.
+        "import": lambda repeat: _invoke(["import", import_file]),
+        "export": lambda repeat: _invoke(["export", "--output", os.devnull]),
+    }
+
+
+def run_benchmarks(
+    sizes=DEFAULT_SIZES, users: int = 1, repeats: int = 3, workers: int = 0
+) -> Dict:
+    results = []
+    for size in sizes:
+        with temporary_vault() as database_path:
+            workdir = os.path.dirname(database_path)
+            with open(os.path.join(workdir, ".env"), "w") as env_file:
+                env_file.write(f"FERNET_KEY={os.environ['FERNET_KEY']}\n")
+
+            started = time.perf_counter()
+            seed_vault(database_path, users, max(size // users, 1), workers=workers)
+            seed_seconds = time.perf_counter() - started
+
+            cwd = os.getcwd()
+            os.chdir(workdir)
+            try:
+                timings = {
+                    name: _time(action, repeats)
+                    for name, action in _commands(workdir, size).items()
+                }
+            finally:
+                os.chdir(cwd)
+
+            results.append(
+                {
+                    "rows": size,
+                    "users": users,
+                    "seed_seconds": seed_seconds,
+                    "database_bytes": os.path.getsize(database_path),
+                    "commands": timings,
+                }
+            )
+    return {"environment": _environment(), "results": results}
+
+
+def _environment() -> Dict[str, str]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = ""
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmarks für alle Befehle")
+    parser.add_argument(
+        "--sizes",
+        default=",".join(str(size) for size in DEFAULT_SIZES),
+        help="Kommagetrennte Anzahl Passwörter, z.B. 1000,10000,1000000",
+    )
+    parser.add_argument("--users", type=int, default=1)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=0)
+    parser.add_argument("--output", default="benchmark_results.json")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    report = run_benchmarks(sizes, args.users, args.repeats, args.workers)
+    with open(args.output, "w") as output:
+        json.dump(report, output, indent=2)
+
+    for result in report["results"]:
+        print(f"{result['rows']} Zeilen:")
+        for name, timing in result["commands"].items():
+            print(f"  {name:22} {timing['median'] * 1000:10.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+import argparse
+import os
+import random
+import string
+import tempfile
+from contextlib import contextmanager
+from itertools import islice
+from typing import Iterator, List, Tuple
+
+from cryptography.fernet import Fernet
+from sqlalchemy import insert
+
+from app.config import Settings, reset_settings
+from app.database import (Base, Password, User, create_db_engine, reset_engine,
+                          start_session)
+from app.hashing import hash_password
+from app.utils import encrypt_many, reset_cipher
+
+MASTER_PASSWORD = "benchmark"
+SERVICES = ("mail", "bank", "shop", "forum", "cloud", "vpn", "git", "chat")
+CHUNK_SIZE = 5000
+
+
+def _random_word(rng: random.Random, length: int) -> str:
+    return "".join(rng.choice(string.ascii_lowercase) for _ in range(length))
+
+
+def generate_entries(rng: random.Random, count: int) -> Iterator[Tuple[str, str, str]]:
+    for number in range(count):
+        service = rng.choice(SERVICES)
+        title = f"{service}-{_random_word(rng, 6)}-{number}"
+        username = f"{_random_word(rng, 8)}@example.com"
+        password = _random_word(rng, 16)
+        yield title, username, password
+
+
+def _chunks(iterable, size: int) -> Iterator[List]:
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _reset_caches() -> None:
+    reset_engine()
+    reset_settings()
+    reset_cipher()
+
+
+@contextmanager
+def temporary_vault() -> Iterator[str]:
+    # Points the key, the database and the session file at a temporary
+    # directory and restores the caller's environment afterwards.
+    saved = dict(os.environ)
+    with tempfile.TemporaryDirectory() as workdir:
+        database_path = os.path.join(workdir, "app.db")
+        os.environ.update(
+            FERNET_KEY=Fernet.generate_key().decode(),
+            PM_DATABASE_PATH=database_path,
+            PM_SESSION_DIR=os.path.join(workdir, "sessions"),
+        )
+        _reset_caches()
+        try:
+            yield database_path
+        finally:
+            os.environ.clear()
+            os.environ.update(saved)
+            _reset_caches()
+
+
+def seed_vault(
+    database_path: str,
+    users: int,
+    passwords_per_user: int,
+    seed: int = 42,
+    workers: int = 0,
+) -> None:
+    # All users share MASTER_PASSWORD (hashed once); the first user gets a
+    # session so protected commands can run right away.
+    rng = random.Random(seed)
+    settings = Settings(database_path=database_path)
+    engine = create_db_engine(settings)
+    Base.metadata.create_all(bind=engine)
+    hashed_password = hash_password(MASTER_PASSWORD)
+
+    with engine.begin() as connection:
+        connection.execute(
+            insert(User),
+            [
+                {"username": f"user{number}", "hashed_password": hashed_password}
+                for number in range(users)
+            ],
+        )
+        user_ids = [row.id for row in connection.execute(User.__table__.select())]
+        start_session(connection, user_ids[0], settings)
+
+    for user_id in user_ids:
+        entries = generate_entries(rng, passwords_per_user)
+        for chunk in _chunks(entries, CHUNK_SIZE):
+            encrypted_passwords = encrypt_many(
+                [password for _, _, password in chunk],
+                workers=workers,
+                use_processes=True,
+            )
+            with engine.begin() as connection:
+                connection.execute(
+                    insert(Password),
+                    [
+                        {
+                            "title": title,
+                            "username": username,
+                            "encrypted_password": encrypted_password,
+                            "user_id": user_id,
+                        }
+                        for (title, username, _), encrypted_password in zip(
+                            chunk, encrypted_passwords
+                        )
+                    ],
+                )
+    engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Synthetischen Tresor erzeugen")
+    parser.add_argument("database_path")
+    parser.add_argument("--users", type=int, default=1)
+    parser.add_argument("--passwords-per-user", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=0)
+    args = parser.parse_args()
+    seed_vault(
+        args.database_path, args.users, args.passwords_per_user, args.seed, args.workers
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import time
+from typing import Dict, List, Sequence
+
+from app.config import Settings, reset_settings
+from app.database import get_db_session, reset_engine
+from app.sessions import read_session
+from app.utils import reset_cipher
+from app.vault import DatabaseBusyError, Vault
+from benchmarks.seed import seed_vault, temporary_vault
+
+DEFAULT_PROCESSES = (1, 2, 4, 8)
+DEFAULT_OPERATIONS = 200
+# Relative weights of the operations each worker runs.
+MIX = {"create": 3, "update": 3, "delete": 1, "get": 2, "list": 1}
+WRITES = ("create", "update", "delete")
+
+
+def _percentile(latencies: List[float], percentile: float) -> float:
+    if not latencies:
+        return 0.0
+    index = min(len(latencies) - 1, int(round(percentile / 100 * (len(latencies) - 1))))
+    return latencies[index]
+
+
+def _worker(
+    number: int, user_id: int, operations: int, start, results: multiprocessing.Queue
+) -> None:
+    # Every process opens its own engine; nothing is shared with the parent.
+    reset_settings()
+    reset_engine()
+    reset_cipher()
+    rng = random.Random(number)
+    own_titles: List[str] = []
+    counts = {"operations": 0, "writes": 0, "busy": 0, "errors": 0}
+    latencies: List[float] = []
+    names, weights = zip(*MIX.items())
+
+    start.wait()
+    with get_db_session() as db:
+        vault = Vault(db, user_id)
+        for index in range(operations):
+            operation = rng.choices(names, weights)[0]
+            if operation in ("update", "delete", "get") and not own_titles:
+                operation = "create"
+            started = time.perf_counter()
+            try:
+                if operation == "create":
+                    title = f"stress-{number}-{index}"
+                    vault.create(title, f"user{number}", f"pw-{index}")
+                    own_titles.append(title)
+                elif operation == "update":
+                    vault.update(rng.choice(own_titles), f"user{number}", f"pw-{index}")
+                elif operation == "delete":
+                    vault.delete(own_titles.pop(rng.randrange(len(own_titles))))
+                elif operation == "get":
+                    vault.get(rng.choice(own_titles))
+                else:
+                    vault.list(masked=True)
+                # End the read transaction like a CLI process would on exit.
+                db.rollback()
+            except DatabaseBusyError:
+                counts["busy"] += 1
+                continue
+            except Exception:
+                db.rollback()
+                counts["errors"] += 1
+                continue
+            finally:
+                latencies.append(time.perf_counter() - started)
+            counts["operations"] += 1
+            counts["writes"] += operation in WRITES
+    results.put((counts, latencies))
+
+
+def run_stress_test(
+    database_path: str,
+    user_id: int,
+    process_counts: Sequence[int] = DEFAULT_PROCESSES,
+    operations: int = DEFAULT_OPERATIONS,
+) -> List[Dict]:
+    # Each level starts N processes at once against the same database file.
+    report = []
+    for processes in process_counts:
+        results = multiprocessing.Queue()
+        start = multiprocessing.Event()
+        workers = [
+            multiprocessing.Process(
+                target=_worker, args=(number, user_id, operations, start, results)
+            )
+            for number in range(processes)
+        ]
+        for worker in workers:
+            worker.start()
+        started = time.perf_counter()
+        start.set()
+        collected = [results.get() for _ in workers]
+        seconds = time.perf_counter() - started
+        for worker in workers:
+            worker.join()
+
+        totals = {"operations": 0, "writes": 0, "busy": 0, "errors": 0}
+        latencies: List[float] = []
+        for counts, worker_latencies in collected:
+            for name in totals:
+                totals[name] += counts[name]
+            latencies.extend(worker_latencies)
+        latencies.sort()
+        report.append(
+            {
+                "processes": processes,
+                **totals,
+                "failures": totals["busy"] + totals["errors"],
+                "seconds": seconds,
+                "operations_per_second": totals["operations"] / seconds,
+                "writes_per_second": totals["writes"] / seconds,
+                "p50_ms": _percentile(latencies, 50) * 1000,
+                "p99_ms": _percentile(latencies, 99) * 1000,
+            }
+        )
+        _clear(database_path)
+    return report
+
+
+def _clear(database_path: str) -> None:
+    # Every level starts from the seeded vault.
+    with sqlite3.connect(database_path) as connection:
+        connection.execute("DELETE FROM passwords WHERE title LIKE 'stress-%'")
+
+
+def run_local_stress_test(
+    rows: int,
+    process_counts: Sequence[int] = DEFAULT_PROCESSES,
+    operations: int = DEFAULT_OPERATIONS,
+) -> Dict:
+    with temporary_vault() as database_path:
+        seed_vault(database_path, users=1, passwords_per_user=rows)
+        user_id = read_session(Settings(database_path=database_path))["user_id"]
+        results = run_stress_test(database_path, user_id, process_counts, operations)
+    return {"rows": rows, "operations_per_process": operations, "results": results}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Mehrere Prozesse schreiben gleichzeitig in einen Tresor"
+    )
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument(
+        "--processes",
+        default=",".join(str(count) for count in DEFAULT_PROCESSES),
+        help="Kommagetrennte Anzahl paralleler Prozesse",
+    )
+    parser.add_argument("--operations", type=int, default=DEFAULT_OPERATIONS)
+    parser.add_argument(
+        "--retries",
+        type=int,
+        help="Wiederholungen gesperrter Schreibvorgänge (write_retries)",
+    )
+    parser.add_argument(
+        "--busy-timeout", type=int, help="busy_timeout in Millisekunden"
+    )
+    parser.add_argument("--output", default="stress_results.json")
+    args = parser.parse_args()
+
+    if args.retries is not None:
+        os.environ["PM_WRITE_RETRIES"] = str(args.retries)
+    if args.busy_timeout is not None:
+        os.environ["PM_BUSY_TIMEOUT"] = str(args.busy_timeout)
+
+    report = run_local_stress_test(
+        args.rows, [int(count) for count in args.processes.split(",")], args.operations
+    )
+    with open(args.output, "w") as output:
+        json.dump(report, output, indent=2)
+
+    for result in report["results"]:
+        print(
+            f"{result['processes']:4} Prozesse: "
+            f"{result['operations_per_second']:8.0f} Ops/s"
+            f"  {result['writes_per_second']:8.0f} Schreibvorgänge/s"
+            f"  p99 {result['p99_ms']:7.2f} ms"
+            f"  gesperrt {result['busy']}  Fehler {result['errors']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,4 @@
+import time
+
+# Reference point for the "startup" phase reported by --profile.
+STARTED = time.perf_counter()
@@ -0,0 +1,258 @@
+import json
+import os
+import socket
+import socketserver
+import sqlite3
+import struct
+import tempfile
+import threading
+from fnmatch import fnmatchcase
+from typing import Dict, List, Optional, Tuple
+
+from app.output import MASKED_PASSWORD
+
+# This module is imported by every CLI call to look for a running agent, so
+# the client side only uses the standard library. The server imports the
+# vault, database and cipher modules when it starts.
+
+SOCKET_ENV = "PM_AGENT_SOCKET"
+
+
+def socket_path() -> str:
+    return os.environ.get(SOCKET_ENV) or os.path.join(
+        tempfile.gettempdir(), f"password-manager-{os.getuid()}", "agent.sock"
+    )
+
+
+class AgentClient:
+    def __init__(self, sock: socket.socket):
+        self._sock = sock
+        self._file = sock.makefile("rwb")
+
+    def request(self, op: str, **params) -> dict:
+        self._file.write(json.dumps({"op": op, **params}).encode() + b"\n")
+        self._file.flush()
+        line = self._file.readline()
+        if not line:
+            return {"ok": False, "error": "disconnected"}
+        return json.loads(line)
+
+    def close(self) -> None:
+        self._file.close()
+        self._sock.close()
+
+    def __enter__(self) -> "AgentClient":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def get_client(path: Optional[str] = None) -> Optional[AgentClient]:
+    path = path or socket_path()
+    if not os.path.exists(path):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        return None
+    return AgentClient(sock)
+
+
+def _ok(result=None) -> dict:
+    return {"ok": True, "result": result}
+
+
+def _error(error: str, suggestions: Optional[List[str]] = None) -> dict:
+    if suggestions:
+        return {"ok": False, "error": error, "suggestions": suggestions}
+    return {"ok": False, "error": error}
+
+
+class VaultAgent:
+    def __init__(self):
+        from app.config import get_settings
+        from app.database import get_sessionmaker
+        from app.utils import get_cipher
+
+        get_cipher()
+        self._sessionmaker = get_sessionmaker()
+        self._lock = threading.Lock()
+        # user_id -> {title: (username, encrypted_password)}
+        self._index: Dict[int, Dict[str, Tuple[str, str]]] = {}
+        # PRAGMA data_version changes whenever another connection commits, so
+        # writes that bypass the agent invalidate the index.
+        self._version_connection = sqlite3.connect(
+            get_settings().database_path, check_same_thread=False
+        )
+        self._data_version = None
+
+    def _entries(self, db, user_id: int) -> Dict[str, Tuple[str, str]]:
+        from app.database import Password
+
+        with self._lock:
+            data_version = self._version_connection.execute(
+                "PRAGMA data_version"
+            ).fetchone()[0]
+            if data_version != self._data_version:
+                self._index.clear()
+                self._data_version = data_version
+            if user_id not in self._index:
+                rows = (
+                    db.query(
+                        Password.title, Password.username, Password.encrypted_password
+                    )
+                    .filter(Password.user_id == user_id)
+                    .order_by(Password.id)
+                )
+                self._index[user_id] = {
+                    row.title: (row.username, row.encrypted_password) for row in rows
+                }
+            return self._index[user_id]
+
+    def _invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._index.pop(user_id, None)
+
+    def handle(self, request: dict) -> dict:
+        from app.vault import Vault, VaultError
+
+        op = request.get("op")
+        if op == "ping":
+            return _ok("pong")
+
+        with self._sessionmaker() as db:
+            handler = getattr(self, f"_op_{op}", None)
+            try:
+                vault = Vault.open(db)
+                if handler is None:
+                    return _error("unknown_op")
+                return handler(vault, request)
+            except VaultError as error:
+                return _error(error.code, getattr(error, "suggestions", None))
+
+    def _op_whoami(self, vault, request: dict) -> dict:
+        return _ok(vault.user_id)
+
+    def _op_exists(self, vault, request: dict) -> dict:
+        return _ok(request["title"] in self._entries(vault.db, vault.user_id))
+
+    def _op_get(self, vault, request: dict) -> dict:
+        from app.utils import decrypt_password
+
+        entries = self._entries(vault.db, vault.user_id)
+        title = request["title"]
+        if title not in entries:
+            suggestions = vault.suggest(title)
+            if not (request.get("fuzzy") and suggestions):
+                return _error("not_found", suggestions)
+            title = suggestions[0]
+        username, encrypted_password = entries[title]
+        return _ok([title, username, decrypt_password(encrypted_password)])
+
+    def _op_suggest(self, vault, request: dict) -> dict:
+        return _ok(vault.suggest(request["title"]))
+
+    def _op_list(self, vault, request: dict) -> dict:
+        from app.utils import decrypt_many
+
+        entries = self._entries(vault.db, vault.user_id)
+        reveal = request.get("reveal")
+        if request.get("masked") or reveal is not None:
+            pattern = (reveal or "").lower()
+            revealed = [
+                title
+                for title in entries
+                if reveal is not None and fnmatchcase(title.lower(), pattern)
+            ]
+        else:
+            revealed = list(entries)
+        passwords = dict(
+            zip(revealed, decrypt_many([entries[title][1] for title in revealed]))
+        )
+        return _ok(
+            [
+                [title, username, passwords.get(title, MASKED_PASSWORD)]
+                for title, (username, _) in entries.items()
+            ]
+        )
+
+    def _op_create(self, vault, request: dict) -> dict:
+        vault.create(request["title"], request["username"], request["password"])
+        self._invalidate(vault.user_id)
+        return _ok()
+
+    def _op_update(self, vault, request: dict) -> dict:
+        if request["title"] not in self._entries(vault.db, vault.user_id):
+            return _error("not_found", vault.suggest(request["title"]))
+        vault.update(request["title"], request["username"], request["password"])
+        self._invalidate(vault.user_id)
+        return _ok()
+
+    def _op_delete(self, vault, request: dict) -> dict:
+        vault.delete(request["title"])
+        self._invalidate(vault.user_id)
+        return _ok()
+
+
+class _AgentHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+            except ValueError:
+                response = _error("invalid_request")
+            else:
+                if request.get("op") == "shutdown":
+                    self._send(_ok())
+                    threading.Thread(target=self.server.shutdown).start()
+                    return
+                try:
+                    response = self.server.agent.handle(request)
+                except KeyError as missing:
+                    response = _error(f"missing_parameter: {missing}")
+            self._send(response)
+
+    def _send(self, response: dict) -> None:
+        self.wfile.write(json.dumps(response).encode() + b"\n")
+        self.wfile.flush()
+
+
+class AgentServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str, agent: VaultAgent):
+        self.agent = agent
+        super().__init__(path, _AgentHandler)
+
+    def verify_request(self, request, client_address) -> bool:
+        if not hasattr(socket, "SO_PEERCRED"):
+            return True
+        credentials = request.getsockopt(
+            socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i")
+        )
+        _, uid, _ = struct.unpack("3i", credentials)
+        return uid == os.getuid()
+
+
+def create_server(path: Optional[str] = None) -> AgentServer:
+    path = path or socket_path()
+    os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+    if os.path.exists(path):
+        os.unlink(path)
+    server = AgentServer(path, VaultAgent())
+    os.chmod(path, 0o600)
+    return server
+
+
+def serve(path: Optional[str] = None) -> None:
+    path = path or socket_path()
+    server = create_server(path)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(path):
+            os.unlink(path)
@@ -0,0 +1,339 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+from cryptography.fernet import InvalidToken
+
+from app.database import CHANGELOG_TABLES, unpack_token
+from app.utils import decrypt_many
+
+# Backups are plain SQLite files. A full backup is a page-stepped copy made
+# with the sqlite3 backup API; an incremental backup holds the current state
+# of every users/passwords row changed since the previous backup plus the ids
+# of deleted rows. Both carry a backup_meta row describing where they fit in
+# the chain.
+
+BACKUP_PAGES = 256
+# Pause between backup steps so other connections can take the write lock.
+BACKUP_SLEEP = 0.005
+FULL = "full"
+INCREMENTAL = "incremental"
+ID_CHUNK_SIZE = 500
+# Tables that are copied from snapshot to live database but reflect the
+# backup history of the snapshot, not of the restored database.
+RESET_ON_RESTORE = ("backup_runs", "changelog")
+# Passwords trial-decrypted before a restore replaces the live database.
+DECRYPT_SAMPLE = 100
+
+
+class BackupError(Exception):
+    pass
+
+
+@dataclass
+class BackupResult:
+    kind: str
+    path: str
+    seq: int
+    rows: Dict[str, int] = field(default_factory=dict)
+    seconds: float = 0.0
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    connection = sqlite3.connect(path, isolation_level=None)
+    connection.row_factory = sqlite3.Row
+    return connection
+
+
+def _scalar(connection: sqlite3.Connection, statement: str, *parameters):
+    return connection.execute(statement, parameters).fetchone()[0]
+
+
+def _columns(
+    connection: sqlite3.Connection, table: str, schema: str = "main"
+) -> List[str]:
+    return [
+        row["name"]
+        for row in connection.execute(f"PRAGMA {schema}.table_info({table})")
+    ]
+
+
+def _counts(connection: sqlite3.Connection) -> Dict[str, int]:
+    return {
+        table: _scalar(connection, f"SELECT COUNT(*) FROM {table}")
+        for table in CHANGELOG_TABLES
+    }
+
+
+def _write_meta(
+    connection: sqlite3.Connection,
+    kind: str,
+    base_seq: Optional[int],
+    seq: int,
+    counts: Dict[str, int],
+) -> None:
+    connection.execute(
+        "CREATE TABLE backup_meta (kind TEXT, base_seq INTEGER, seq INTEGER, "
+        "created_at REAL, users INTEGER, passwords INTEGER)"
+    )
+    connection.execute(
+        "INSERT INTO backup_meta VALUES (?, ?, ?, ?, ?, ?)",
+        (kind, base_seq, seq, time.time(), counts["users"], counts["passwords"]),
+    )
+
+
+def read_meta(connection: sqlite3.Connection) -> sqlite3.Row:
+    try:
+        return connection.execute("SELECT * FROM backup_meta").fetchone()
+    except sqlite3.DatabaseError as error:
+        raise BackupError(f"Keine gültige Sicherung: {error}") from error
+
+
+def verify(connection: sqlite3.Connection) -> None:
+    problems = [row[0] for row in connection.execute("PRAGMA integrity_check")]
+    if problems != ["ok"]:
+        raise BackupError("Integritätsprüfung fehlgeschlagen: " + "; ".join(problems))
+    if connection.execute("PRAGMA foreign_key_check").fetchone() is not None:
+        raise BackupError("Fremdschlüsselprüfung fehlgeschlagen.")
+
+
+def check_decryptable(
+    connection: sqlite3.Connection, sample: int = DECRYPT_SAMPLE
+) -> None:
+    # A backup from before a key rotation needs the old key in
+    # FERNET_PREVIOUS_KEYS; without it the restored vault is unreadable.
+    tokens = [
+        unpack_token(value) if isinstance(value, bytes) else value
+        for (value,) in connection.execute(
+            "SELECT encrypted_password FROM passwords ORDER BY id LIMIT ?", (sample,)
+        )
+    ]
+    try:
+        decrypt_many(tokens)
+    except InvalidToken:
+        raise BackupError(
+            "Die Passwörter lassen sich mit den aktuellen Schlüsseln nicht "
+            "entschlüsseln. Fehlt ein alter Schlüssel in FERNET_PREVIOUS_KEYS?"
+        ) from None
+
+
+def _record_run(connection: sqlite3.Connection, kind: str, path: str, seq: int) -> None:
+    connection.execute(
+        "INSERT INTO backup_runs (kind, path, seq, created_at) VALUES (?, ?, ?, ?)",
+        (kind, os.path.abspath(path), seq, time.time()),
+    )
+
+
+def full_backup(
+    database_path: str,
+    target: str,
+    pages: int = BACKUP_PAGES,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> BackupResult:
+    started = time.perf_counter()
+    partial = f"{target}.part"
+    if os.path.exists(partial):
+        os.unlink(partial)
+
+    source = _connect(database_path)
+    destination = _connect(partial)
+    try:
+        source.backup(
+            destination,
+            pages=pages,
+            sleep=BACKUP_SLEEP,
+            progress=(
+                lambda status, remaining, total: progress(total - remaining, total)
+            )
+            if progress
+            else None,
+        )
+        # The copy is consistent, so its changelog tells exactly which changes
+        # it contains.
+        seq = _scalar(destination, "SELECT COALESCE(MAX(seq), 0) FROM changelog")
+        counts = _counts(destination)
+        _write_meta(destination, FULL, None, seq, counts)
+        verify(destination)
+        destination.close()
+        os.replace(partial, target)
+
+        # Changes up to seq are in the full backup, every restore starts there.
+        source.execute("BEGIN IMMEDIATE")
+        source.execute("DELETE FROM changelog WHERE seq <= ?", (seq,))
+        _record_run(source, FULL, target, seq)
+        source.execute("COMMIT")
+    finally:
+        destination.close()
+        source.close()
+    return BackupResult(FULL, target, seq, counts, time.perf_counter() - started)
+
+
+def _chunks(items: Sequence[int], size: int) -> Iterable[Sequence[int]]:
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def incremental_backup(database_path: str, target: str) -> BackupResult:
+    started = time.perf_counter()
+    source = _connect(database_path)
+    try:
+        previous = source.execute(
+            "SELECT seq FROM backup_runs ORDER BY id DESC LIMIT 1"
+        ).fetchone()
+        if previous is None:
+            raise BackupError(
+                "Keine vorherige Sicherung gefunden. Bitte zuerst eine vollständige "
+                "Sicherung erstellen."
+            )
+        base_seq = previous["seq"]
+
+        partial = f"{target}.part"
+        if os.path.exists(partial):
+            os.unlink(partial)
+        destination = _connect(partial)
+        try:
+            # One read transaction, so the delta is a consistent snapshot.
+            source.execute("BEGIN")
+            seq = _scalar(
+                source, "SELECT COALESCE(MAX(seq), ?) FROM changelog", base_seq
+            )
+            destination.execute("BEGIN")
+            destination.execute(
+                "CREATE TABLE deleted (table_name TEXT, row_id INTEGER)"
+            )
+            rows = {}
+            for table in CHANGELOG_TABLES:
+                changed = [
+                    row["row_id"]
+                    for row in source.execute(
+                        "SELECT DISTINCT row_id FROM changelog "
+                        "WHERE table_name = ? AND seq > ? AND seq <= ? ORDER BY row_id",
+                        (table, base_seq, seq),
+                    )
+                ]
+                columns = _columns(source, table)
+                destination.execute(f"CREATE TABLE {table} ({', '.join(columns)})")
+                copied = set()
+                for ids in _chunks(changed, ID_CHUNK_SIZE):
+                    placeholders = ", ".join("?" * len(ids))
+                    selected = source.execute(
+                        f"SELECT {', '.join(columns)} FROM {table} "
+                        f"WHERE id IN ({placeholders})",
+                        ids,
+                    ).fetchall()
+                    destination.executemany(
+                        f"INSERT INTO {table} VALUES ({', '.join('?' * len(columns))})",
+                        [tuple(row) for row in selected],
+                    )
+                    copied.update(row["id"] for row in selected)
+                destination.executemany(
+                    "INSERT INTO deleted VALUES (?, ?)",
+                    [(table, row_id) for row_id in changed if row_id not in copied],
+                )
+                rows[table] = len(changed)
+            _write_meta(destination, INCREMENTAL, base_seq, seq, _counts(source))
+            destination.execute("COMMIT")
+            source.execute("COMMIT")
+        finally:
+            destination.close()
+        os.replace(partial, target)
+
+        _record_run(source, INCREMENTAL, target, seq)
+    finally:
+        source.close()
+    return BackupResult(INCREMENTAL, target, seq, rows, time.perf_counter() - started)
+
+
+def _apply_delta(connection: sqlite3.Connection, delta_path: str) -> None:
+    connection.execute("ATTACH DATABASE ? AS delta", (delta_path,))
+    try:
+        connection.execute("BEGIN")
+        # Children before parents when deleting, parents first when writing.
+        for table in reversed(CHANGELOG_TABLES):
+            connection.execute(
+                f"DELETE FROM main.{table} WHERE id IN "
+                "(SELECT row_id FROM delta.deleted WHERE table_name = ?)",
+                (table,),
+            )
+        for table in CHANGELOG_TABLES:
+            columns = [
+                column
+                for column in _columns(connection, table, "delta")
+                if column in _columns(connection, table)
+            ]
+            names = ", ".join(columns)
+            assignments = ", ".join(
+                f"{column} = excluded.{column}" for column in columns if column != "id"
+            )
+            # An upsert fires the update triggers (search index, changelog);
+            # INSERT OR REPLACE would silently skip them.
+            connection.execute(
+                f"INSERT INTO main.{table} ({names}) SELECT {names} FROM delta.{table} "
+                f"WHERE true ON CONFLICT(id) DO UPDATE SET {assignments}"
+            )
+        connection.execute("COMMIT")
+    except Exception:
+        connection.execute("ROLLBACK")
+        raise
+    finally:
+        connection.execute("DETACH DATABASE delta")
+
+
+def restore_backup(
+    database_path: str,
+    source: str,
+    incremental: Sequence[str] = (),
+    pages: int = BACKUP_PAGES,
+) -> Dict[str, int]:
+    with tempfile.TemporaryDirectory() as workdir:
+        staging_path = os.path.join(workdir, "restore.db")
+        shutil.copyfile(source, staging_path)
+        staging = _connect(staging_path)
+        try:
+            meta = read_meta(staging)
+            if meta["kind"] != FULL:
+                raise BackupError(f"{source} ist keine vollständige Sicherung.")
+            verify(staging)
+
+            for delta_path in incremental:
+                delta = _connect(delta_path)
+                try:
+                    delta_meta = read_meta(delta)
+                finally:
+                    delta.close()
+                if (
+                    delta_meta["kind"] != INCREMENTAL
+                    or delta_meta["base_seq"] != meta["seq"]
+                ):
+                    raise BackupError(
+                        f"{delta_path} passt nicht zur Sicherungskette "
+                        f"(erwartet Stand {meta['seq']})."
+                    )
+                _apply_delta(staging, delta_path)
+                meta = delta_meta
+
+            counts = _counts(staging)
+            if counts != {"users": meta["users"], "passwords": meta["passwords"]}:
+                raise BackupError(
+                    f"Zeilenzahl stimmt nicht: {counts} statt "
+                    f"{{'users': {meta['users']}, 'passwords': {meta['passwords']}}}."
+                )
+            check_decryptable(staging)
+            staging.execute("DROP TABLE backup_meta")
+            for table in RESET_ON_RESTORE:
+                staging.execute(f"DELETE FROM {table}")
+            verify(staging)
+
+            live = _connect(database_path)
+            try:
+                staging.backup(live, pages=pages, sleep=BACKUP_SLEEP)
+                verify(live)
+            finally:
+                live.close()
+        finally:
+            staging.close()
+    return counts
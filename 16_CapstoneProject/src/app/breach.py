@@ -0,0 +1,160 @@
+import hashlib
+import mmap
+import os
+import struct
+from array import array
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+# Offline lookups in a HIBP-style corpus: one upper-case SHA-1 per line,
+# optionally followed by ":<count>", sorted by hash. The file is memory-mapped
+# and binary-searched on byte offsets, so a lookup touches O(log n) pages and
+# the corpus never has to fit into RAM.
+
+HASH_LENGTH = 40
+# The prefix index stores the offset of the first line for every 4-hex-digit
+# prefix, which narrows each lookup to 1/65536 of the file.
+PREFIX_LENGTH = 4
+BUCKETS = 16**PREFIX_LENGTH
+INDEX_SUFFIX = ".idx"
+INDEX_MAGIC = b"PMIDX1"
+INDEX_HEADER = struct.Struct("<6sQ")
+
+
+class BreachedEntry(NamedTuple):
+    title: str
+    count: int
+
+
+@dataclass
+class BreachReport:
+    checked: int = 0
+    breached: List[BreachedEntry] = field(default_factory=list)
+
+
+def sha1_hex(password: str) -> bytes:
+    return hashlib.sha1(password.encode()).hexdigest().upper().encode()
+
+
+def index_path(corpus_path: str) -> str:
+    return corpus_path + INDEX_SUFFIX
+
+
+class BreachCorpus:
+    def __init__(self, path: str, use_index: bool = True):
+        self.path = path
+        self.size = os.path.getsize(path)
+        self._file = open(path, "rb")
+        # mmap cannot map an empty file.
+        self._map = (
+            mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            if self.size
+            else b""
+        )
+        self.offsets = load_index(path, self.size) if use_index else None
+
+    def close(self) -> None:
+        if self.size:
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self) -> "BreachCorpus":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _line_at(self, offset: int, lower: int, upper: int):
+        # Returns start and end of the line containing offset, within bounds.
+        newline = self._map.rfind(b"\n", lower, offset)
+        start = lower if newline < 0 else newline + 1
+        end = self._map.find(b"\n", start, upper)
+        return start, upper if end < 0 else end
+
+    def lower_bound(
+        self, key: bytes, lower: int = 0, upper: Optional[int] = None
+    ) -> int:
+        # Offset of the first line in [lower, upper) whose hash is >= key;
+        # lower must be the start of a line.
+        upper = self.size if upper is None else upper
+        while lower < upper:
+            start, end = self._line_at((lower + upper) // 2, lower, upper)
+            if self._map[start : start + len(key)] < key:
+                lower = end + 1
+            else:
+                upper = start
+        # A key above the last line ends past the final newline-less line.
+        return min(lower, upper)
+
+    def count_hash(self, digest: bytes) -> int:
+        lower, upper = 0, self.size
+        if self.offsets is not None:
+            bucket = int(digest[:PREFIX_LENGTH], 16)
+            lower, upper = self.offsets[bucket], self.offsets[bucket + 1]
+        start = self.lower_bound(digest, lower, upper)
+        if start >= upper:
+            return 0
+        _, end = self._line_at(start, start, upper)
+        line = self._map[start:end].rstrip(b"\r")
+        if line[:HASH_LENGTH] != digest:
+            return 0
+        _, _, count = line.partition(b":")
+        return int(count) if count.strip() else 1
+
+    def count(self, password: str) -> int:
+        return self.count_hash(sha1_hex(password))
+
+
+def build_index(corpus_path: str) -> str:
+    # 65536 binary searches instead of a scan, so building the index reads
+    # only a few pages per bucket even for a multi-GB corpus.
+    with BreachCorpus(corpus_path, use_index=False) as corpus:
+        offsets = array("Q", [0] * (BUCKETS + 1))
+        lower = 0
+        for bucket in range(BUCKETS):
+            prefix = f"{bucket:0{PREFIX_LENGTH}X}".encode()
+            lower = corpus.lower_bound(prefix, lower)
+            offsets[bucket] = lower
+        offsets[BUCKETS] = corpus.size
+        size = corpus.size
+
+    path = index_path(corpus_path)
+    with open(path + ".part", "wb") as index_file:
+        index_file.write(INDEX_HEADER.pack(INDEX_MAGIC, size))
+        offsets.tofile(index_file)
+    os.replace(path + ".part", path)
+    return path
+
+
+def load_index(corpus_path: str, size: int) -> Optional[array]:
+    # A missing index, or one built for a different version of the corpus,
+    # is ignored and lookups search the whole file.
+    path = index_path(corpus_path)
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as index_file:
+        header = index_file.read(INDEX_HEADER.size)
+        if len(header) != INDEX_HEADER.size or INDEX_HEADER.unpack(header) != (
+            INDEX_MAGIC,
+            size,
+        ):
+            return None
+        offsets = array("Q")
+        try:
+            offsets.fromfile(index_file, BUCKETS + 1)
+        except EOFError:
+            return None
+    return offsets
+
+
+def find_breached(
+    corpus: BreachCorpus, chunks: Iterable[List[Dict[str, str]]]
+) -> BreachReport:
+    report = BreachReport()
+    for chunk in chunks:
+        report.checked += len(chunk)
+        for entry in chunk:
+            count = corpus.count(entry["password"])
+            if count:
+                report.breached.append(BreachedEntry(entry["title"], count))
+    return report
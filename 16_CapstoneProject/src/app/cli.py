@@ -1,23 +1,64 @@
 import os
+import sys
+from typing import List, Optional
 
 import typer
-from dotenv import load_dotenv
-from tabulate import tabulate
 
-from app.database import (Password, SessionLocal, User, create_tables,
-                          get_db_session, get_logged_in_user,
-                          get_user_by_username)
-from app.utils import (create_env_file, decrypt_password, encrypt_password,
-                       hash_password)
+from app.profiling import phase
+
+# Heavy dependencies (SQLAlchemy, cryptography, tabulate, dotenv) are imported
+# inside the commands that need them, so --help, completion and early exits
+# stay fast.
 
 app = typer.Typer()
 
-load_dotenv()
+
+@app.callback()
+def main(
+    ctx: typer.Context,
+    profile: bool = typer.Option(False, "--profile"),
+    profile_output: Optional[str] = typer.Option(None, "--profile-output"),
+):
+    if profile or profile_output:
+        from app import profiling
+
+        profiling.enable(profile_output)
+        ctx.call_on_close(profiling.report)
+
+
+AGENT_ERRORS = {
+    "not_logged_in": "Bitte melde dich zuerst an.",
+    "not_found": "Kein Passwort mit diesem Titel gefunden.",
+    "exists": "Ein Passwort mit diesem Titel existiert bereits.",
+    "busy": "Die Datenbank ist gerade gesperrt. Bitte versuche es später erneut.",
+}
+
+
+def _agent_call(client, op: str, **params) -> Optional[dict]:
+    response = client.request(op, **params)
+    if not response["ok"]:
+        message = AGENT_ERRORS.get(
+            response["error"], f"Agent-Fehler: {response['error']}"
+        )
+        typer.echo(_with_suggestions(message, response.get("suggestions")))
+        return None
+    return response
+
+
+def _with_suggestions(message: str, suggestions: Optional[List[str]]) -> str:
+    # Same wording as EntryNotFoundError, without importing the vault module.
+    if suggestions:
+        return f"{message} Meintest du: {', '.join(suggestions)}?"
+    return message
 
 
 @app.command()
 def init():
-    if os.path.exists(".env") and os.path.exists("app.db"):
+    from app.config import get_settings
+    from app.database import create_tables
+    from app.utils import create_env_file
+
+    if os.path.exists(".env") and os.path.exists(get_settings().database_path):
         typer.echo("Initialisierung bereits abgeschlossen")
         return
     create_env_file()
@@ -25,8 +66,159 @@ def init():
     typer.echo("Initialisierung erfolgreich")
 
 
+@app.command()
+def migrate(
+    chunk_size: int = typer.Option(1000, "--chunk-size"),
+    vacuum: bool = typer.Option(False, "--vacuum"),
+):
+    from app.database import get_engine, migrate_database
+
+    duplicates = migrate_database(
+        chunk_size,
+        progress=lambda column, total: typer.echo(
+            f"  {column}: {total} Zeilen umgestellt"
+        ),
+    )
+    if duplicates:
+        typer.echo("Migration abgebrochen, doppelte Titel gefunden:")
+        for user_id, title, count in duplicates:
+            typer.echo(f"  Benutzer {user_id}: {title} ({count}x)")
+        typer.echo("Bitte benenne die Einträge um und starte die Migration erneut.")
+        return
+    if vacuum:
+        from app.migrations import vacuum as vacuum_database
+
+        vacuum_database(get_engine())
+    typer.echo("Migration erfolgreich")
+
+
+@app.command(name="calibrate")
+def calibrate_kdf(
+    target_ms: float = typer.Option(250.0, "--target-ms"),
+    algorithm: str = typer.Option("scrypt", "--algorithm"),
+    write: bool = typer.Option(False, "--write"),
+):
+    from dotenv import set_key
+
+    from app.hashing import ALGORITHMS, calibrate
+
+    if algorithm not in ALGORITHMS:
+        typer.echo(f"Unbekannter Algorithmus. Erlaubt sind: {', '.join(ALGORITHMS)}")
+        return
+
+    parameters = {"kdf_algorithm": algorithm, **calibrate(target_ms, algorithm)}
+    typer.echo(f"Parameter für ca. {target_ms:.0f} ms pro Login:")
+    for name, value in parameters.items():
+        typer.echo(f"PM_{name.upper()}={value}")
+
+    if write:
+        for name, value in parameters.items():
+            set_key(".env", f"PM_{name.upper()}", str(value), quote_mode="never")
+        typer.echo("Parameter in .env gespeichert.")
+
+
+@app.command(name="rotate-key")
+def rotate_key(
+    batch_size: int = typer.Option(1000, "--batch-size"),
+    workers: int = typer.Option(0, "--workers"),
+    processes: bool = typer.Option(False, "--processes"),
+    drop_previous: bool = typer.Option(False, "--drop-previous"),
+):
+    from cryptography.fernet import Fernet
+
+    from app.database import get_db_session
+    from app.migrations import needs_migration
+    from app.rotation import (finish_rotation, get_checkpoint, key_fingerprint,
+                              rotate_rows, start_rotation)
+    from app.utils import get_fernet_keys
+
+    with get_db_session() as db:
+        # Rotation compares stored ciphertexts, which must all be in one format.
+        if needs_migration(db.connection()):
+            typer.echo("Bitte zuerst 'migrate' ausführen.")
+            return
+        checkpoint = get_checkpoint(db)
+        if checkpoint is None:
+            # The old keys stay readable until every row has been rotated.
+            new_key = Fernet.generate_key()
+            _store_keys(new_key, get_fernet_keys())
+            checkpoint = start_rotation(db, new_key)
+            typer.echo("Neuer Schlüssel in .env gespeichert.")
+        elif checkpoint.key_fingerprint != key_fingerprint(get_fernet_keys()[0]):
+            typer.echo(
+                "Die unterbrochene Rotation gehört zu einem anderen FERNET_KEY. "
+                "Bitte die .env der laufenden Rotation wiederherstellen."
+            )
+            return
+        else:
+            typer.echo(f"Setze Rotation nach ID {checkpoint.last_id} fort.")
+
+        rotated = rotate_rows(
+            db,
+            checkpoint,
+            batch_size=batch_size,
+            workers=workers,
+            use_processes=processes,
+            progress=lambda total: typer.echo(
+                f"  {total} Passwörter neu verschlüsselt"
+            ),
+        )
+        total = checkpoint.rotated
+        finish_rotation(db, checkpoint)
+
+    typer.echo(
+        f"Rotation abgeschlossen: {total} Passwörter ({rotated} in diesem Lauf). "
+        "Laufende Agents und Server bitte neu starten."
+    )
+    # The previous keys stay in FERNET_PREVIOUS_KEYS by default: backups taken
+    # before the rotation are still encrypted with them.
+    if drop_previous:
+        _store_keys(get_fernet_keys()[0], ())
+        typer.echo(
+            "Alte Schlüssel entfernt. Backups von vor der Rotation lassen sich "
+            "damit nicht mehr entschlüsseln."
+        )
+
+
+def _store_keys(key: bytes, previous_keys) -> None:
+    from dotenv import dotenv_values, set_key, unset_key
+
+    from app.utils import PREVIOUS_KEYS_ENV, reset_cipher
+
+    previous = ",".join(previous_key.decode() for previous_key in previous_keys)
+    set_key(".env", "FERNET_KEY", key.decode(), quote_mode="never")
+    os.environ["FERNET_KEY"] = key.decode()
+    if previous:
+        set_key(".env", PREVIOUS_KEYS_ENV, previous, quote_mode="never")
+        os.environ[PREVIOUS_KEYS_ENV] = previous
+    else:
+        if PREVIOUS_KEYS_ENV in dotenv_values(".env"):
+            unset_key(".env", PREVIOUS_KEYS_ENV)
+        os.environ.pop(PREVIOUS_KEYS_ENV, None)
+    reset_cipher()
+
+
+def _ensure_fingerprint_key() -> None:
+    from dotenv import set_key
+
+    from app.utils import (FINGERPRINT_KEY_ENV, generate_fingerprint_key,
+                           get_fingerprint_key, reset_cipher)
+
+    if get_fingerprint_key() is not None:
+        return
+    key = generate_fingerprint_key()
+    set_key(".env", FINGERPRINT_KEY_ENV, key, quote_mode="never")
+    os.environ[FINGERPRINT_KEY_ENV] = key
+    reset_cipher()
+    typer.echo(f"Neuer {FINGERPRINT_KEY_ENV} in .env gespeichert.")
+
+
 @app.command()
 def create_user():
+    from app.database import (User, get_db_session, get_user_by_username,
+                              run_write)
+    from app.hashing import hash_password
+
     username = typer.prompt("Bitte gib einen Benutzernamen ein")
     password = typer.prompt("Bitte gib ein Passwort ein", hide_input=True)
 
@@ -34,20 +226,25 @@ def create_user():
         existing_user = get_user_by_username(username=username, db=db)
         if existing_user is not None:
             typer.echo(
-                "Dieser Benutzername ist bereits vergeben. Bitte wähle einen anderen Benutzernamen."
+                "Dieser Benutzername ist bereits vergeben. "
+                "Bitte wähle einen anderen Benutzernamen."
             )
-            db.close()
             return
 
         hashed_password = hash_password(password)
         user = User(username=username, hashed_password=hashed_password)
-        db.add(user)
-        db.commit()
+        run_write(db, lambda: db.add(user))
         typer.echo(f"Benutzer {username} wurde erstellt.")
 
 
 @app.command()
 def login():
+    from sqlalchemy.exc import OperationalError
+
+    from app.database import (get_db_session, get_user_by_username,
+                              is_missing_table, run_write, start_session)
+    from app.hashing import hash_password, needs_rehash, verify_password
+
     username = typer.prompt("Gib deinen Benutzernamen ein")
     password = typer.prompt("Gib dein Passwort ein", hide_input=True)
 
@@ -57,154 +254,684 @@ def login():
             typer.echo("Benutzername oder Passwort falsch.")
             return
 
-        if hash_password(password) != user.hashed_password:
+        if not verify_password(password, user.hashed_password):
             typer.echo("Benutzername oder Passwort falsch.")
             return
-        user.is_logged_in = True
-        db.commit()
+        hashed_password = None
+        if needs_rehash(user.hashed_password):
+            hashed_password = hash_password(password)
+        user_id = user.id
+
+        def work():
+            if hashed_password is not None:
+                user.hashed_password = hashed_password
+            start_session(db, user_id)
+
+        try:
+            run_write(db, work)
+        except OperationalError as error:
+            if not is_missing_table(error):
+                raise
+            typer.echo("Bitte zuerst 'migrate' ausführen.")
+            return
         typer.echo("Erfolgreich eingeloggt.")
 
 
 @app.command()
 def logout():
+    from app.database import (end_session, get_db_session, get_logged_in_user,
+                              run_write)
+
     with get_db_session() as db:
         user = get_logged_in_user(db)
         if user is None:
             typer.echo("Du bist nicht eingeloggt.")
             return
 
-        user.is_logged_in = False
-        db.commit()
+        run_write(db, lambda: end_session(db))
         typer.echo("Erfolgreich ausgeloggt.")
 
 
 @app.command(name="create_password")
 def create_password():
+    from app.agent import get_client
+
+    client = get_client()
+    if client is not None:
+        with client:
+            _create_password_via_agent(client)
+        return
+
+    from app.database import get_db_session
+    from app.vault import Vault, VaultError
+
     with get_db_session() as db:
-        user = get_logged_in_user(db=db)
-        if user is None:
-            typer.echo("Bitte melde dich zuerst an.")
+        try:
+            vault = Vault.open(db)
+            title = typer.prompt("Gib den Titel für das Passwort ein")
+            if vault.exists(title):
+                typer.echo("Ein Passwort mit diesem Titel existiert bereits.")
+                return
+
+            service_username = typer.prompt("Gib den Benutzernamen für den Service ein")
+            service_password = typer.prompt(
+                "Gib das Passwort für den Service ein", hide_input=True
+            )
+            vault.create(title, service_username, service_password)
+        except VaultError as error:
+            typer.echo(str(error))
             return
 
-        title = typer.prompt("Gib den Titel für das Passwort ein")
-        existing_password = (
-            db.query(Password)
-            .filter(Password.title == title, Password.user_id == user.id)
-            .first()
+        typer.echo(f"Passwort für {title} wurde erstellt.")
+
+
+def _create_password_via_agent(client) -> None:
+    if _agent_call(client, "whoami") is None:
+        return
+
+    title = typer.prompt("Gib den Titel für das Passwort ein")
+    response = _agent_call(client, "exists", title=title)
+    if response is None:
+        return
+    if response["result"]:
+        typer.echo("Ein Passwort mit diesem Titel existiert bereits.")
+        return
+
+    service_username = typer.prompt("Gib den Benutzernamen für den Service ein")
+    service_password = typer.prompt(
+        "Gib das Passwort für den Service ein", hide_input=True
+    )
+    response = _agent_call(
+        client,
+        "create",
+        title=title,
+        username=service_username,
+        password=service_password,
+    )
+    if response is not None:
+        typer.echo(f"Passwort für {title} wurde erstellt.")
+
+
+@app.command(name="get_passwords")
+def get_passwords(
+    workers: int = typer.Option(0, "--workers"),
+    processes: bool = typer.Option(False, "--processes"),
+    masked: bool = typer.Option(False, "--masked"),
+    reveal: Optional[str] = typer.Option(None, "--reveal"),
+    file_format: str = typer.Option("grid", "--format"),
+    chunk_size: int = typer.Option(1000, "--chunk-size"),
+):
+    from app.agent import get_client
+    from app.output import STREAM_FORMATS
+
+    if file_format != "grid" and file_format not in STREAM_FORMATS:
+        typer.echo(
+            f"Unbekanntes Format. Erlaubt sind: grid, {', '.join(STREAM_FORMATS)}"
         )
-        if existing_password is not None:
-            typer.echo("Ein Passwort mit diesem Titel existiert bereits.")
-            db.close()
+        return
+
+    client = get_client()
+    if client is not None:
+        with client:
+            response = _agent_call(client, "list", masked=masked, reveal=reveal)
+        if response is None:
+            return
+        table_data = response["result"]
+    elif file_format != "grid":
+        _stream_passwords(file_format, chunk_size, workers, processes, masked, reveal)
+        return
+    else:
+        table_data = _table_data_from_db(workers, processes, masked, reveal)
+        if table_data is None:
             return
 
-        service_username = typer.prompt("Gib den Benutzernamen für den Service ein")
-        service_password = typer.prompt(
-            "Gib das Passwort für den Service ein", hide_input=True
+    if file_format != "grid":
+        if not table_data:
+            _echo_empty(file_format)
+            return
+        _echo_chunk(
+            [dict(zip(("title", "username", "password"), row)) for row in table_data],
+            file_format,
+            header=True,
         )
+        return
+
+    if not table_data:
+        typer.echo("Keine Passwörter gefunden.")
+        return
+
+    from tabulate import tabulate
+
+    headers = ["Titel", "Benutzername", "Passwort"]
+    with phase("render"):
+        table = tabulate(table_data, headers=headers, tablefmt="grid")
+    typer.echo("Gespeicherte Passwörter:")
+    typer.echo(table)
 
-        encrypted_password = encrypt_password(service_password)
 
-        new_password = Password(
-            title=title,
-            username=service_username,
-            encrypted_password=encrypted_password,
-            user_id=user.id,
+def _echo_chunk(entries: list, file_format: str, header: bool) -> None:
+    from app.output import serialize_chunk
+
+    with phase("render"):
+        data = serialize_chunk(entries, file_format, header)
+    typer.echo(data, nl=False)
+
+
+def _echo_empty(file_format: str) -> None:
+    # CSV and TSV keep their header; the notice goes to stderr so it never
+    # ends up in piped output.
+    if file_format in ("csv", "tsv"):
+        _echo_chunk([], file_format, header=True)
+    else:
+        typer.echo("Keine Passwörter gefunden.", err=True)
+
+
+def _stream_passwords(
+    file_format: str,
+    chunk_size: int,
+    workers: int,
+    processes: bool,
+    masked: bool,
+    reveal: Optional[str],
+) -> None:
+    from app.database import get_db_session
+    from app.vault import Vault, VaultError
+
+    with get_db_session() as db:
+        try:
+            vault = Vault.open(db)
+        except VaultError as error:
+            typer.echo(str(error))
+            return
+
+        chunks = vault.iter_chunks(
+            chunk_size, workers, masked=masked, reveal=reveal, use_processes=processes
         )
-        db.add(new_password)
-        db.commit()
-        db.refresh(new_password)
+        empty = True
+        for index, chunk in enumerate(chunks):
+            _echo_chunk(chunk, file_format, header=index == 0)
+            empty = False
+        if empty:
+            _echo_empty(file_format)
 
-        typer.echo(f"Passwort für wurde erstellt.")
 
+def _table_data_from_db(
+    workers: int, processes: bool, masked: bool, reveal: Optional[str]
+) -> Optional[list]:
+    from app.database import get_db_session
+    from app.vault import Vault, VaultError
 
-@app.command(name="get_passwords")
-def get_passwords():
     with get_db_session() as db:
-        user = get_logged_in_user(db)
-        if user is None:
-            typer.echo("Bitte melde dich zuerst an.")
+        try:
+            entries = Vault.open(db).list(
+                masked=masked, reveal=reveal, workers=workers, use_processes=processes
+            )
+        except VaultError as error:
+            typer.echo(str(error))
+            return None
+        return [list(entry) for entry in entries]
+
+
+@app.command()
+def show(title: str, fuzzy: bool = typer.Option(False, "--fuzzy")):
+    from tabulate import tabulate
+
+    from app.agent import get_client
+
+    headers = ["Titel", "Benutzername", "Passwort"]
+    client = get_client()
+    if client is not None:
+        with client:
+            response = _agent_call(client, "get", title=title, fuzzy=fuzzy)
+        if response is not None:
+            with phase("render"):
+                table = tabulate([response["result"]], headers=headers, tablefmt="grid")
+            typer.echo(table)
+        return
+
+    from app.database import get_db_session
+    from app.vault import Vault, VaultError
+
+    with get_db_session() as db:
+        try:
+            entry = Vault.open(db).get(title, fuzzy=fuzzy)
+        except VaultError as error:
+            typer.echo(str(error))
             return
 
-        stored_passwords = db.query(Password).filter(Password.user_id == user.id).all()
+        with phase("render"):
+            table = tabulate([list(entry)], headers=headers, tablefmt="grid")
+        typer.echo(table)
 
-        if not stored_passwords:
-            typer.echo("Keine Passwörter gefunden.")
+
+@app.command()
+def search(
+    query: str,
+    prefix: bool = typer.Option(False, "--prefix"),
+    limit: int = typer.Option(50, "--limit"),
+):
+    from tabulate import tabulate
+
+    from app.database import get_db_session
+    from app.vault import Vault, VaultError
+
+    with get_db_session() as db:
+        try:
+            results = Vault.open(db).search(query, prefix=prefix, limit=limit)
+        except VaultError as error:
+            typer.echo(str(error))
             return
 
-        table_data = []
-        for stored_password in stored_passwords:
-            decrypted_password = decrypt_password(stored_password.encrypted_password)
-            table_data.append(
-                [stored_password.title, stored_password.username, decrypted_password]
-            )
+        if not results:
+            typer.echo("Keine Passwörter gefunden.")
+            return
 
-        headers = ["Titel", "Benutzername", "Passwort"]
-        table = tabulate(table_data, headers=headers, tablefmt="grid")
-        typer.echo("Gespeicherte Passwörter:")
+        table_data = [[result.title, result.username] for result in results]
+        headers = ["Titel", "Benutzername"]
+        with phase("render"):
+            table = tabulate(table_data, headers=headers, tablefmt="grid")
         typer.echo(table)
 
 
 @app.command(name="delete_password")
 def delete_password():
+    from app.agent import get_client
+
+    client = get_client()
+    if client is not None:
+        with client:
+            if _agent_call(client, "whoami") is None:
+                return
+            title = typer.prompt("Gib den Titel des zu löschenden Passworts ein")
+            if _agent_call(client, "delete", title=title) is not None:
+                typer.echo("Passwort erfolgreich gelöscht.")
+        return
+
+    from app.database import get_db_session
+    from app.vault import Vault, VaultError
+
     with get_db_session() as db:
-        user = get_logged_in_user(db)
-        if user is None:
-            typer.echo("Bitte melde dich zuerst an.")
+        try:
+            vault = Vault.open(db)
+            title = typer.prompt("Gib den Titel des zu löschenden Passworts ein")
+            vault.delete(title)
+        except VaultError as error:
+            typer.echo(str(error))
             return
 
-        title = typer.prompt("Gib den Titel des zu löschenden Passworts ein")
+        typer.echo("Passwort erfolgreich gelöscht.")
 
-        password_to_delete = (
-            db.query(Password)
-            .filter(Password.title == title, Password.user_id == user.id)
-            .first()
-        )
 
-        if password_to_delete is None:
-            typer.echo("Kein Passwort mit diesem Titel gefunden.")
-            db.close()
+@app.command(name="update_password")
+def update_password():
+    from app.agent import get_client
+
+    client = get_client()
+    if client is not None:
+        with client:
+            _update_password_via_agent(client)
+        return
+
+    from app.database import get_db_session
+    from app.vault import Vault, VaultError
+
+    with get_db_session() as db:
+        try:
+            vault = Vault.open(db)
+            title = typer.prompt("Gib den Titel des zu aktualisierenden Passworts ein")
+            if not vault.exists(title):
+                raise vault.not_found(title)
+
+            new_service_username = typer.prompt(
+                "Gib den neuen Benutzernamen für den Service ein"
+            )
+            new_service_password = typer.prompt(
+                "Gib das neue Passwort für den Service ein", hide_input=True
+            )
+            vault.update(title, new_service_username, new_service_password)
+        except VaultError as error:
+            typer.echo(str(error))
             return
 
-        db.delete(password_to_delete)
-        db.commit()
+        typer.echo("Passwort erfolgreich aktualisiert.")
 
-        typer.echo("Passwort erfolgreich gelöscht.")
 
+def _update_password_via_agent(client) -> None:
+    if _agent_call(client, "whoami") is None:
+        return
+
+    title = typer.prompt("Gib den Titel des zu aktualisierenden Passworts ein")
+    response = _agent_call(client, "exists", title=title)
+    if response is None:
+        return
+    if not response["result"]:
+        response = _agent_call(client, "suggest", title=title)
+        if response is not None:
+            typer.echo(_with_suggestions(AGENT_ERRORS["not_found"], response["result"]))
+        return
+
+    new_service_username = typer.prompt(
+        "Gib den neuen Benutzernamen für den Service ein"
+    )
+    new_service_password = typer.prompt(
+        "Gib das neue Passwort für den Service ein", hide_input=True
+    )
+    response = _agent_call(
+        client,
+        "update",
+        title=title,
+        username=new_service_username,
+        password=new_service_password,
+    )
+    if response is not None:
+        typer.echo("Passwort erfolgreich aktualisiert.")
+
+
+@app.command(name="import")
+def import_passwords(
+    path: str,
+    file_format: Optional[str] = typer.Option(None, "--format"),
+    chunk_size: int = typer.Option(1000, "--chunk-size"),
+    workers: int = typer.Option(0, "--workers"),
+    encrypted: bool = typer.Option(False, "--encrypted"),
+):
+    from cryptography.fernet import InvalidToken
+
+    from app.database import get_db_session
+    from app.transfer import IMPORT_FORMATS, ImportResult, read_records
+    from app.vault import Vault, VaultError
+
+    if file_format is not None and file_format not in IMPORT_FORMATS:
+        typer.echo("Unbekanntes Format. Erlaubt sind 'csv', 'jsonl' und 'json'.")
+        return
+
+    if not os.path.exists(path):
+        typer.echo(f"Datei {path} nicht gefunden.")
+        return
 
-@app.command(name="update_password")
-def update_password():
     with get_db_session() as db:
-        user = get_logged_in_user(db)
-        if user is None:
-            typer.echo("Bitte melde dich zuerst an.")
+        try:
+            vault = Vault.open(db)
+        except VaultError as error:
+            typer.echo(str(error))
             return
 
-        title = typer.prompt("Gib den Titel des zu aktualisierenden Passworts ein")
+        result = ImportResult()
+        try:
+            result = vault.import_records(
+                read_records(path, file_format, encrypted=encrypted),
+                chunk_size=chunk_size,
+                workers=workers,
+                result=result,
+            )
+        except InvalidToken:
+            reason = "Die Datei lässt sich mit diesem Schlüssel nicht entschlüsseln"
+        except UnicodeDecodeError:
+            reason = "Die Datei ist nicht UTF-8-kodiert"
+        except ValueError as error:
+            reason = f"Die Datei ist fehlerhaft ({error})"
+        else:
+            reason = None
+
+        if reason is not None:
+            typer.echo(
+                f"Import abgebrochen: {reason}. Bis dahin {result.imported} "
+                f"Passwörter importiert, {result.skipped} übersprungen, "
+                f"{result.conflicts} Konflikte."
+            )
+            raise typer.Exit(code=1)
 
-        password_to_update = (
-            db.query(Password)
-            .filter(Password.title == title, Password.user_id == user.id)
-            .first()
+        typer.echo(
+            f"{result.imported} Passwörter importiert, {result.skipped} übersprungen, "
+            f"{result.conflicts} Konflikte ({result.rows_per_second:.0f} Zeilen/s)."
         )
 
-        if password_to_update is None:
-            typer.echo("Kein Passwort mit diesem Titel gefunden.")
-            db.close()
+
+@app.command()
+def export(
+    output: str = typer.Option("-", "--output", "-o"),
+    file_format: str = typer.Option("jsonl", "--format"),
+    encrypt: bool = typer.Option(False, "--encrypt"),
+    chunk_size: int = typer.Option(1000, "--chunk-size"),
+    workers: int = typer.Option(0, "--workers"),
+):
+    from app.database import get_db_session
+    from app.vault import Vault, VaultError
+
+    if file_format not in ("jsonl", "csv"):
+        typer.echo("Unbekanntes Format. Erlaubt sind 'jsonl' und 'csv'.")
+        return
+
+    with get_db_session() as db:
+        try:
+            vault = Vault.open(db)
+        except VaultError as error:
+            typer.echo(str(error))
             return
 
-        new_service_username = typer.prompt(
-            "Gib den neuen Benutzernamen für den Service ein"
-        )
-        new_service_password = typer.prompt(
-            "Gib das neue Passwort für den Service ein", hide_input=True
+        if output == "-":
+            vault.export(sys.stdout, file_format, encrypt, chunk_size, workers)
+            return
+
+        # Plaintext exports hold every password, so only the owner may read
+        # them; fchmod also covers a file that already existed.
+        descriptor = os.open(output, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        os.fchmod(descriptor, 0o600)
+        with os.fdopen(descriptor, "w", newline="", encoding="utf-8") as export_file:
+            exported = vault.export(
+                export_file, file_format, encrypt, chunk_size, workers
+            )
+        typer.echo(f"{exported} Passwörter nach {output} exportiert.")
+
+
+@app.command()
+def backup(
+    target: str,
+    incremental: bool = typer.Option(False, "--incremental"),
+    pages: int = typer.Option(256, "--pages"),
+):
+    from app.backup import BackupError, full_backup, incremental_backup
+    from app.config import get_settings
+
+    settings = get_settings()
+    if settings.in_memory or not os.path.exists(settings.database_path):
+        typer.echo("Keine Datenbankdatei zum Sichern gefunden.")
+        return
+
+    try:
+        if incremental:
+            result = incremental_backup(settings.database_path, target)
+        else:
+            result = full_backup(settings.database_path, target, pages=pages)
+    except BackupError as error:
+        typer.echo(str(error))
+        return
+
+    rows = ", ".join(f"{count} {table}" for table, count in result.rows.items())
+    kind = "Inkrementelle" if incremental else "Vollständige"
+    typer.echo(
+        f"{kind} Sicherung nach {target} geschrieben ({rows}, Stand {result.seq}, "
+        f"{result.seconds:.2f} s)."
+    )
+
+
+@app.command()
+def restore(
+    source: str,
+    incremental: Optional[List[str]] = typer.Option(None, "--incremental"),
+    yes: bool = typer.Option(False, "--yes"),
+):
+    from app.backup import BackupError, restore_backup
+    from app.config import get_settings
+
+    for path in [source, *(incremental or [])]:
+        if not os.path.exists(path):
+            typer.echo(f"Datei {path} nicht gefunden.")
+            return
+    if not yes:
+        typer.confirm(
+            "Die aktuelle Datenbank wird überschrieben. Fortfahren?", abort=True
         )
 
-        encrypted_new_password = encrypt_password(new_service_password)
+    try:
+        counts = restore_backup(get_settings().database_path, source, incremental or [])
+    except BackupError as error:
+        typer.echo(f"Wiederherstellung abgebrochen: {error}")
+        return
 
-        password_to_update.username = new_service_username
-        password_to_update.encrypted_password = encrypted_new_password
-        db.commit()
+    typer.echo(
+        f"Wiederherstellung geprüft und abgeschlossen: {counts['users']} Benutzer, "
+        f"{counts['passwords']} Passwörter. "
+        "Bitte eine neue vollständige Sicherung erstellen."
+    )
+
+
+@app.command()
+def shell():
+    from app.shell import run_shell
+
+    run_shell(app)
+
+
+@app.command()
+def serve(
+    host: str = typer.Option("127.0.0.1", "--host"),
+    port: int = typer.Option(8765, "--port"),
+    verbose: bool = typer.Option(False, "--verbose"),
+):
+    from app.server import create_server
+    from app.sessions import read_session, session_file
+
+    server = create_server(host, port, verbose)
+    typer.echo(f"Server läuft auf http://{host}:{server.server_port}")
+    if read_session() is not None:
+        # The token is not echoed, so it does not end up in scrollback or logs.
+        typer.echo(f"Das Token für die API steht im Feld 'token' in {session_file()}.")
+    else:
+        typer.echo("Melde dich an, um ein Token für die API zu erhalten.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+agent_app = typer.Typer()
+app.add_typer(agent_app, name="agent")
+
+
+@agent_app.command("start")
+def agent_start():
+    from app.agent import get_client, serve, socket_path
+
+    client = get_client()
+    if client is not None:
+        client.close()
+        typer.echo("Der Agent läuft bereits.")
+        return
+
+    typer.echo(f"Agent gestartet auf {socket_path()}")
+    serve()
 
-        typer.echo("Passwort erfolgreich aktualisiert.")
 
+@agent_app.command("stop")
+def agent_stop():
+    from app.agent import get_client
 
+    client = get_client()
+    if client is None:
+        typer.echo("Der Agent läuft nicht.")
+        return
+    with client:
+        client.request("shutdown")
+    typer.echo("Agent gestoppt.")
+
+
+@agent_app.command("status")
+def agent_status():
+    from app.agent import get_client, socket_path
+
+    client = get_client()
+    if client is None:
+        typer.echo("Der Agent läuft nicht.")
+        return
+    with client:
+        client.request("ping")
+    typer.echo(f"Der Agent läuft auf {socket_path()}.")
+
+
+audit_app = typer.Typer()
+app.add_typer(audit_app, name="audit")
+
+
+@audit_app.command("breached")
+def audit_breached(
+    corpus: str,
+    index: bool = typer.Option(False, "--index"),
+    chunk_size: int = typer.Option(1000, "--chunk-size"),
+):
+    from app.breach import BreachCorpus, build_index, find_breached, load_index
+    from app.database import get_db_session
+    from app.vault import Vault, VaultError
+
+    if not os.path.exists(corpus):
+        typer.echo(f"Datei {corpus} nicht gefunden.")
+        return
+    if index and load_index(corpus, os.path.getsize(corpus)) is None:
+        typer.echo(f"Präfixindex nach {build_index(corpus)} geschrieben.")
+
+    with get_db_session() as db:
+        try:
+            vault = Vault.open(db)
+        except VaultError as error:
+            typer.echo(str(error))
+            return
+
+        # Passwords are decrypted chunk by chunk and only held for the lookup.
+        with BreachCorpus(corpus) as breach_corpus:
+            report = find_breached(
+                breach_corpus, vault.iter_chunks(chunk_size=chunk_size)
+            )
+
+    if not report.breached:
+        typer.echo(
+            f"Keines von {report.checked} Passwörtern ist in der Liste enthalten."
+        )
+        return
+    typer.echo(
+        f"{len(report.breached)} von {report.checked} Passwörtern sind in bekannten "
+        "Datenlecks enthalten:"
+    )
+    for entry in report.breached:
+        typer.echo(f"  {entry.title} ({entry.count}x gesehen)")
+
+
+@audit_app.command("reuse")
+def audit_reuse(
+    chunk_size: int = typer.Option(1000, "--chunk-size"),
+    workers: int = typer.Option(0, "--workers"),
+):
+    from app.database import get_db_session
+    from app.reuse import backfill_fingerprints, find_reused
+    from app.vault import Vault, VaultError
+
+    with get_db_session() as db:
+        try:
+            vault = Vault.open(db)
+        except VaultError as error:
+            typer.echo(str(error))
+            return
+
+        _ensure_fingerprint_key()
+        filled = backfill_fingerprints(db, vault.user_id, chunk_size, workers)
+        if filled:
+            typer.echo(f"{filled} bestehende Einträge mit Fingerabdruck versehen.")
+        groups = find_reused(db, vault.user_id)
+
+    if not groups:
+        typer.echo("Kein Passwort wird mehrfach verwendet.")
+        return
+    typer.echo(f"{len(groups)} Passwörter werden mehrfach verwendet:")
+    for titles in groups:
+        typer.echo(f"  {', '.join(titles)}")
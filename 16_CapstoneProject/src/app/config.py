@@ -0,0 +1,90 @@
+import os
+from configparser import ConfigParser
+from dataclasses import dataclass, fields
+from functools import lru_cache
+
+from dotenv import find_dotenv, load_dotenv
+
+CONFIG_FILE = "password_manager.ini"
+ENV_PREFIX = "PM_"
+
+JOURNAL_MODES = {"DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"}
+SYNCHRONOUS_LEVELS = {"OFF", "NORMAL", "FULL", "EXTRA"}
+KDF_ALGORITHMS = {"scrypt", "pbkdf2_sha256"}
+
+
+@dataclass(frozen=True)
+class Settings:
+    database_path: str = "./app.db"
+    journal_mode: str = "WAL"
+    synchronous: str = "NORMAL"
+    # Negative values are KiB, positive values are pages (see PRAGMA cache_size).
+    cache_size: int = -64000
+    mmap_size: int = 256 * 1024 * 1024
+    busy_timeout: int = 5000
+    # Retries of a write transaction after busy_timeout ran out, starting
+    # with retry_delay seconds and doubling each time.
+    write_retries: int = 5
+    retry_delay: float = 0.05
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: float = 30.0
+    kdf_algorithm: str = "scrypt"
+    scrypt_n: int = 2**14
+    scrypt_r: int = 8
+    scrypt_p: int = 1
+    pbkdf2_iterations: int = 600_000
+    session_ttl: int = 8 * 60 * 60
+
+    def __post_init__(self):
+        if self.journal_mode.upper() not in JOURNAL_MODES:
+            raise ValueError(f"Ungültiger journal_mode: {self.journal_mode}")
+        if self.synchronous.upper() not in SYNCHRONOUS_LEVELS:
+            raise ValueError(f"Ungültiger synchronous-Wert: {self.synchronous}")
+        if self.kdf_algorithm not in KDF_ALGORITHMS:
+            raise ValueError(f"Ungültiger kdf_algorithm: {self.kdf_algorithm}")
+
+    @property
+    def database_url(self) -> str:
+        return f"sqlite:///{self.database_path}"
+
+    @property
+    def in_memory(self) -> bool:
+        return self.database_path in ("", ":memory:")
+
+
+def load_environment() -> None:
+    load_dotenv(find_dotenv(usecwd=True))
+
+
+def load_settings() -> Settings:
+    load_environment()
+    values = {}
+
+    config_file = os.environ.get(f"{ENV_PREFIX}CONFIG", CONFIG_FILE)
+    parser = ConfigParser()
+    parser.read(config_file)
+    for section in parser.sections():
+        values.update(parser[section])
+
+    for field in fields(Settings):
+        value = os.environ.get(f"{ENV_PREFIX}{field.name.upper()}")
+        if value is not None:
+            values[field.name] = value
+
+    return Settings(
+        **{
+            field.name: field.type(values[field.name])
+            for field in fields(Settings)
+            if field.name in values
+        }
+    )
+
+
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    return load_settings()
+
+
+def reset_settings() -> None:
+    get_settings.cache_clear()
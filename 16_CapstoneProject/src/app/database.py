@@ -1,28 +1,160 @@
 import os
+import random
+import secrets
+import time
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as Base64Error
 from contextlib import contextmanager
-from typing import Optional
+from functools import lru_cache
+from typing import Callable, List, Optional, Tuple, TypeVar, Union
 
 import typer
-from sqlalchemy import (Boolean, Column, ForeignKey, Integer, String,
-                        create_engine)
+from sqlalchemy import (Column, Float, ForeignKey, Index, Integer, LargeBinary,
+                        String, TypeDecorator, create_engine, delete, event,
+                        insert, select, update)
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import (Session, declarative_base, relationship,
                             sessionmaker)
+from sqlalchemy.pool import StaticPool
 
-DATABASE_URL = "sqlite:///./app.db"
+from app.config import Settings, get_settings
+from app.hashing import pack_hash, unpack_hash
+from app.sessions import (hash_token, read_session, remove_session,
+                          write_session)
+
+# Execution option for connections that must take the write lock up front.
+IMMEDIATE = "pm_begin_immediate"
+# Upper bound for a single backoff pause in run_write.
+MAX_RETRY_DELAY = 2.0
+
+T = TypeVar("T")
+
+
+def apply_pragmas(dbapi_connection, settings: Settings) -> None:
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA busy_timeout = {int(settings.busy_timeout)}")
+    if not settings.in_memory:
+        cursor.execute(f"PRAGMA journal_mode = {settings.journal_mode.upper()}")
+    cursor.execute(f"PRAGMA synchronous = {settings.synchronous.upper()}")
+    cursor.execute(f"PRAGMA cache_size = {int(settings.cache_size)}")
+    cursor.execute(f"PRAGMA mmap_size = {int(settings.mmap_size)}")
+    cursor.close()
+
+
+def begin_transaction(connection: Connection) -> None:
+    # pysqlite defers BEGIN until the first write, so a read-then-write
+    # transaction may find another writer holding the lock halfway through.
+    # BEGIN IMMEDIATE waits for the lock (busy_timeout) before any work is done.
+    if connection.get_execution_options().get(IMMEDIATE):
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+def create_db_engine(settings: Settings) -> Engine:
+    # An in-memory database lives inside its connection, so every session
+    # and thread has to share that single connection.
+    pool_options = {
+        "poolclass": StaticPool,
+        "connect_args": {"check_same_thread": False},
+    }
+    if not settings.in_memory:
+        pool_options = {
+            "pool_size": settings.pool_size,
+            "max_overflow": settings.max_overflow,
+            "pool_timeout": settings.pool_timeout,
+        }
+    db_engine = create_engine(settings.database_url, **pool_options)
+
+    @event.listens_for(db_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        apply_pragmas(dbapi_connection, settings)
+
+    event.listen(db_engine, "begin", begin_transaction)
+    return db_engine
+
+
+@lru_cache(maxsize=None)
+def get_engine() -> Engine:
+    return create_db_engine(get_settings())
+
+
+@lru_cache(maxsize=None)
+def get_sessionmaker() -> sessionmaker:
+    return sessionmaker(autocommit=False, autoflush=False, bind=get_engine())
+
+
+def reset_engine() -> None:
+    if get_engine.cache_info().currsize:
+        get_engine().dispose()
+    get_engine.cache_clear()
+    get_sessionmaker.cache_clear()
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+# Version 2 stores ciphertexts, password hashes and fingerprints as BLOBs;
+# app.migrations converts older databases.
+SCHEMA_VERSION = 2
+# Every Fernet token starts with this version byte; other strings are kept
+# verbatim behind OPAQUE_TOKEN.
+FERNET_VERSION = 0x80
+OPAQUE_TOKEN = 0x00
+
+
+def pack_token(token: str) -> bytes:
+    try:
+        packed = urlsafe_b64decode(token)
+    except (Base64Error, ValueError):
+        packed = b""
+    if packed[:1] == bytes([FERNET_VERSION]) and unpack_token(packed) == token:
+        return packed
+    return bytes([OPAQUE_TOKEN]) + token.encode()
+
+
+def unpack_token(packed: bytes) -> str:
+    if packed[:1] == bytes([OPAQUE_TOKEN]):
+        return packed[1:].decode()
+    return urlsafe_b64encode(packed).decode()
+
+
+class _PackedString(TypeDecorator):
+    # The application keeps working with strings; the database stores the
+    # packed bytes. Text values written before the migration are passed
+    # through unchanged, so a partly migrated database stays readable.
+    impl = LargeBinary
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else self.pack(value)
+
+    def process_result_value(self, value, dialect):
+        return self.unpack(value) if isinstance(value, bytes) else value
+
+
+class FernetToken(_PackedString):
+    cache_ok = True
+    pack = staticmethod(pack_token)
+    unpack = staticmethod(unpack_token)
+
+
+class PasswordHash(_PackedString):
+    cache_ok = True
+    pack = staticmethod(pack_hash)
+    unpack = staticmethod(unpack_hash)
+
+
+class HexDigest(_PackedString):
+    cache_ok = True
+    pack = staticmethod(bytes.fromhex)
+    unpack = staticmethod(bytes.hex)
+
 
 class User(Base):
     __tablename__ = "users"
 
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String, unique=True, index=True, nullable=False)
-    hashed_password = Column(String, nullable=False)
-    is_logged_in = Column(Boolean, default=False)
+    hashed_password = Column(PasswordHash, nullable=False)
 
 
 class Password(Base):
@@ -31,30 +163,362 @@ class Password(Base):
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, index=True, nullable=False)
     username = Column(String, nullable=False)
-    encrypted_password = Column(String, nullable=False)
+    encrypted_password = Column(FernetToken, nullable=False)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    # HMAC-SHA256 of the plaintext under FINGERPRINT_KEY; equal fingerprints
+    # mean a reused password without decrypting anything.
+    fingerprint = Column(HexDigest, nullable=True)
 
     user = relationship("User", back_populates="passwords")
 
+    __table_args__ = (
+        Index("ix_passwords_user_id_title", "user_id", "title", unique=True),
+        Index("ix_passwords_user_id_fingerprint", "user_id", "fingerprint"),
+    )
+
+
+class UserSession(Base):
+    __tablename__ = "sessions"
+
+    # Only a hash of the token is stored; the token itself stays in the
+    # session file of the user who logged in.
+    token_hash = Column(String, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    expires_at = Column(Float, nullable=False)
+
+
+class KeyRotation(Base):
+    __tablename__ = "key_rotation"
+
+    # Checkpoint of an unfinished rotate-key run: every password with an id
+    # up to last_id is already encrypted with the key named by key_fingerprint.
+    id = Column(Integer, primary_key=True)
+    key_fingerprint = Column(String, nullable=False)
+    last_id = Column(Integer, nullable=False, default=0)
+    rotated = Column(Integer, nullable=False, default=0)
+
+
+class BackupRun(Base):
+    __tablename__ = "backup_runs"
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)
+    path = Column(String, nullable=False)
+    # Highest changelog sequence contained in the backup.
+    seq = Column(Integer, nullable=False)
+    created_at = Column(Float, nullable=False)
+
+
+class SchemaVersion(Base):
+    __tablename__ = "schema_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False)
+
 
 User.passwords = relationship(
     "Password", back_populates="user", cascade="all, delete, delete-orphan"
 )
 
+# The trigram tokenizer indexes every three-character substring, so FTS5 can
+# answer substring and prefix queries without scanning the passwords table.
+SEARCH_INDEX_DDL = (
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS passwords_fts USING fts5(
+        title, username, content='passwords', content_rowid='id',
+        tokenize='trigram'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS passwords_fts_insert AFTER INSERT ON passwords
+    BEGIN
+        INSERT INTO passwords_fts(rowid, title, username)
+        VALUES (new.id, new.title, new.username);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS passwords_fts_delete AFTER DELETE ON passwords
+    BEGIN
+        INSERT INTO passwords_fts(passwords_fts, rowid, title, username)
+        VALUES ('delete', old.id, old.title, old.username);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS passwords_fts_update
+    AFTER UPDATE OF title, username ON passwords
+    BEGIN
+        INSERT INTO passwords_fts(passwords_fts, rowid, title, username)
+        VALUES ('delete', old.id, old.title, old.username);
+        INSERT INTO passwords_fts(rowid, title, username)
+        VALUES (new.id, new.title, new.username);
+    END
+    """,
+)
+
+
+@event.listens_for(Password.__table__, "after_create")
+def _create_search_index(target, connection, **kw):
+    for statement in SEARCH_INDEX_DDL:
+        connection.exec_driver_sql(statement)
+
+
+# Every write to these tables appends its row id to the changelog. The
+# AUTOINCREMENT sequence lets incremental backups copy only the rows changed
+# since the previous backup. Until the first backup run there is nothing to
+# be incremental to, so the triggers record nothing.
+CHANGELOG_TABLES = ("users", "passwords")
+CHANGELOG_OPERATIONS = (("INSERT", "new"), ("UPDATE", "new"), ("DELETE", "old"))
+
+CHANGELOG_DDL = (
+    """
+    CREATE TABLE IF NOT EXISTS changelog (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        table_name TEXT NOT NULL,
+        row_id INTEGER NOT NULL
+    )
+    """,
+    # Triggers are recreated, so databases migrate to the current definition.
+    *(
+        f"DROP TRIGGER IF EXISTS {table}_changelog_{operation.lower()}"
+        for table in CHANGELOG_TABLES
+        for operation, _ in CHANGELOG_OPERATIONS
+    ),
+    *(
+        f"""
+        CREATE TRIGGER {table}_changelog_{operation.lower()}
+        AFTER {operation} ON {table}
+        WHEN EXISTS (SELECT 1 FROM backup_runs)
+        BEGIN
+            INSERT INTO changelog(table_name, row_id) VALUES ('{table}', {row}.id);
+        END
+        """
+        for table in CHANGELOG_TABLES
+        for operation, row in CHANGELOG_OPERATIONS
+    ),
+    # Rows recorded by older triggers before any backup existed.
+    "DELETE FROM changelog WHERE NOT EXISTS (SELECT 1 FROM backup_runs)",
+)
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_changelog(target, connection, **kw):
+    create_changelog(connection)
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _stamp_schema_version(target, connection, **kw):
+    # create_all on a new database creates the current schema. Databases that
+    # already hold rows without a version are left to the migration runner.
+    if connection.execute(select(SchemaVersion.id)).first() is not None:
+        return
+    has_rows = connection.exec_driver_sql(
+        "SELECT EXISTS (SELECT 1 FROM users) OR EXISTS (SELECT 1 FROM passwords)"
+    ).scalar()
+    if not has_rows:
+        connection.execute(insert(SchemaVersion).values(id=1, version=SCHEMA_VERSION))
+
+
+def create_changelog(connection: Connection) -> None:
+    for statement in CHANGELOG_DDL:
+        connection.exec_driver_sql(statement)
+
 
 def files_exist():
-    if not os.path.exists(".env") and os.path.exists("app.db"):
+    if not os.path.exists(".env") and os.path.exists(get_settings().database_path):
         typer.echo("Bitte erst 'init' Befehl ausführen")
         raise typer.Exit()
 
 
 def create_tables() -> None:
-    Base.metadata.create_all(bind=engine)
+    Base.metadata.create_all(bind=get_engine())
+    with get_engine().begin() as connection:
+        create_search_index(connection)
+
+
+def create_search_index(connection: Connection) -> bool:
+    exists = connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'passwords_fts'"
+    ).first()
+    if exists:
+        return False
+    for statement in SEARCH_INDEX_DDL:
+        connection.exec_driver_sql(statement)
+    connection.exec_driver_sql(
+        "INSERT INTO passwords_fts(passwords_fts) VALUES ('rebuild')"
+    )
+    return True
+
+
+def find_duplicate_titles(connection: Connection) -> List[Tuple[int, str, int]]:
+    return connection.exec_driver_sql(
+        "SELECT user_id, title, COUNT(*) FROM passwords "
+        "GROUP BY user_id, title HAVING COUNT(*) > 1"
+    ).all()
+
+
+def add_missing_columns(connection: Connection, model) -> List[str]:
+    # Nullable columns added to a model after the table was created.
+    table = model.__table__
+    existing = {
+        row[1] for row in connection.exec_driver_sql(f"PRAGMA table_info({table.name})")
+    }
+    added = []
+    for column in table.columns:
+        if column.name not in existing and column.nullable:
+            column_type = column.type.compile(dialect=connection.dialect)
+            connection.exec_driver_sql(
+                f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"
+            )
+            added.append(column.name)
+    return added
+
+
+def migrate_database(
+    chunk_size: int = 1000, progress: Optional[Callable[[str, int], None]] = None
+) -> List[Tuple[int, str, int]]:
+    from app.migrations import run_migrations
+
+    with get_engine().begin() as connection:
+        duplicates = find_duplicate_titles(connection)
+        if duplicates:
+            return duplicates
+        add_missing_columns(connection, Password)
+        for index in Password.__table__.indexes:
+            index.create(connection, checkfirst=True)
+        UserSession.__table__.create(connection, checkfirst=True)
+        KeyRotation.__table__.create(connection, checkfirst=True)
+        BackupRun.__table__.create(connection, checkfirst=True)
+        create_search_index(connection)
+        create_changelog(connection)
+    run_migrations(get_engine(), chunk_size, progress)
+    return []
+
+
+def is_busy(error: OperationalError) -> bool:
+    message = str(error.orig).lower()
+    return "locked" in message or "busy" in message
+
+
+def is_missing_table(error: OperationalError) -> bool:
+    # Raised on databases created before a table was added, until 'migrate' ran.
+    return "no such table" in str(error.orig).lower()
+
+
+def run_write(
+    db: Session, work: Callable[[], T], settings: Optional[Settings] = None
+) -> T:
+    # Runs work() in a short BEGIN IMMEDIATE transaction and commits it. When
+    # the lock is still held after busy_timeout, the whole transaction is
+    # retried with exponential backoff; other errors roll back and propagate.
+    settings = settings or get_settings()
+    attempt = 0
+    while True:
+        # A session that already read something is pinned to a connection
+        # without the write lock; end that (read-only) transaction first.
+        if db.in_transaction():
+            db.rollback()
+        try:
+            db.connection(execution_options={IMMEDIATE: True})
+            result = work()
+            db.commit()
+            return result
+        except OperationalError as error:
+            db.rollback()
+            if not is_busy(error) or attempt >= settings.write_retries:
+                raise
+            delay = min(settings.retry_delay * 2**attempt, MAX_RETRY_DELAY)
+            time.sleep(delay * random.uniform(0.5, 1.0))
+            attempt += 1
+        except BaseException:
+            db.rollback()
+            raise
+
+
+def insert_password(
+    db: Session,
+    user_id: int,
+    title: str,
+    username: str,
+    encrypted_password: str,
+    fingerprint: Optional[str] = None,
+) -> bool:
+    result = db.execute(
+        sqlite_insert(Password)
+        .values(
+            title=title,
+            username=username,
+            encrypted_password=encrypted_password,
+            user_id=user_id,
+            fingerprint=fingerprint,
+        )
+        .on_conflict_do_nothing(index_elements=["user_id", "title"])
+    )
+    return result.rowcount != 0
+
+
+def update_password(
+    db: Session,
+    user_id: int,
+    title: str,
+    username: str,
+    encrypted_password: str,
+    fingerprint: Optional[str] = None,
+) -> bool:
+    result = db.execute(
+        update(Password)
+        .where(Password.user_id == user_id, Password.title == title)
+        .values(
+            username=username,
+            encrypted_password=encrypted_password,
+            fingerprint=fingerprint,
+        )
+    )
+    return result.rowcount != 0
+
+
+def start_session(
+    db: Union[Session, Connection], user_id: int, settings: Optional[Settings] = None
+) -> str:
+    settings = settings or get_settings()
+    token = secrets.token_urlsafe(32)
+    now = time.time()
+    expires_at = now + settings.session_ttl
+    db.execute(delete(UserSession).where(UserSession.expires_at < now))
+    db.execute(
+        insert(UserSession).values(
+            token_hash=hash_token(token), user_id=user_id, expires_at=expires_at
+        )
+    )
+    write_session(token, user_id, expires_at, settings)
+    return token
+
+
+def end_session(db: Session) -> None:
+    session = read_session()
+    if session is not None:
+        db.execute(
+            delete(UserSession).where(
+                UserSession.token_hash == hash_token(session["token"])
+            )
+        )
+    remove_session()
+
+
+def resolve_token(db: Session, token: str) -> Optional[User]:
+    user_session = db.get(UserSession, hash_token(token))
+    if user_session is None or user_session.expires_at < time.time():
+        return None
+    return db.get(User, user_session.user_id)
 
 
 def get_logged_in_user(db: Session) -> Optional[User]:
     files_exist()
-    return db.query(User).filter(User.is_logged_in).first()
+    # A valid cached token is trusted without a sessions lookup; the user row
+    # is fetched by primary key (or taken from the identity map in the shell).
+    session = read_session()
+    if session is None:
+        return None
+    return db.get(User, session["user_id"])
 
 
 def get_user_by_username(username: str, db: Session) -> Optional[User]:
@@ -63,10 +527,31 @@ def get_user_by_username(username: str, db: Session) -> Optional[User]:
     return user
 
 
+# Set by shared_session() so that every command run from the interactive shell
+# reuses one session and its identity map.
+_shared_session: Optional[Session] = None
+
+
 @contextmanager
 def get_db_session():
-    db = SessionLocal()
+    if _shared_session is not None:
+        yield _shared_session
+        return
+
+    db = get_sessionmaker()()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@contextmanager
+def shared_session():
+    global _shared_session
+    db = get_sessionmaker()(expire_on_commit=False)
+    _shared_session = db
     try:
         yield db
     finally:
+        _shared_session = None
         db.close()
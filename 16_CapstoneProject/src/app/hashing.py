@@ -0,0 +1,176 @@
+import hashlib
+import hmac
+import os
+import struct
+import time
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from typing import Dict, Optional, Union
+
+from app.config import Settings, get_settings
+from app.profiling import phase
+
+SALT_LENGTH = 16
+HASH_LENGTH = 32
+SCRYPT = "scrypt"
+PBKDF2 = "pbkdf2_sha256"
+ALGORITHMS = (SCRYPT, PBKDF2)
+
+# Binary storage format of a hash: one tag byte, the KDF parameters, the salt
+# length, then salt and digest. Strings that do not parse are kept verbatim
+# behind OPAQUE, so packing never loses information.
+LEGACY, SCRYPT_TAG, PBKDF2_TAG, OPAQUE = 0, 1, 2, 255
+SCRYPT_HEADER = struct.Struct("<BIHHB")
+PBKDF2_HEADER = struct.Struct("<BIB")
+
+
+def _b64encode(data: bytes) -> str:
+    return urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def _b64decode(data: str) -> bytes:
+    return urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    with phase("kdf"):
+        return hashlib.scrypt(
+            password.encode(),
+            salt=salt,
+            n=n,
+            r=r,
+            p=p,
+            maxmem=256 * n * r + 1024 * 1024,
+            dklen=HASH_LENGTH,
+        )
+
+
+def _pbkdf2(password: str, salt: bytes, iterations: int) -> bytes:
+    with phase("kdf"):
+        return hashlib.pbkdf2_hmac(
+            "sha256", password.encode(), salt, iterations, HASH_LENGTH
+        )
+
+
+def _parameters(settings: Settings) -> Dict[str, int]:
+    if settings.kdf_algorithm == SCRYPT:
+        return {"n": settings.scrypt_n, "r": settings.scrypt_r, "p": settings.scrypt_p}
+    if settings.kdf_algorithm == PBKDF2:
+        return {"iterations": settings.pbkdf2_iterations}
+    raise ValueError(f"Unbekannter Algorithmus: {settings.kdf_algorithm}")
+
+
+def hash_password(password: str, settings: Optional[Settings] = None) -> str:
+    settings = settings or get_settings()
+    parameters = _parameters(settings)
+    salt = os.urandom(SALT_LENGTH)
+    if settings.kdf_algorithm == SCRYPT:
+        digest = _scrypt(password, salt, **parameters)
+    else:
+        digest = _pbkdf2(password, salt, **parameters)
+    encoded_parameters = "$".join(str(value) for value in parameters.values())
+    return (
+        f"{settings.kdf_algorithm}${encoded_parameters}"
+        f"${_b64encode(salt)}${_b64encode(digest)}"
+    )
+
+
+def verify_password(password: str, hashed_password: Union[str, bytes]) -> bool:
+    if isinstance(hashed_password, bytes):
+        hashed_password = hashed_password.decode()
+
+    algorithm, _, encoded = hashed_password.partition("$")
+    if algorithm == SCRYPT:
+        n, r, p, salt, digest = encoded.split("$")
+        candidate = _scrypt(password, _b64decode(salt), int(n), int(r), int(p))
+    elif algorithm == PBKDF2:
+        iterations, salt, digest = encoded.split("$")
+        candidate = _pbkdf2(password, _b64decode(salt), int(iterations))
+    else:
+        # Legacy format: unsalted urlsafe base64 SHA-256 digest.
+        candidate = hashlib.sha256(password.encode()).digest()
+        digest = hashed_password
+    return hmac.compare_digest(candidate, _b64decode(digest.rstrip("=")))
+
+
+def _pack(hashed_password: str) -> bytes:
+    algorithm, _, encoded = hashed_password.partition("$")
+    if algorithm == SCRYPT:
+        n, r, p, salt, digest = encoded.split("$")
+        salt = _b64decode(salt)
+        header = SCRYPT_HEADER.pack(SCRYPT_TAG, int(n), int(r), int(p), len(salt))
+    elif algorithm == PBKDF2:
+        iterations, salt, digest = encoded.split("$")
+        salt = _b64decode(salt)
+        header = PBKDF2_HEADER.pack(PBKDF2_TAG, int(iterations), len(salt))
+    else:
+        return bytes([LEGACY]) + _b64decode(hashed_password.rstrip("="))
+    return header + salt + _b64decode(digest)
+
+
+def pack_hash(hashed_password: str) -> bytes:
+    try:
+        packed = _pack(hashed_password)
+        if unpack_hash(packed) == hashed_password:
+            return packed
+    except (ValueError, struct.error):
+        pass
+    return bytes([OPAQUE]) + hashed_password.encode()
+
+
+def unpack_hash(packed: bytes) -> str:
+    tag, body = packed[0], packed[1:]
+    if tag == SCRYPT_TAG:
+        _, n, r, p, salt_length = SCRYPT_HEADER.unpack_from(packed)
+        rest = packed[SCRYPT_HEADER.size :]
+        prefix = f"{SCRYPT}${n}${r}${p}"
+    elif tag == PBKDF2_TAG:
+        _, iterations, salt_length = PBKDF2_HEADER.unpack_from(packed)
+        rest = packed[PBKDF2_HEADER.size :]
+        prefix = f"{PBKDF2}${iterations}"
+    elif tag == LEGACY:
+        # Legacy hashes were stored as padded base64.
+        return urlsafe_b64encode(body).decode()
+    elif tag == OPAQUE:
+        return body.decode()
+    else:
+        # The original schema wrote the base64 digest itself as bytes. Its
+        # first byte is printable ASCII, which no tag above uses.
+        return packed.decode()
+    salt, digest = rest[:salt_length], rest[salt_length:]
+    return f"{prefix}${_b64encode(salt)}${_b64encode(digest)}"
+
+
+def needs_rehash(
+    hashed_password: Union[str, bytes], settings: Optional[Settings] = None
+) -> bool:
+    settings = settings or get_settings()
+    if isinstance(hashed_password, bytes):
+        hashed_password = hashed_password.decode()
+
+    algorithm, _, encoded = hashed_password.partition("$")
+    if algorithm != settings.kdf_algorithm:
+        return True
+    current = "$".join(str(value) for value in _parameters(settings).values())
+    return encoded.rsplit("$", 2)[0] != current
+
+
+def _measure(function, *args) -> float:
+    started = time.perf_counter()
+    function(*args)
+    return (time.perf_counter() - started) * 1000
+
+
+def calibrate(target_ms: float, algorithm: str = SCRYPT) -> Dict[str, int]:
+    salt = os.urandom(SALT_LENGTH)
+    if algorithm == SCRYPT:
+        # Doubling n doubles time and memory; stop at the first n over the target.
+        n, r, p = 2**12, 8, 1
+        while _measure(_scrypt, "calibrate", salt, n, r, p) < target_ms and n < 2**20:
+            n *= 2
+        return {"scrypt_n": n, "scrypt_r": r, "scrypt_p": p}
+    if algorithm == PBKDF2:
+        sample_iterations = 50_000
+        elapsed = _measure(_pbkdf2, "calibrate", salt, sample_iterations)
+        iterations = int(sample_iterations * target_ms / max(elapsed, 0.001))
+        return {"pbkdf2_iterations": max(iterations, 100_000)}
+    raise ValueError(f"Unbekannter Algorithmus: {algorithm}")
@@ -0,0 +1,138 @@
+from typing import Callable, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection, Engine
+
+from app.database import IMMEDIATE, SCHEMA_VERSION, SchemaVersion, pack_token
+from app.hashing import (LEGACY, OPAQUE, PBKDF2_TAG, SCRYPT_TAG, pack_hash,
+                         unpack_hash)
+
+# Data migrations between schema versions. Each one converts rows in short
+# chunks, so it can run while the vault is in use and resumes where it
+# stopped; the version is only raised once every row is converted.
+
+# Databases without a schema_version row.
+BASE_VERSION = 1
+CHUNK_SIZE = 1000
+# Rows still in the old format: text, as written by the VARCHAR columns.
+UNCONVERTED = "typeof({column}) = 'text'"
+# The original schema also wrote password hashes as base64 bytes; those BLOBs
+# start with a printable character instead of a hash tag.
+HASH_TAGS = ", ".join(
+    f"'{tag:02X}'" for tag in (LEGACY, SCRYPT_TAG, PBKDF2_TAG, OPAQUE)
+)
+UNCONVERTED_HASH = (
+    UNCONVERTED + " OR hex(substr({column}, 1, 1)) NOT IN (" + HASH_TAGS + ")"
+)
+
+Progress = Optional[Callable[[str, int], None]]
+
+
+def get_schema_version(connection: Connection) -> int:
+    exists = connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'"
+    ).first()
+    if not exists:
+        return BASE_VERSION
+    version = connection.execute(select(SchemaVersion.version)).scalar()
+    return BASE_VERSION if version is None else version
+
+
+def set_schema_version(connection: Connection, version: int) -> None:
+    statement = sqlite_insert(SchemaVersion).values(id=1, version=version)
+    connection.execute(
+        statement.on_conflict_do_update(
+            index_elements=["id"], set_={"version": statement.excluded.version}
+        )
+    )
+
+
+def needs_migration(connection: Connection) -> bool:
+    return get_schema_version(connection) < SCHEMA_VERSION
+
+
+def convert_column(
+    engine: Engine,
+    table: str,
+    column: str,
+    convert: Callable[[str], bytes],
+    chunk_size: int = CHUNK_SIZE,
+    progress: Progress = None,
+    unconverted: str = UNCONVERTED,
+) -> int:
+    condition = unconverted.format(column=column)
+    converted = 0
+    last_id = 0
+    with engine.connect() as connection:
+        connection = connection.execution_options(**{IMMEDIATE: True})
+        while True:
+            with connection.begin():
+                rows = connection.exec_driver_sql(
+                    f"SELECT id, {column} FROM {table} "
+                    f"WHERE id > ? AND ({condition}) ORDER BY id LIMIT ?",
+                    (last_id, chunk_size),
+                ).all()
+                if not rows:
+                    return converted
+                connection.exec_driver_sql(
+                    f"UPDATE {table} SET {column} = ? WHERE id = ?",
+                    [(convert(value), row_id) for row_id, value in rows],
+                )
+            last_id = rows[-1][0]
+            converted += len(rows)
+            if progress is not None:
+                progress(f"{table}.{column}", converted)
+
+
+def _pack_stored_hash(value) -> bytes:
+    return pack_hash(unpack_hash(value) if isinstance(value, bytes) else value)
+
+
+def _binary_storage(engine: Engine, chunk_size: int, progress: Progress) -> None:
+    convert_column(
+        engine,
+        "users",
+        "hashed_password",
+        _pack_stored_hash,
+        chunk_size,
+        progress,
+        UNCONVERTED_HASH,
+    )
+    convert_column(
+        engine, "passwords", "encrypted_password", pack_token, chunk_size, progress
+    )
+    convert_column(
+        engine, "passwords", "fingerprint", bytes.fromhex, chunk_size, progress
+    )
+
+
+# (version, migration) in ascending order.
+MIGRATIONS = ((2, _binary_storage),)
+
+
+def run_migrations(
+    engine: Engine, chunk_size: int = CHUNK_SIZE, progress: Progress = None
+) -> List[int]:
+    with engine.begin() as connection:
+        SchemaVersion.__table__.create(connection, checkfirst=True)
+        version = get_schema_version(connection)
+
+    applied = []
+    for target, migration in MIGRATIONS:
+        if version >= target:
+            continue
+        migration(engine, chunk_size, progress)
+        with engine.begin() as connection:
+            set_schema_version(connection, target)
+        version = target
+        applied.append(target)
+    return applied
+
+
+def vacuum(engine: Engine) -> None:
+    # Rewrites the file so the space freed by the conversion is returned.
+    with engine.connect() as connection:
+        connection.execution_options(isolation_level="AUTOCOMMIT").exec_driver_sql(
+            "VACUUM"
+        )
@@ -0,0 +1,57 @@
+import csv
+import io
+import json
+from typing import Dict, List
+
+# Row serializers shared by export and get_passwords. Only the standard
+# library is used, so agent-backed listings do not import SQLAlchemy.
+
+EXPORT_FIELDS = ("title", "username", "password")
+# Formats that can be written chunk by chunk; "grid" needs every row up front.
+STREAM_FORMATS = ("plain", "jsonl", "csv", "tsv")
+PLAIN_HEADERS = ("Titel", "Benutzername", "Passwort")
+PLAIN_WIDTHS = (32, 24)
+MASKED_PASSWORD = "********"
+
+
+def _fit(value: str, width: int) -> str:
+    if len(value) > width:
+        value = value[: width - 1] + "…"
+    return value.ljust(width)
+
+
+def _plain_line(values) -> str:
+    title, username, password = values
+    title_width, username_width = PLAIN_WIDTHS
+    return f"{_fit(title, title_width)}  {_fit(username, username_width)}  {password}\n"
+
+
+def serialize_chunk(
+    entries: List[Dict[str, str]], file_format: str, header: bool
+) -> str:
+    buffer = io.StringIO()
+    if file_format in ("csv", "tsv"):
+        writer = csv.DictWriter(
+            buffer,
+            fieldnames=EXPORT_FIELDS,
+            delimiter="\t" if file_format == "tsv" else ",",
+            lineterminator="\n",
+        )
+        if header:
+            writer.writeheader()
+        writer.writerows(entries)
+    elif file_format == "plain":
+        # Fixed column widths, so no row has to be measured before printing.
+        if header:
+            buffer.write(_plain_line(PLAIN_HEADERS))
+            buffer.write(
+                _plain_line(["-" * width for width in PLAIN_WIDTHS] + ["-" * 8])
+            )
+        for entry in entries:
+            buffer.write(_plain_line([entry[field] for field in EXPORT_FIELDS]))
+    elif file_format == "jsonl":
+        for entry in entries:
+            buffer.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    else:
+        raise ValueError(f"Unbekanntes Format: {file_format}")
+    return buffer.getvalue()
@@ -0,0 +1,141 @@
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List, Optional
+
+import typer
+
+from app import STARTED
+
+# Timing hooks used by --profile. While profiling is disabled, phase() hands
+# out a shared nullcontext and no SQLAlchemy listeners are registered.
+
+QUERY_LABEL_LENGTH = 60
+
+_enabled = False
+_command_started = 0.0
+_timings: Dict[str, List[float]] = defaultdict(list)
+_profiler = None
+_profile_output: Optional[str] = None
+_local = threading.local()
+_disabled = nullcontext()
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def record(name: str, seconds: float) -> None:
+    _timings[name].append(seconds)
+
+
+@contextmanager
+def _timed(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - started)
+
+
+def phase(name: str):
+    return _timed(name) if _enabled else _disabled
+
+
+def _query_label(statement: str) -> str:
+    label = " ".join(statement.split())
+    if len(label) > QUERY_LABEL_LENGTH:
+        label = label[: QUERY_LABEL_LENGTH - 3] + "..."
+    return f"query: {label}"
+
+
+def _before_connect(dialect, conn_rec, cargs, cparams):
+    _local.connect_started = time.perf_counter()
+
+
+def _after_connect(dbapi_connection, connection_record):
+    started = getattr(_local, "connect_started", None)
+    if started is not None:
+        record("db connect", time.perf_counter() - started)
+        _local.connect_started = None
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("profiling_started", []).append(time.perf_counter())
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["profiling_started"].pop()
+    record(_query_label(statement), time.perf_counter() - started)
+
+
+def enable(profile_output: Optional[str] = None) -> None:
+    global _enabled, _command_started, _profiler, _profile_output
+
+    record("startup", time.perf_counter() - STARTED)
+    with _timed("imports"):
+        import cryptography.fernet  # noqa: F401
+        import tabulate  # noqa: F401
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+        from sqlalchemy.pool import Pool
+
+        import app.database  # noqa: F401
+        import app.utils  # noqa: F401
+
+    event.listen(Engine, "do_connect", _before_connect)
+    event.listen(Pool, "connect", _after_connect)
+    event.listen(Engine, "before_cursor_execute", _before_execute)
+    event.listen(Engine, "after_cursor_execute", _after_execute)
+
+    if profile_output:
+        import cProfile
+
+        _profiler = cProfile.Profile()
+        _profile_output = profile_output
+        _profiler.enable()
+
+    _enabled = True
+    _command_started = time.perf_counter()
+
+
+def disable() -> None:
+    global _enabled, _profiler, _profile_output
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+    from sqlalchemy.pool import Pool
+
+    _enabled = False
+    for target, name, listener in (
+        (Engine, "do_connect", _before_connect),
+        (Pool, "connect", _after_connect),
+        (Engine, "before_cursor_execute", _before_execute),
+        (Engine, "after_cursor_execute", _after_execute),
+    ):
+        if event.contains(target, name, listener):
+            event.remove(target, name, listener)
+    _timings.clear()
+    _profiler = None
+    _profile_output = None
+
+
+def report() -> None:
+    total = time.perf_counter() - _command_started
+    if _profiler is not None:
+        _profiler.disable()
+        _profiler.dump_stats(_profile_output)
+
+    typer.echo("Profil:", err=True)
+    for name, timings in _timings.items():
+        typer.echo(
+            f"  {name:{QUERY_LABEL_LENGTH + 7}} {sum(timings) * 1000:9.2f} ms"
+            f"  ({len(timings)}x)",
+            err=True,
+        )
+    typer.echo(
+        f"  {'command total':{QUERY_LABEL_LENGTH + 7}} {total * 1000:9.2f} ms", err=True
+    )
+    if _profile_output:
+        typer.echo(f"cProfile-Daten gespeichert in {_profile_output}", err=True)
+    disable()
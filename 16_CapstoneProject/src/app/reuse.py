@@ -0,0 +1,80 @@
+from itertools import groupby
+from typing import List, Optional
+
+from sqlalchemy import bindparam, select, text, update
+from sqlalchemy.orm import Session
+
+from app.database import Password, run_write
+from app.utils import decrypt_many, fingerprint_many
+
+# Titles of passwords that share a fingerprint; the subquery is answered from
+# ix_passwords_user_id_fingerprint alone.
+REUSED_PASSWORDS = text(
+    """
+    SELECT fingerprint, title
+    FROM passwords
+    WHERE user_id = :user_id
+      AND fingerprint IN (
+        SELECT fingerprint FROM passwords
+        WHERE user_id = :user_id AND fingerprint IS NOT NULL
+        GROUP BY fingerprint
+        HAVING COUNT(*) > 1
+      )
+    ORDER BY fingerprint, title
+    """
+)
+
+
+def find_reused(db: Session, user_id: int) -> List[List[str]]:
+    rows = db.execute(REUSED_PASSWORDS, {"user_id": user_id})
+    groups = [
+        [row.title for row in group]
+        for _, group in groupby(rows, lambda row: row.fingerprint)
+    ]
+    return sorted(groups, key=lambda titles: (-len(titles), titles))
+
+
+def backfill_fingerprints(
+    db: Session,
+    user_id: int,
+    chunk_size: int = 1000,
+    workers: Optional[int] = None,
+) -> int:
+    # Rows written before fingerprints existed are decrypted once, chunk by
+    # chunk; each chunk is its own short write transaction.
+    table = Password.__table__
+    filled = 0
+    last_id = 0
+    while True:
+        rows = db.execute(
+            select(Password.id, Password.encrypted_password)
+            .where(
+                Password.user_id == user_id,
+                Password.fingerprint.is_(None),
+                Password.id > last_id,
+            )
+            .order_by(Password.id)
+            .limit(chunk_size)
+        ).all()
+        if not rows:
+            return filled
+
+        fingerprints = fingerprint_many(
+            decrypt_many([row.encrypted_password for row in rows], workers=workers)
+        )
+        parameters = [
+            {"row_id": row.id, "new_fingerprint": fingerprint}
+            for row, fingerprint in zip(rows, fingerprints)
+        ]
+        run_write(
+            db,
+            lambda: db.connection().execute(
+                update(table)
+                .where(table.c.id == bindparam("row_id"))
+                .where(table.c.fingerprint.is_(None))
+                .values(fingerprint=bindparam("new_fingerprint")),
+                parameters,
+            ),
+        )
+        last_id = rows[-1].id
+        filled += len(rows)
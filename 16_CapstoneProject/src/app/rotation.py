@@ -0,0 +1,84 @@
+import hashlib
+from typing import Callable, Optional
+
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.orm import Session
+
+from app.database import KeyRotation, Password, run_write
+from app.utils import rotate_many
+
+CHECKPOINT_ID = 1
+
+
+def key_fingerprint(key: bytes) -> str:
+    return hashlib.sha256(key).hexdigest()[:16]
+
+
+def get_checkpoint(db: Session) -> Optional[KeyRotation]:
+    return db.get(KeyRotation, CHECKPOINT_ID)
+
+
+def start_rotation(db: Session, key: bytes) -> KeyRotation:
+    checkpoint = KeyRotation(
+        id=CHECKPOINT_ID, key_fingerprint=key_fingerprint(key), last_id=0, rotated=0
+    )
+    run_write(db, lambda: db.add(checkpoint))
+    return checkpoint
+
+
+def rotate_rows(
+    db: Session,
+    checkpoint: KeyRotation,
+    batch_size: int = 1000,
+    workers: Optional[int] = None,
+    use_processes: bool = False,
+    progress: Optional[Callable[[int], None]] = None,
+) -> int:
+    # Each batch is re-encrypted and written together with the new checkpoint
+    # in one transaction, so an interrupted run resumes after the last batch.
+    rotated = 0
+    while True:
+        rows = db.execute(
+            select(Password.id, Password.encrypted_password)
+            .where(Password.id > checkpoint.last_id)
+            .order_by(Password.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return rotated
+
+        encrypted_passwords = rotate_many(
+            [row.encrypted_password for row in rows],
+            workers=workers,
+            use_processes=use_processes,
+        )
+
+        def work():
+            # Rows changed by another writer since they were read keep the
+            # newer value instead of being overwritten with the old one.
+            table = Password.__table__
+            db.connection().execute(
+                update(table)
+                .where(table.c.id == bindparam("row_id"))
+                .where(table.c.encrypted_password == bindparam("old_password"))
+                .values(encrypted_password=bindparam("new_password")),
+                [
+                    {
+                        "row_id": row.id,
+                        "old_password": row.encrypted_password,
+                        "new_password": encrypted_password,
+                    }
+                    for row, encrypted_password in zip(rows, encrypted_passwords)
+                ],
+            )
+            checkpoint.last_id = rows[-1].id
+            checkpoint.rotated += len(rows)
+
+        run_write(db, work)
+        rotated += len(rows)
+        if progress is not None:
+            progress(checkpoint.rotated)
+
+
+def finish_rotation(db: Session, checkpoint: KeyRotation) -> None:
+    run_write(db, lambda: db.delete(checkpoint))
@@ -0,0 +1,114 @@
+from difflib import SequenceMatcher
+from typing import List
+
+from sqlalchemy import text
+from sqlalchemy.engine import Row
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from app.database import create_search_index
+
+# The trigram tokenizer cannot match queries shorter than three characters.
+TRIGRAM_LENGTH = 3
+
+FTS_SEARCH = text(
+    """
+    SELECT p.title, p.username
+    FROM passwords_fts
+    JOIN passwords AS p ON p.id = passwords_fts.rowid
+    WHERE passwords_fts MATCH :match
+      AND p.user_id = :user_id
+      AND (p.title LIKE :pattern ESCAPE '\\' OR p.username LIKE :pattern ESCAPE '\\')
+    ORDER BY passwords_fts.rank
+    LIMIT :limit
+    """
+)
+
+LIKE_SEARCH = text(
+    """
+    SELECT title, username
+    FROM passwords
+    WHERE user_id = :user_id
+      AND (title LIKE :pattern ESCAPE '\\' OR username LIKE :pattern ESCAPE '\\')
+    ORDER BY title
+    LIMIT :limit
+    """
+)
+
+# Titles sharing any trigram with the query, best bm25 score first. The
+# candidates come from the index, so the edit-distance ranking below only
+# looks at SUGGESTION_CANDIDATES titles instead of the whole vault.
+TRIGRAM_CANDIDATES = text(
+    """
+    SELECT p.title
+    FROM passwords_fts
+    JOIN passwords AS p ON p.id = passwords_fts.rowid
+    WHERE passwords_fts MATCH :match
+      AND p.user_id = :user_id
+    ORDER BY passwords_fts.rank
+    LIMIT :limit
+    """
+)
+SUGGESTION_CANDIDATES = 50
+# Same cutoff as difflib.get_close_matches.
+SUGGESTION_CUTOFF = 0.6
+
+
+def _fts_phrase(query: str) -> str:
+    return '"' + query.replace('"', '""') + '"'
+
+
+def _like_pattern(query: str, prefix: bool) -> str:
+    escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"{escaped}%" if prefix else f"%{escaped}%"
+
+
+def search_passwords(
+    db: Session, user_id: int, query: str, prefix: bool = False, limit: int = 50
+) -> List[Row]:
+    parameters = {
+        "user_id": user_id,
+        "pattern": _like_pattern(query, prefix),
+        "limit": limit,
+    }
+    if len(query) < TRIGRAM_LENGTH:
+        return db.execute(LIKE_SEARCH, parameters).all()
+
+    if create_search_index(db.connection()):
+        db.commit()
+    parameters["match"] = _fts_phrase(query)
+    return db.execute(FTS_SEARCH, parameters).all()
+
+
+def _trigram_query(title: str) -> str:
+    trigrams = {
+        title[start : start + TRIGRAM_LENGTH]
+        for start in range(len(title) - TRIGRAM_LENGTH + 1)
+    }
+    return "title : (" + " OR ".join(sorted(map(_fts_phrase, trigrams))) + ")"
+
+
+def suggest_titles(db: Session, user_id: int, title: str, limit: int = 3) -> List[str]:
+    if len(title) < TRIGRAM_LENGTH:
+        return []
+    try:
+        candidates = db.execute(
+            TRIGRAM_CANDIDATES,
+            {
+                "match": _trigram_query(title),
+                "user_id": user_id,
+                "limit": SUGGESTION_CANDIDATES,
+            },
+        ).all()
+    except OperationalError:
+        # Databases from before the search index; 'migrate' creates it.
+        return []
+
+    query = title.lower()
+    scored = []
+    for (candidate,) in candidates:
+        score = SequenceMatcher(None, query, candidate.lower()).ratio()
+        if score >= SUGGESTION_CUTOFF:
+            scored.append((score, candidate))
+    scored.sort(key=lambda item: (-item[0], item[1]))
+    return [candidate for _, candidate in scored[:limit]]
@@ -0,0 +1,214 @@
+import json
+import threading
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from app.vault import Vault, VaultError
+
+# Localhost HTTP/JSON API for tools that should not fork the CLI per lookup.
+# Clients authenticate with the session token issued by 'login'
+# (Authorization: Bearer <token>). Requests share the pooled engine and the
+# cached cipher; resolved tokens are cached briefly so a lookup costs one query.
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# Upper bound for how long a revoked token keeps working.
+TOKEN_CACHE_SECONDS = 30.0
+
+ERROR_STATUS = {
+    "unauthorized": HTTPStatus.UNAUTHORIZED,
+    "not_logged_in": HTTPStatus.UNAUTHORIZED,
+    "not_found": HTTPStatus.NOT_FOUND,
+    "unknown_route": HTTPStatus.NOT_FOUND,
+    "exists": HTTPStatus.CONFLICT,
+    "invalid_request": HTTPStatus.BAD_REQUEST,
+    "busy": HTTPStatus.SERVICE_UNAVAILABLE,
+}
+
+# (method, resource, with title) -> handler method
+ROUTES = {
+    ("GET", "passwords", False): "_list",
+    ("GET", "passwords", True): "_get",
+    ("POST", "passwords", False): "_create",
+    ("PUT", "passwords", True): "_update",
+    ("DELETE", "passwords", True): "_delete",
+    ("GET", "search", False): "_search",
+}
+
+
+def _entry(entry) -> dict:
+    return entry._asdict()
+
+
+def _flag(query: Dict[str, list], name: str) -> bool:
+    return query.get(name, ["0"])[0].lower() in ("1", "true", "yes")
+
+
+class VaultRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are separate writes; with Nagle enabled every
+    # keep-alive response waits for the client's delayed ACK (~40 ms).
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _dispatch(self, method: str) -> None:
+        url = urlsplit(self.path)
+        parts = [unquote(part) for part in url.path.split("/") if part]
+        try:
+            body = self._read_body()
+        except ValueError:
+            # Without a usable length the next request on this connection
+            # cannot be found, so answer and close it.
+            self.close_connection = True
+            self._error("invalid_request")
+            return
+
+        if method == "GET" and parts == ["health"]:
+            self._send(HTTPStatus.OK, {"ok": True, "result": "ok"})
+            return
+
+        route = ROUTES.get((method, parts[0] if parts else "", len(parts) == 2))
+        if route is None or len(parts) > 2:
+            self._error("unknown_route")
+            return
+
+        with self.server.sessionmaker() as db:
+            user_id = self.server.authenticate(db, self._token())
+            if user_id is None:
+                self._error("unauthorized")
+                return
+            try:
+                status, result = getattr(self, route)(
+                    Vault(db, user_id), parts[1:], parse_qs(url.query), body
+                )
+            except VaultError as error:
+                self._error(error.code, getattr(error, "suggestions", None))
+                return
+            except (KeyError, TypeError, ValueError):
+                self._error("invalid_request")
+                return
+        self._send(status, {"ok": True, "result": result})
+
+    def _token(self) -> Optional[str]:
+        scheme, _, token = self.headers.get("Authorization", "").partition(" ")
+        return token.strip() if scheme.lower() == "bearer" and token else None
+
+    def _read_body(self):
+        header = self.headers.get("Content-Length") or "0"
+        if not header.isdigit():
+            raise ValueError(f"Invalid Content-Length: {header!r}")
+        length = int(header)
+        if not length:
+            return None
+        try:
+            return json.loads(self.rfile.read(length))
+        except ValueError:
+            return None
+
+    def _send(self, status: HTTPStatus, payload: dict) -> None:
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _error(self, error: str, suggestions: Optional[list] = None) -> None:
+        status = ERROR_STATUS.get(error, HTTPStatus.INTERNAL_SERVER_ERROR)
+        payload = {"ok": False, "error": error}
+        if suggestions:
+            payload["suggestions"] = suggestions
+        self._send(status, payload)
+
+    def _list(self, vault: Vault, path: list, query: dict, body) -> Tuple[int, list]:
+        reveal = query.get("reveal", [None])[0]
+        entries = vault.list(masked=_flag(query, "masked"), reveal=reveal)
+        return HTTPStatus.OK, [_entry(entry) for entry in entries]
+
+    def _get(self, vault: Vault, path: list, query: dict, body) -> Tuple[int, dict]:
+        return HTTPStatus.OK, _entry(vault.get(path[0]))
+
+    def _create(self, vault: Vault, path: list, query: dict, body) -> Tuple[int, None]:
+        vault.create(body["title"], body["username"], body["password"])
+        return HTTPStatus.CREATED, None
+
+    def _update(self, vault: Vault, path: list, query: dict, body) -> Tuple[int, None]:
+        vault.update(path[0], body["username"], body["password"])
+        return HTTPStatus.OK, None
+
+    def _delete(self, vault: Vault, path: list, query: dict, body) -> Tuple[int, None]:
+        vault.delete(path[0])
+        return HTTPStatus.OK, None
+
+    def _search(self, vault: Vault, path: list, query: dict, body) -> Tuple[int, list]:
+        results = vault.search(
+            query["q"][0],
+            prefix=_flag(query, "prefix"),
+            limit=int(query.get("limit", ["50"])[0]),
+        )
+        return HTTPStatus.OK, [
+            {"title": result.title, "username": result.username} for result in results
+        ]
+
+
+class VaultServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], verbose: bool = False):
+        from app.database import get_sessionmaker
+        from app.utils import get_cipher
+
+        get_cipher()
+        self.sessionmaker = get_sessionmaker()
+        self.verbose = verbose
+        self._lock = threading.Lock()
+        # token hash -> (user_id, cached until)
+        self._tokens: Dict[str, Tuple[int, float]] = {}
+        super().__init__(address, VaultRequestHandler)
+
+    def authenticate(self, db, token: Optional[str]) -> Optional[int]:
+        from app.database import resolve_token
+        from app.sessions import hash_token
+
+        if not token:
+            return None
+        token_hash = hash_token(token)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._tokens.get(token_hash)
+        if cached is not None and cached[1] > now:
+            return cached[0]
+
+        user = resolve_token(db, token)
+        with self._lock:
+            if user is None:
+                self._tokens.pop(token_hash, None)
+                return None
+            self._tokens[token_hash] = (user.id, now + TOKEN_CACHE_SECONDS)
+        return user.id
+
+
+def create_server(
+    host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, verbose: bool = False
+) -> VaultServer:
+    return VaultServer((host, port), verbose=verbose)
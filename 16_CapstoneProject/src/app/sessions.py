@@ -0,0 +1,58 @@
+import hashlib
+import json
+import os
+import time
+from typing import Optional
+
+from app.config import Settings, get_settings
+
+# Local cache of the current login token. The file lives outside the project
+# directory with mode 0600 and is keyed by the database path, so resolving the
+# logged-in user only needs a primary key lookup instead of a scan of users.
+
+SESSION_DIR_ENV = "PM_SESSION_DIR"
+DEFAULT_SESSION_DIR = os.path.join("~", ".password_manager_sessions")
+
+
+def session_dir() -> str:
+    return os.path.expanduser(os.environ.get(SESSION_DIR_ENV) or DEFAULT_SESSION_DIR)
+
+
+def session_file(settings: Optional[Settings] = None) -> str:
+    settings = settings or get_settings()
+    database = hashlib.sha256(os.path.abspath(settings.database_path).encode())
+    return os.path.join(session_dir(), f"{database.hexdigest()[:16]}.json")
+
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def write_session(
+    token: str, user_id: int, expires_at: float, settings: Optional[Settings] = None
+) -> None:
+    path = session_file(settings)
+    os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+    descriptor = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(descriptor, "w") as session:
+        json.dump(
+            {"token": token, "user_id": user_id, "expires_at": expires_at}, session
+        )
+
+
+def read_session(settings: Optional[Settings] = None) -> Optional[dict]:
+    try:
+        with open(session_file(settings)) as session:
+            data = json.load(session)
+    except (OSError, ValueError):
+        return None
+    if data.get("expires_at", 0) < time.time():
+        return None
+    return data
+
+
+def remove_session(settings: Optional[Settings] = None) -> None:
+    try:
+        os.unlink(session_file(settings))
+    except FileNotFoundError:
+        pass
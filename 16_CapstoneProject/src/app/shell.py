@@ -0,0 +1,106 @@
+import cmd
+import os
+import shlex
+from typing import List
+
+import click
+import typer
+
+HISTORY_FILE = os.path.join(os.path.expanduser("~"), ".password_manager_history")
+HISTORY_LENGTH = 1000
+EXIT_COMMANDS = ("exit", "quit")
+# Commands whose first argument or prompt is a password title.
+TITLE_COMMANDS = ("show", "search", "delete_password", "update_password")
+
+
+class VaultShell(cmd.Cmd):
+    intro = "Passwort-Manager Shell. 'help' zeigt alle Befehle, 'exit' beendet."
+    prompt = "pm> "
+
+    def __init__(self, command: click.Group, db):
+        super().__init__()
+        self.command = command
+        self.db = db
+
+    def emptyline(self) -> bool:
+        return False
+
+    def do_EOF(self, line: str) -> bool:
+        typer.echo()
+        return True
+
+    def do_help(self, line: str) -> None:
+        self.dispatch([*shlex.split(line), "--help"])
+
+    def default(self, line: str) -> bool:
+        try:
+            args = shlex.split(line)
+        except ValueError as error:
+            typer.echo(f"Ungültige Eingabe: {error}")
+            return False
+        if args[0] in EXIT_COMMANDS:
+            return True
+        if args[0] == "shell":
+            typer.echo("Die Shell läuft bereits.")
+            return False
+        self.dispatch(args)
+        return False
+
+    def dispatch(self, args: List[str]) -> None:
+        try:
+            self.command.main(args, prog_name="", standalone_mode=False)
+        except click.exceptions.Exit:
+            pass
+        except click.exceptions.Abort:
+            typer.echo("\nAbgebrochen.")
+        except click.ClickException as error:
+            error.show()
+        except Exception as error:
+            self.db.rollback()
+            typer.echo(f"Fehler: {error}")
+        finally:
+            # End the read transaction so the next command sees other writers.
+            if self.db.in_transaction():
+                self.db.commit()
+
+    def completenames(self, text: str, *ignored) -> List[str]:
+        names = [*self.command.commands, *EXIT_COMMANDS]
+        return sorted(name for name in names if name.startswith(text))
+
+    def completedefault(
+        self, text: str, line: str, begidx: int, endidx: int
+    ) -> List[str]:
+        if line.split()[0] not in TITLE_COMMANDS:
+            return []
+        return [title for title in self.titles() if title.startswith(text)]
+
+    def titles(self) -> List[str]:
+        from app.vault import NotLoggedInError, Vault
+
+        try:
+            return Vault.open(self.db).titles()
+        except NotLoggedInError:
+            return []
+
+
+def _load_history():
+    try:
+        import readline
+    except ImportError:
+        return None
+    if os.path.exists(HISTORY_FILE):
+        readline.read_history_file(HISTORY_FILE)
+    readline.set_history_length(HISTORY_LENGTH)
+    return readline
+
+
+def run_shell(app: typer.Typer) -> None:
+    from app.database import shared_session
+
+    readline = _load_history()
+    with shared_session() as db:
+        try:
+            VaultShell(typer.main.get_command(app), db).cmdloop()
+        finally:
+            if readline is not None:
+                readline.write_history_file(HISTORY_FILE)
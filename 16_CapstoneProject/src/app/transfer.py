@@ -0,0 +1,344 @@
+import csv
+import io
+import json
+import os
+import time
+from dataclasses import dataclass
+from fnmatch import fnmatchcase
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO
+
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.database import Password, run_write
+from app.output import MASKED_PASSWORD, serialize_chunk
+from app.utils import decrypt_many, encrypt_many, fingerprint_many, get_cipher
+
+TITLE_FIELDS = ("title", "name", "account", "login_uri", "url", "web site")
+USERNAME_FIELDS = ("username", "login_username", "login name", "user", "login")
+PASSWORD_FIELDS = ("password", "login_password")
+IMPORT_FORMATS = ("csv", "jsonl", "json")
+# JSON exports are parsed incrementally in pieces of this many characters.
+JSON_READ_SIZE = 64 * 1024
+
+
+@dataclass
+class ImportResult:
+    imported: int = 0
+    skipped: int = 0
+    conflicts: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        rows = self.imported + self.skipped + self.conflicts
+        return rows / self.seconds if self.seconds else 0.0
+
+
+def _pick(record: Dict[str, str], fields: Iterable[str]) -> Optional[str]:
+    for field in fields:
+        value = record.get(field)
+        if value:
+            return value
+    return None
+
+
+def normalize_entry(record: dict) -> Optional[Dict[str, str]]:
+    login = record.get("login")
+    if isinstance(login, dict):
+        # Bitwarden JSON: {"name": ..., "login": {"username": ..., "password": ...}}
+        record = {key: value for key, value in record.items() if key != "login"}
+        record = {**record, **login}
+    record = {
+        str(key).strip().lower(): value.strip() if isinstance(value, str) else value
+        for key, value in record.items()
+        if key is not None
+    }
+    title = _pick(record, TITLE_FIELDS)
+    username = _pick(record, USERNAME_FIELDS) or ""
+    password = _pick(record, PASSWORD_FIELDS)
+    if not title or not password:
+        return None
+    return {"title": title, "username": username, "password": password}
+
+
+def detect_format(path: str) -> str:
+    root, extension = os.path.splitext(path.lower())
+    if extension == ".enc":
+        extension = os.path.splitext(root)[1]
+    if extension in (".jsonl", ".ndjson"):
+        return "jsonl"
+    if extension == ".json":
+        return "json"
+    return "csv"
+
+
+def decrypt_stream(tokens: Iterable[str]) -> Iterator[str]:
+    cipher = get_cipher()
+    for token in tokens:
+        token = token.strip()
+        if token:
+            # Split like open(newline=""): str.splitlines() would also break
+            # on characters such as U+2028 inside a field.
+            yield from io.StringIO(cipher.decrypt(token.encode()).decode(), newline="")
+
+
+class _JsonReader:
+    # Decodes one JSON value at a time from a stream of text pieces, so only
+    # the value being read has to fit into memory.
+    def __init__(self, pieces: Iterable[str]):
+        self._pieces = iter(pieces)
+        self._buffer = ""
+        self._position = 0
+        self._decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        piece = next(self._pieces, None)
+        if piece is None:
+            return False
+        self._buffer = self._buffer[self._position :] + piece
+        self._position = 0
+        return True
+
+    def peek(self) -> str:
+        # The next non-whitespace character, or "" at the end of the stream.
+        while True:
+            while (
+                self._position < len(self._buffer)
+                and self._buffer[self._position].isspace()
+            ):
+                self._position += 1
+            if self._position < len(self._buffer):
+                return self._buffer[self._position]
+            if not self._fill():
+                return ""
+
+    def expect(self, character: str) -> None:
+        if self.peek() != character:
+            raise ValueError(f"Ungültiges JSON: '{character}' erwartet")
+        self._position += 1
+
+    def skip(self, character: str) -> bool:
+        if self.peek() != character:
+            return False
+        self._position += 1
+        return True
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._position)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number at the end of the buffer may continue in the next piece.
+            if end == len(self._buffer) and self._fill():
+                continue
+            self._position = end
+            return value
+
+    def items(self) -> Iterator:
+        self.expect("[")
+        if self.skip("]"):
+            return
+        while True:
+            yield self.value()
+            if not self.skip(","):
+                self.expect("]")
+                return
+
+
+def _iter_json_entries(pieces: Iterable[str]) -> Iterator:
+    reader = _JsonReader(pieces)
+    if reader.peek() == "[":
+        yield from reader.items()
+        return
+
+    # Bitwarden and similar exports wrap the entries in a top-level key.
+    reader.expect("{")
+    found = False
+    while not reader.skip("}"):
+        key = reader.value()
+        reader.expect(":")
+        if not found and key in ("items", "passwords") and reader.peek() == "[":
+            found = True
+            yield from reader.items()
+        else:
+            reader.value()
+        reader.skip(",")
+
+
+def read_records(
+    path: str, file_format: Optional[str] = None, encrypted: bool = False
+) -> Iterator[dict]:
+    file_format = file_format or detect_format(path)
+    with open(path, newline="", encoding="utf-8-sig") as import_file:
+        lines = decrypt_stream(import_file) if encrypted else import_file
+        if file_format == "csv":
+            yield from csv.DictReader(lines)
+        elif file_format == "jsonl":
+            for line in lines:
+                if line.strip():
+                    yield json.loads(line)
+        elif file_format == "json":
+            if not encrypted:
+                lines = iter(lambda: import_file.read(JSON_READ_SIZE), "")
+            yield from _iter_json_entries(lines)
+        else:
+            raise ValueError(f"Unbekanntes Format: {file_format}")
+
+
+def _chunks(iterable: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _insert_chunk(db: Session, rows: List[dict]) -> int:
+    return (
+        db.connection()
+        .execute(
+            sqlite_insert(Password).on_conflict_do_nothing(
+                index_elements=["user_id", "title"]
+            ),
+            rows,
+        )
+        .rowcount
+    )
+
+
+def import_records(
+    db: Session,
+    user_id: int,
+    records: Iterable[dict],
+    chunk_size: int = 1000,
+    workers: Optional[int] = None,
+    result: Optional[ImportResult] = None,
+) -> ImportResult:
+    # Chunks are committed as they go. Callers that pass their own result can
+    # still report them when reading the source fails halfway.
+    result = result if result is not None else ImportResult()
+    started = time.perf_counter()
+    existing_titles = {
+        title
+        for (title,) in db.query(Password.title).filter(Password.user_id == user_id)
+    }
+
+    for chunk in _chunks(records, chunk_size):
+        entries = []
+        for record in chunk:
+            entry = normalize_entry(record) if isinstance(record, dict) else None
+            if entry is None:
+                result.skipped += 1
+            elif entry["title"] in existing_titles:
+                result.conflicts += 1
+            else:
+                existing_titles.add(entry["title"])
+                entries.append(entry)
+
+        if not entries:
+            continue
+
+        passwords = [entry["password"] for entry in entries]
+        encrypted_passwords = encrypt_many(passwords, workers=workers)
+        rows = [
+            {
+                "title": entry["title"],
+                "username": entry["username"],
+                "encrypted_password": encrypted_password,
+                "user_id": user_id,
+                "fingerprint": fingerprint,
+            }
+            for entry, encrypted_password, fingerprint in zip(
+                entries, encrypted_passwords, fingerprint_many(passwords)
+            )
+        ]
+        # One short write transaction per chunk; encryption stays outside it.
+        inserted = run_write(db, lambda rows=rows: _insert_chunk(db, rows))
+        result.imported += inserted
+        result.conflicts += len(entries) - inserted
+
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+def iter_decrypted_chunks(
+    db: Session,
+    user_id: int,
+    chunk_size: int = 1000,
+    workers: Optional[int] = None,
+    masked: bool = False,
+    reveal: Optional[str] = None,
+    use_processes: bool = False,
+) -> Iterator[List[Dict[str, str]]]:
+    if masked and reveal is None:
+        rows = (
+            db.query(Password.title, Password.username)
+            .filter(Password.user_id == user_id)
+            .order_by(Password.id)
+            .yield_per(chunk_size)
+        )
+        for chunk in _chunks(rows, chunk_size):
+            yield [
+                {
+                    "title": row.title,
+                    "username": row.username,
+                    "password": MASKED_PASSWORD,
+                }
+                for row in chunk
+            ]
+        return
+
+    rows = (
+        db.query(Password.title, Password.username, Password.encrypted_password)
+        .filter(Password.user_id == user_id)
+        .order_by(Password.id)
+        .yield_per(chunk_size)
+    )
+    pattern = reveal.lower() if reveal is not None else None
+    for chunk in _chunks(rows, chunk_size):
+        revealed = [
+            row
+            for row in chunk
+            if pattern is None or fnmatchcase(row.title.lower(), pattern)
+        ]
+        passwords = dict(
+            zip(
+                [row.title for row in revealed],
+                decrypt_many(
+                    [row.encrypted_password for row in revealed],
+                    workers=workers,
+                    use_processes=use_processes,
+                ),
+            )
+        )
+        yield [
+            {
+                "title": row.title,
+                "username": row.username,
+                "password": passwords.get(row.title, MASKED_PASSWORD),
+            }
+            for row in chunk
+        ]
+
+
+def export_records(
+    db: Session,
+    user_id: int,
+    output: TextIO,
+    file_format: str = "jsonl",
+    encrypt: bool = False,
+    chunk_size: int = 1000,
+    workers: Optional[int] = None,
+) -> int:
+    exported = 0
+    for chunk in iter_decrypted_chunks(db, user_id, chunk_size, workers):
+        data = serialize_chunk(chunk, file_format, header=exported == 0)
+        if encrypt:
+            data = get_cipher().encrypt(data.encode()).decode() + "\n"
+        output.write(data)
+        exported += len(chunk)
+    return exported
@@ -1,28 +1,163 @@
+import hashlib
+import hmac
 import os
-from base64 import urlsafe_b64encode
-from hashlib import sha256
+import secrets
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Iterable, List, Optional, Tuple
 
-from cryptography.fernet import Fernet
+from cryptography.fernet import Fernet, MultiFernet
 
+from app.config import load_environment
+from app.profiling import phase
 
-def hash_password(password: str) -> bytes:
-    return urlsafe_b64encode(sha256(password.encode()).digest())
+BATCH_CHUNK_SIZE = 1000
+# Comma-separated keys that are still accepted for decryption while
+# rotate-key re-encrypts the vault with FERNET_KEY.
+PREVIOUS_KEYS_ENV = "FERNET_PREVIOUS_KEYS"
+# Key for the HMAC fingerprints used by 'audit reuse'. It is independent of
+# FERNET_KEY, so key rotation keeps the fingerprints valid.
+FINGERPRINT_KEY_ENV = "FINGERPRINT_KEY"
+
+
+@lru_cache(maxsize=None)
+def get_fernet_keys() -> Tuple[bytes, ...]:
+    load_environment()
+    previous_keys = os.environ.get(PREVIOUS_KEYS_ENV, "").split(",")
+    return (
+        os.environ.get("FERNET_KEY").encode(),
+        *(key.strip().encode() for key in previous_keys if key.strip()),
+    )
+
+
+def get_fernet_key() -> bytes:
+    return get_fernet_keys()[0]
+
+
+@lru_cache(maxsize=None)
+def _cipher_for_keys(keys: Tuple[bytes, ...]) -> MultiFernet:
+    # MultiFernet encrypts with the first key and decrypts with any of them.
+    return MultiFernet([Fernet(key) for key in keys])
+
+
+def get_cipher() -> MultiFernet:
+    return _cipher_for_keys(get_fernet_keys())
+
+
+def reset_cipher() -> None:
+    get_fernet_keys.cache_clear()
+    _cipher_for_keys.cache_clear()
+    get_fingerprint_key.cache_clear()
+
+
+@lru_cache(maxsize=None)
+def get_fingerprint_key() -> Optional[bytes]:
+    load_environment()
+    key = os.environ.get(FINGERPRINT_KEY_ENV)
+    return key.encode() if key else None
+
+
+def generate_fingerprint_key() -> str:
+    return secrets.token_urlsafe(32)
+
+
+def fingerprint_many(passwords: Iterable[str]) -> List[Optional[str]]:
+    # Without a key (installations from before 'audit reuse') the column
+    # stays empty until the backfill fills it.
+    key = get_fingerprint_key()
+    if key is None:
+        return [None for _ in passwords]
+    return [
+        hmac.new(key, password.encode(), hashlib.sha256).hexdigest()
+        for password in passwords
+    ]
+
+
+def fingerprint_password(password: str) -> Optional[str]:
+    return fingerprint_many([password])[0]
 
 
 def encrypt_password(password: str) -> str:
-    fernet = Fernet(os.environ.get("FERNET_KEY"))
-    encrypted_password = fernet.encrypt(password.encode())
+    with phase("crypto"):
+        encrypted_password = get_cipher().encrypt(password.encode())
     return encrypted_password.decode()
 
 
 def decrypt_password(encrypted_password: str) -> str:
-    fernet = Fernet(os.environ.get("FERNET_KEY"))
-    decrypted_password = fernet.decrypt(encrypted_password.encode())
+    with phase("crypto"):
+        decrypted_password = get_cipher().decrypt(encrypted_password.encode())
     return decrypted_password.decode()
 
 
+def _encrypt_chunk(keys: Tuple[bytes, ...], passwords: List[str]) -> List[str]:
+    fernet = _cipher_for_keys(keys)
+    return [fernet.encrypt(password.encode()).decode() for password in passwords]
+
+
+def _decrypt_chunk(
+    keys: Tuple[bytes, ...], encrypted_passwords: List[str]
+) -> List[str]:
+    fernet = _cipher_for_keys(keys)
+    return [
+        fernet.decrypt(encrypted_password.encode()).decode()
+        for encrypted_password in encrypted_passwords
+    ]
+
+
+def _rotate_chunk(keys: Tuple[bytes, ...], encrypted_passwords: List[str]) -> List[str]:
+    fernet = _cipher_for_keys(keys)
+    return [
+        fernet.rotate(encrypted_password.encode()).decode()
+        for encrypted_password in encrypted_passwords
+    ]
+
+
+def _run_batch(
+    worker, items: Iterable[str], workers: Optional[int], use_processes: bool
+) -> List[str]:
+    items = list(items)
+    keys = get_fernet_keys()
+    if not workers or workers < 2 or len(items) <= BATCH_CHUNK_SIZE:
+        return worker(keys, items)
+
+    chunks = [
+        items[start : start + BATCH_CHUNK_SIZE]
+        for start in range(0, len(items), BATCH_CHUNK_SIZE)
+    ]
+    executor_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+    with executor_class(max_workers=workers) as executor:
+        results = executor.map(worker, [keys] * len(chunks), chunks)
+        return [item for chunk in results for item in chunk]
+
+
+def encrypt_many(
+    passwords: Iterable[str], workers: Optional[int] = None, use_processes: bool = False
+) -> List[str]:
+    with phase("crypto"):
+        return _run_batch(_encrypt_chunk, passwords, workers, use_processes)
+
+
+def decrypt_many(
+    encrypted_passwords: Iterable[str],
+    workers: Optional[int] = None,
+    use_processes: bool = False,
+) -> List[str]:
+    with phase("crypto"):
+        return _run_batch(_decrypt_chunk, encrypted_passwords, workers, use_processes)
+
+
+def rotate_many(
+    encrypted_passwords: Iterable[str],
+    workers: Optional[int] = None,
+    use_processes: bool = False,
+) -> List[str]:
+    with phase("crypto"):
+        return _run_batch(_rotate_chunk, encrypted_passwords, workers, use_processes)
+
+
 def create_env_file():
     if not os.path.exists(".env"):
         key = Fernet.generate_key()
         with open(".env", "w") as env_file:
             env_file.write(f"FERNET_KEY={key.decode()}\n")
+            env_file.write(f"{FINGERPRINT_KEY_ENV}={generate_fingerprint_key()}\n")
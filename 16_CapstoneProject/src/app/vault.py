@@ -0,0 +1,453 @@
+from fnmatch import fnmatchcase
+from typing import (Iterable, Iterator, List, NamedTuple, Optional, Sequence,
+                    TextIO)
+
+from app.output import MASKED_PASSWORD
+
+# Programmatic access to a user's passwords. The CLI, the agent and embedding
+# services all go through Vault; AsyncVault offers the same operations on
+# SQLAlchemy's asyncio engine (requires the optional aiosqlite dependency).
+# Like the CLI, this module imports SQLAlchemy, asyncio and the cipher lazily.
+
+
+class VaultError(Exception):
+    code = "error"
+
+
+class NotLoggedInError(VaultError):
+    code = "not_logged_in"
+
+    def __init__(self, message: str = "Bitte melde dich zuerst an."):
+        super().__init__(message)
+
+
+class EntryNotFoundError(VaultError):
+    code = "not_found"
+
+    def __init__(
+        self,
+        message: str = "Kein Passwort mit diesem Titel gefunden.",
+        suggestions: Sequence[str] = (),
+    ):
+        self.suggestions = list(suggestions)
+        if self.suggestions:
+            message = f"{message} Meintest du: {', '.join(self.suggestions)}?"
+        super().__init__(message)
+
+
+class EntryExistsError(VaultError):
+    code = "exists"
+
+    def __init__(
+        self, message: str = "Ein Passwort mit diesem Titel existiert bereits."
+    ):
+        super().__init__(message)
+
+
+class DatabaseBusyError(VaultError):
+    code = "busy"
+
+    def __init__(
+        self,
+        message: str = (
+            "Die Datenbank ist gerade gesperrt. Bitte versuche es später erneut."
+        ),
+    ):
+        super().__init__(message)
+
+
+class Entry(NamedTuple):
+    title: str
+    username: str
+    password: str
+
+
+class Vault:
+    def __init__(self, db, user_id: int):
+        self.db = db
+        self.user_id = user_id
+
+    @classmethod
+    def open(cls, db) -> "Vault":
+        from app.database import get_logged_in_user
+
+        user = get_logged_in_user(db)
+        if user is None:
+            raise NotLoggedInError()
+        return cls(db, user.id)
+
+    def _write(self, work):
+        from sqlalchemy.exc import OperationalError
+
+        from app.database import is_busy, run_write
+
+        try:
+            return run_write(self.db, work)
+        except OperationalError as error:
+            if is_busy(error):
+                raise DatabaseBusyError() from error
+            raise
+
+    def exists(self, title: str) -> bool:
+        from app.database import Password
+
+        return (
+            self.db.query(Password.id)
+            .filter(Password.title == title, Password.user_id == self.user_id)
+            .first()
+            is not None
+        )
+
+    def get(self, title: str, fuzzy: bool = False) -> Entry:
+        from app.database import Password
+        from app.utils import decrypt_many
+
+        stored_password = (
+            self.db.query(
+                Password.title, Password.username, Password.encrypted_password
+            )
+            .filter(Password.title == title, Password.user_id == self.user_id)
+            .first()
+        )
+        if stored_password is None:
+            error = self.not_found(title)
+            if fuzzy and error.suggestions:
+                return self.get(error.suggestions[0])
+            raise error
+
+        (decrypted_password,) = decrypt_many([stored_password.encrypted_password])
+        return Entry(
+            stored_password.title, stored_password.username, decrypted_password
+        )
+
+    def list(
+        self,
+        masked: bool = False,
+        reveal: Optional[str] = None,
+        workers: int = 0,
+        use_processes: bool = False,
+    ) -> List[Entry]:
+        from app.database import Password
+        from app.utils import decrypt_many
+
+        if masked or reveal is not None:
+            return self._list_masked(reveal)
+
+        stored_passwords = (
+            self.db.query(Password).filter(Password.user_id == self.user_id).all()
+        )
+        decrypted_passwords = decrypt_many(
+            [stored.encrypted_password for stored in stored_passwords],
+            workers=workers,
+            use_processes=use_processes,
+        )
+        return [
+            Entry(stored_password.title, stored_password.username, decrypted_password)
+            for stored_password, decrypted_password in zip(
+                stored_passwords, decrypted_passwords
+            )
+        ]
+
+    def _list_masked(self, reveal: Optional[str]) -> List[Entry]:
+        from app.database import Password
+        from app.utils import decrypt_many
+
+        if reveal is None:
+            rows = (
+                self.db.query(Password.title, Password.username)
+                .filter(Password.user_id == self.user_id)
+                .all()
+            )
+            return [Entry(title, username, MASKED_PASSWORD) for title, username in rows]
+
+        rows = (
+            self.db.query(
+                Password.title, Password.username, Password.encrypted_password
+            )
+            .filter(Password.user_id == self.user_id)
+            .all()
+        )
+        pattern = reveal.lower()
+        revealed_rows = [row for row in rows if fnmatchcase(row.title.lower(), pattern)]
+        revealed_passwords = dict(
+            zip(
+                [row.title for row in revealed_rows],
+                decrypt_many([row.encrypted_password for row in revealed_rows]),
+            )
+        )
+        return [
+            Entry(
+                row.title,
+                row.username,
+                revealed_passwords.get(row.title, MASKED_PASSWORD),
+            )
+            for row in rows
+        ]
+
+    def iter_chunks(
+        self,
+        chunk_size: int = 1000,
+        workers: int = 0,
+        masked: bool = False,
+        reveal: Optional[str] = None,
+        use_processes: bool = False,
+    ) -> Iterator[List[dict]]:
+        from app.transfer import iter_decrypted_chunks
+
+        return iter_decrypted_chunks(
+            self.db,
+            self.user_id,
+            chunk_size,
+            workers,
+            masked=masked,
+            reveal=reveal,
+            use_processes=use_processes,
+        )
+
+    def titles(self) -> List[str]:
+        from app.database import Password
+
+        rows = (
+            self.db.query(Password.title)
+            .filter(Password.user_id == self.user_id)
+            .order_by(Password.title)
+        )
+        return [title for (title,) in rows]
+
+    def search(self, query: str, prefix: bool = False, limit: int = 50) -> list:
+        from app.search import search_passwords
+
+        return search_passwords(
+            self.db, self.user_id, query, prefix=prefix, limit=limit
+        )
+
+    def suggest(self, title: str, limit: int = 3) -> List[str]:
+        from app.search import suggest_titles
+
+        return suggest_titles(self.db, self.user_id, title, limit=limit)
+
+    def not_found(self, title: str) -> EntryNotFoundError:
+        return EntryNotFoundError(suggestions=self.suggest(title))
+
+    def create(self, title: str, username: str, password: str) -> None:
+        from app.database import insert_password
+        from app.utils import encrypt_password, fingerprint_password
+
+        encrypted_password = encrypt_password(password)
+        fingerprint = fingerprint_password(password)
+
+        def work():
+            if not insert_password(
+                self.db, self.user_id, title, username, encrypted_password, fingerprint
+            ):
+                raise EntryExistsError()
+
+        self._write(work)
+
+    def update(self, title: str, username: str, password: str) -> None:
+        from app.database import update_password
+        from app.utils import encrypt_many, fingerprint_password
+
+        (encrypted_password,) = encrypt_many([password])
+        fingerprint = fingerprint_password(password)
+
+        # A single UPDATE: it cannot bring back an entry deleted meanwhile.
+        updated = self._write(
+            lambda: update_password(
+                self.db, self.user_id, title, username, encrypted_password, fingerprint
+            )
+        )
+        if not updated:
+            raise self.not_found(title)
+
+    def delete(self, title: str) -> None:
+        from app.database import Password
+
+        def work():
+            password_to_delete = (
+                self.db.query(Password)
+                .filter(Password.title == title, Password.user_id == self.user_id)
+                .first()
+            )
+            if password_to_delete is None:
+                raise self.not_found(title)
+            self.db.delete(password_to_delete)
+
+        self._write(work)
+
+    def import_records(
+        self,
+        records: Iterable[dict],
+        chunk_size: int = 1000,
+        workers: int = 0,
+        result=None,
+    ):
+        from app.transfer import import_records
+
+        return import_records(
+            self.db,
+            self.user_id,
+            records,
+            chunk_size=chunk_size,
+            workers=workers,
+            result=result,
+        )
+
+    def export(
+        self,
+        output: TextIO,
+        file_format: str = "jsonl",
+        encrypt: bool = False,
+        chunk_size: int = 1000,
+        workers: int = 0,
+    ) -> int:
+        from app.transfer import export_records
+
+        return export_records(
+            self.db, self.user_id, output, file_format, encrypt, chunk_size, workers
+        )
+
+
+def create_async_session_factory(settings=None):
+    try:
+        import aiosqlite  # noqa: F401
+        from sqlalchemy.ext.asyncio import (async_sessionmaker,
+                                            create_async_engine)
+    except ImportError as error:
+        raise ImportError(
+            "AsyncVault benötigt die optionalen Pakete aiosqlite und greenlet "
+            "(pip install 'password_manager[async]')."
+        ) from error
+    from sqlalchemy import event
+
+    from app.config import get_settings
+    from app.database import apply_pragmas, begin_transaction
+
+    settings = settings or get_settings()
+    engine = create_async_engine(f"sqlite+aiosqlite:///{settings.database_path}")
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        apply_pragmas(dbapi_connection, settings)
+
+    event.listen(engine.sync_engine, "begin", begin_transaction)
+
+    return async_sessionmaker(engine, expire_on_commit=False)
+
+
+class AsyncVault:
+    # Reads are issued as native async queries and decryption runs in a worker
+    # thread, so the event loop stays free while Fernet works. Writes reuse the
+    # sync Vault through AsyncSession.run_sync.
+
+    def __init__(self, session, user_id: int):
+        self.session = session
+        self.user_id = user_id
+
+    @classmethod
+    async def open(cls, session) -> "AsyncVault":
+        from app.database import User, files_exist
+        from app.sessions import read_session
+
+        files_exist()
+        user_session = read_session()
+        user = None
+        if user_session is not None:
+            user = await session.get(User, user_session["user_id"])
+        if user is None:
+            raise NotLoggedInError()
+        return cls(session, user.id)
+
+    async def _rows(self, *columns, title: Optional[str] = None) -> list:
+        from sqlalchemy import select
+
+        from app.database import Password
+
+        statement = select(*columns).where(Password.user_id == self.user_id)
+        if title is not None:
+            statement = statement.where(Password.title == title)
+        return (await self.session.execute(statement.order_by(Password.id))).all()
+
+    async def exists(self, title: str) -> bool:
+        from app.database import Password
+
+        return bool(await self._rows(Password.id, title=title))
+
+    async def get(self, title: str, fuzzy: bool = False) -> Entry:
+        import asyncio
+
+        from app.database import Password
+        from app.utils import decrypt_password
+
+        rows = await self._rows(
+            Password.title, Password.username, Password.encrypted_password, title=title
+        )
+        if not rows:
+            error = await self.not_found(title)
+            if fuzzy and error.suggestions:
+                return await self.get(error.suggestions[0])
+            raise error
+        row = rows[0]
+        password = await asyncio.to_thread(decrypt_password, row.encrypted_password)
+        return Entry(row.title, row.username, password)
+
+    async def list(
+        self, masked: bool = False, reveal: Optional[str] = None
+    ) -> List[Entry]:
+        import asyncio
+
+        from app.database import Password
+        from app.utils import decrypt_many
+
+        rows = await self._rows(
+            Password.title, Password.username, Password.encrypted_password
+        )
+        if masked or reveal is not None:
+            pattern = (reveal or "").lower()
+            revealed = [
+                row
+                for row in rows
+                if reveal is not None and fnmatchcase(row.title.lower(), pattern)
+            ]
+        else:
+            revealed = rows
+        passwords = dict(
+            zip(
+                [row.title for row in revealed],
+                await asyncio.to_thread(
+                    decrypt_many, [row.encrypted_password for row in revealed]
+                ),
+            )
+        )
+        return [
+            Entry(row.title, row.username, passwords.get(row.title, MASKED_PASSWORD))
+            for row in rows
+        ]
+
+    async def search(self, query: str, prefix: bool = False, limit: int = 50) -> list:
+        return await self.session.run_sync(
+            lambda db: Vault(db, self.user_id).search(query, prefix=prefix, limit=limit)
+        )
+
+    async def suggest(self, title: str, limit: int = 3) -> List[str]:
+        return await self.session.run_sync(
+            lambda db: Vault(db, self.user_id).suggest(title, limit=limit)
+        )
+
+    async def not_found(self, title: str) -> EntryNotFoundError:
+        return await self.session.run_sync(
+            lambda db: Vault(db, self.user_id).not_found(title)
+        )
+
+    async def create(self, title: str, username: str, password: str) -> None:
+        await self.session.run_sync(
+            lambda db: Vault(db, self.user_id).create(title, username, password)
+        )
+
+    async def update(self, title: str, username: str, password: str) -> None:
+        await self.session.run_sync(
+            lambda db: Vault(db, self.user_id).update(title, username, password)
+        )
+
+    async def delete(self, title: str) -> None:
+        await self.session.run_sync(lambda db: Vault(db, self.user_id).delete(title))
@@ -0,0 +1,104 @@
+import pytest
+from cryptography.fernet import Fernet
+from sqlalchemy.orm import sessionmaker
+
+from app import database
+from app.config import Settings, reset_settings
+from app.database import (IMMEDIATE, Base, User, create_db_engine,
+                          create_search_index, create_tables, get_db_session,
+                          reset_engine, start_session)
+from app.utils import reset_cipher
+
+# Fixed keys, so ciphertexts and fingerprints are reproducible across tests.
+FERNET_KEY = "ZmVybmV0LWtleS1mb3ItdGhlLXRlc3Qtc3VpdGUtMDA="
+FINGERPRINT_KEY = "fingerprint-key-for-the-test-suite"
+
+
+@pytest.fixture(autouse=True)
+def no_running_agent(monkeypatch, tmp_path):
+    # Keep CLI tests from forwarding to an agent the developer may be running.
+    monkeypatch.setenv("PM_AGENT_SOCKET", str(tmp_path / "agent.sock"))
+
+
+@pytest.fixture(autouse=True)
+def isolated_sessions(monkeypatch, tmp_path):
+    # Login tokens must not end up in, or be read from, the developer's home.
+    monkeypatch.setenv("PM_SESSION_DIR", str(tmp_path / "sessions"))
+
+
+@pytest.fixture
+def vault(tmp_path, monkeypatch):
+    key = Fernet.generate_key().decode()
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / ".env").write_text(f"FERNET_KEY={key}\n")
+    monkeypatch.setenv("FERNET_KEY", key)
+    monkeypatch.setenv("PM_DATABASE_PATH", str(tmp_path / "app.db"))
+    reset_settings()
+    reset_engine()
+    reset_cipher()
+    create_tables()
+    with get_db_session() as db:
+        user = User(username="test_user", hashed_password="x")
+        db.add(user)
+        db.flush()
+        start_session(db, user.id)
+        db.commit()
+    yield tmp_path
+    reset_engine()
+    reset_settings()
+    reset_cipher()
+
+
+@pytest.fixture(scope="session")
+def memory_engine():
+    # Built once per test run; memory_vault rolls every test back.
+    engine = create_db_engine(Settings(database_path=":memory:"))
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        create_search_index(connection)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def memory_vault(memory_engine, tmp_path, monkeypatch):
+    # The test runs inside one outer transaction. Sessions join it through
+    # SAVEPOINTs, so their commits and rollbacks behave as usual while the
+    # outer rollback discards everything. Commands that open their own
+    # engine connections (migrate, backup, restore) need the vault fixture.
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / ".env").write_text(
+        f"FERNET_KEY={FERNET_KEY}\nFINGERPRINT_KEY={FINGERPRINT_KEY}\n"
+    )
+    monkeypatch.setenv("FERNET_KEY", FERNET_KEY)
+    monkeypatch.setenv("FINGERPRINT_KEY", FINGERPRINT_KEY)
+    monkeypatch.setenv("PM_DATABASE_PATH", ":memory:")
+    monkeypatch.setenv("PM_SCRYPT_N", str(2**10))
+    reset_settings()
+    reset_engine()
+    reset_cipher()
+
+    connection = memory_engine.connect().execution_options(**{IMMEDIATE: True})
+    transaction = connection.begin()
+    monkeypatch.setattr(database, "get_engine", lambda: memory_engine)
+    monkeypatch.setattr(
+        database,
+        "get_sessionmaker",
+        lambda: sessionmaker(
+            autocommit=False,
+            autoflush=False,
+            bind=connection,
+            join_transaction_mode="create_savepoint",
+        ),
+    )
+    with get_db_session() as db:
+        user = User(username="test_user", hashed_password="x")
+        db.add(user)
+        db.flush()
+        start_session(db, user.id)
+        db.commit()
+    yield connection
+    transaction.rollback()
+    connection.close()
+    reset_settings()
+    reset_cipher()
@@ -0,0 +1,140 @@
+import threading
+from unittest.mock import patch
+
+import pytest
+from typer.testing import CliRunner
+
+from app.agent import create_server, get_client
+from app.cli import app
+from app.database import Password, User, get_db_session
+from app.sessions import remove_session
+
+runner = CliRunner()
+
+
+@pytest.fixture
+def agent(vault):
+    path = str(vault / "agent.sock")
+    server = create_server(path)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield path
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def test_get_client_without_agent(tmp_path):
+    assert get_client(str(tmp_path / "missing.sock")) is None
+
+
+def test_agent_operations(agent):
+    with get_client(agent) as client:
+        assert client.request("ping") == {"ok": True, "result": "pong"}
+        assert client.request(
+            "create", title="github", username="octocat", password="pw"
+        )["ok"]
+        assert client.request("create", title="github", username="x", password="y") == {
+            "ok": False,
+            "error": "exists",
+        }
+        assert client.request("exists", title="github")["result"] is True
+        assert client.request("get", title="github")["result"] == [
+            "github",
+            "octocat",
+            "pw",
+        ]
+
+        assert client.request(
+            "update", title="github", username="hubot", password="pw2"
+        )["ok"]
+        assert client.request("list")["result"] == [["github", "hubot", "pw2"]]
+        assert client.request("list", masked=True)["result"] == [
+            ["github", "hubot", "********"]
+        ]
+
+        assert client.request("get", title="githbu") == {
+            "ok": False,
+            "error": "not_found",
+            "suggestions": ["github"],
+        }
+        assert client.request("get", title="githbu", fuzzy=True)["result"] == [
+            "github",
+            "hubot",
+            "pw2",
+        ]
+        assert client.request("suggest", title="gthub")["result"] == ["github"]
+
+        assert client.request("delete", title="github")["ok"]
+        assert client.request("get", title="github")["error"] == "not_found"
+        assert (
+            client.request("update", title="github", username="a", password="b")[
+                "error"
+            ]
+            == "not_found"
+        )
+        assert client.request("bogus")["error"] == "unknown_op"
+
+
+def test_agent_sees_writes_from_other_processes(agent):
+    with get_client(agent) as client:
+        assert client.request("list")["result"] == []
+
+        with get_db_session() as db:
+            user = db.query(User).one()
+            db.add(
+                Password(
+                    title="mail", username="me", encrypted_password="x", user_id=user.id
+                )
+            )
+            db.commit()
+
+        assert client.request("exists", title="mail")["result"] is True
+
+
+def test_agent_requires_login(agent):
+    remove_session()
+
+    with get_client(agent) as client:
+        assert client.request("list") == {"ok": False, "error": "not_logged_in"}
+
+
+def test_cli_forwards_to_agent(agent, monkeypatch):
+    monkeypatch.setenv("PM_AGENT_SOCKET", agent)
+
+    with patch("app.database.get_db_session") as mock_get_db_session:
+        result = runner.invoke(app, ["create_password"], input="github\noctocat\npw\n")
+        assert "Passwort für github wurde erstellt." in result.stdout
+
+        result = runner.invoke(app, ["get_passwords"])
+        assert "octocat" in result.stdout and "pw" in result.stdout
+
+        result = runner.invoke(app, ["update_password"], input="github\nhubot\npw2\n")
+        assert "Passwort erfolgreich aktualisiert." in result.stdout
+
+        result = runner.invoke(app, ["show", "github"])
+        assert "hubot" in result.stdout
+
+        result = runner.invoke(app, ["delete_password"], input="github\n")
+        assert "Passwort erfolgreich gelöscht." in result.stdout
+
+        result = runner.invoke(app, ["delete_password"], input="github\n")
+        assert "Kein Passwort mit diesem Titel gefunden." in result.stdout
+
+        result = runner.invoke(app, ["get_passwords", "--format", "csv"])
+        assert result.stdout == "title,username,password\n"
+
+        mock_get_db_session.assert_not_called()
+
+    result = runner.invoke(app, ["agent", "status"])
+    assert "Der Agent läuft" in result.stdout
+
+
+def test_busy_agent_error_is_translated(agent, monkeypatch):
+    monkeypatch.setenv("PM_AGENT_SOCKET", agent)
+
+    with patch("app.agent.AgentClient.request") as mock_request:
+        mock_request.return_value = {"ok": False, "error": "busy"}
+        result = runner.invoke(app, ["show", "github"])
+
+    assert "Die Datenbank ist gerade gesperrt." in result.stdout
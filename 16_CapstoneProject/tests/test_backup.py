@@ -0,0 +1,126 @@
+import sqlite3
+
+import pytest
+from cryptography.fernet import Fernet
+from typer.testing import CliRunner
+
+from app.backup import (BackupError, full_backup, incremental_backup,
+                        restore_backup)
+from app.cli import app
+from app.config import get_settings
+from app.database import get_db_session
+from app.utils import reset_cipher
+from app.vault import Vault
+
+runner = CliRunner()
+
+
+def _entries():
+    with get_db_session() as db:
+        return Vault.open(db).list()
+
+
+def _changelog_size():
+    with sqlite3.connect(get_settings().database_path) as connection:
+        return connection.execute("SELECT COUNT(*) FROM changelog").fetchone()[0]
+
+
+def test_full_and_incremental_backup_restore(vault):
+    database_path = get_settings().database_path
+    with get_db_session() as db:
+        passwords = Vault.open(db)
+        for number in range(3):
+            passwords.create(f"title-{number}", "me", f"pw-{number}")
+
+    full = full_backup(database_path, str(vault / "full.db"), pages=1)
+    assert full.rows == {"users": 1, "passwords": 3}
+    assert _changelog_size() == 0
+
+    with get_db_session() as db:
+        passwords = Vault.open(db)
+        passwords.update("title-0", "you", "changed")
+        passwords.delete("title-1")
+        passwords.create("title-3", "me", "pw-3")
+    first = incremental_backup(database_path, str(vault / "inc1.db"))
+    assert first.rows == {"users": 0, "passwords": 3}
+
+    with get_db_session() as db:
+        Vault.open(db).create("title-4", "me", "pw-4")
+    second = incremental_backup(database_path, str(vault / "inc2.db"))
+    assert second.rows == {"users": 0, "passwords": 1}
+    expected = _entries()
+
+    with get_db_session() as db:
+        Vault.open(db).delete("title-0")
+
+    counts = restore_backup(
+        database_path,
+        str(vault / "full.db"),
+        [str(vault / "inc1.db"), str(vault / "inc2.db")],
+    )
+
+    assert counts == {"users": 1, "passwords": 4}
+    assert _entries() == expected
+    with get_db_session() as db:
+        assert [row.title for row in Vault.open(db).search("tle-4")] == ["title-4"]
+
+
+def test_changelog_starts_with_the_first_full_backup(vault):
+    database_path = get_settings().database_path
+    with get_db_session() as db:
+        Vault.open(db).create("title-0", "me", "pw")
+    assert _changelog_size() == 0
+
+    full_backup(database_path, str(vault / "full.db"))
+    with get_db_session() as db:
+        Vault.open(db).create("title-1", "me", "pw")
+    assert _changelog_size() == 1
+
+
+def test_restore_requires_decryptable_passwords(vault, monkeypatch):
+    database_path = get_settings().database_path
+    with get_db_session() as db:
+        Vault.open(db).create("title-0", "me", "pw-0")
+    full_backup(database_path, str(vault / "full.db"))
+    with get_db_session() as db:
+        Vault.open(db).create("title-1", "me", "pw-1")
+
+    # A new key without the previous one, as after 'rotate-key --drop-previous'.
+    monkeypatch.setenv("FERNET_KEY", Fernet.generate_key().decode())
+    reset_cipher()
+    with pytest.raises(BackupError, match="nicht entschlüsseln"):
+        restore_backup(database_path, str(vault / "full.db"))
+
+    with sqlite3.connect(database_path) as connection:
+        assert connection.execute("SELECT COUNT(*) FROM passwords").fetchone()[0] == 2
+
+
+def test_restore_rejects_broken_chain(vault):
+    database_path = get_settings().database_path
+    full_backup(database_path, str(vault / "full.db"))
+    for number in range(2):
+        with get_db_session() as db:
+            Vault.open(db).create(f"title-{number}", "me", "pw")
+        incremental_backup(database_path, str(vault / f"inc{number}.db"))
+
+    with pytest.raises(BackupError, match="passt nicht zur Sicherungskette"):
+        restore_backup(database_path, str(vault / "full.db"), [str(vault / "inc1.db")])
+
+
+def test_backup_commands(vault):
+    result = runner.invoke(app, ["backup", "--incremental", "inc.db"])
+    assert "Bitte zuerst eine vollständige Sicherung erstellen." in result.stdout
+
+    result = runner.invoke(app, ["backup", "full.db"])
+    assert "Vollständige Sicherung nach full.db geschrieben" in result.stdout
+
+    result = runner.invoke(app, ["backup", "--incremental", "inc.db"])
+    assert "Inkrementelle Sicherung nach inc.db geschrieben" in result.stdout
+
+    result = runner.invoke(
+        app, ["restore", "full.db", "--incremental", "inc.db"], input="y\n"
+    )
+    assert "Wiederherstellung geprüft und abgeschlossen: 1 Benutzer" in result.stdout
+
+    result = runner.invoke(app, ["restore", "inc.db", "--yes"])
+    assert "keine vollständige Sicherung" in result.stdout
@@ -0,0 +1,84 @@
+import os
+import sqlite3
+
+import pytest
+
+from benchmarks.load import run_local_load_test
+from benchmarks.run import run_benchmarks
+from benchmarks.seed import seed_vault
+from benchmarks.stress import run_local_stress_test
+
+
+@pytest.fixture(autouse=True)
+def benchmark_env(monkeypatch):
+    monkeypatch.setenv("PM_SCRYPT_N", "1024")
+
+
+def _titles(database_path):
+    with sqlite3.connect(database_path) as connection:
+        return connection.execute(
+            "SELECT user_id, title FROM passwords ORDER BY id"
+        ).fetchall()
+
+
+def test_seed_vault_is_deterministic(tmp_path, vault):
+    seed_vault(str(tmp_path / "a.db"), users=2, passwords_per_user=5)
+    seed_vault(str(tmp_path / "b.db"), users=2, passwords_per_user=5)
+
+    titles = _titles(tmp_path / "a.db")
+    assert len(titles) == 10
+    assert {user_id for user_id, _ in titles} == {1, 2}
+    assert titles == _titles(tmp_path / "b.db")
+
+
+def test_run_benchmarks_reports_every_command(vault):
+    report = run_benchmarks(sizes=[20], repeats=1)
+
+    (result,) = report["results"]
+    assert result["rows"] == 20
+    assert set(result["commands"]) >= {
+        "login",
+        "create_password",
+        "get_passwords",
+        "delete_password",
+        "update_password",
+        "search",
+        "import",
+    }
+    assert all(timing["median"] > 0 for timing in result["commands"].values())
+    assert report["environment"]["sqlite"]
+
+
+def test_run_benchmarks_restores_the_environment(vault):
+    environment = dict(os.environ)
+    sessions = sorted(os.listdir(os.environ["PM_SESSION_DIR"]))
+
+    run_benchmarks(sizes=[5], repeats=1)
+
+    assert dict(os.environ) == environment
+    assert sorted(os.listdir(os.environ["PM_SESSION_DIR"])) == sessions
+
+
+def test_local_load_test_restores_the_environment(vault):
+    environment = dict(os.environ)
+    sessions = sorted(os.listdir(os.environ["PM_SESSION_DIR"]))
+
+    report = run_local_load_test(rows=5, concurrency_levels=[2], requests_per_client=5)
+
+    assert report["results"][0]["errors"] == 0
+    assert dict(os.environ) == environment
+    assert sorted(os.listdir(os.environ["PM_SESSION_DIR"])) == sessions
+
+
+def test_stress_test_reports_throughput_and_failures(vault):
+    environment = dict(os.environ)
+
+    report = run_local_stress_test(rows=10, process_counts=[1, 3], operations=20)
+
+    assert dict(os.environ) == environment
+
+    assert [result["processes"] for result in report["results"]] == [1, 3]
+    for result in report["results"]:
+        assert result["operations"] + result["failures"] == 20 * result["processes"]
+        assert result["failures"] == 0
+        assert result["operations_per_second"] > 0
@@ -0,0 +1,89 @@
+import hashlib
+import os
+import random
+
+import pytest
+from typer.testing import CliRunner
+
+from app.breach import BreachCorpus, build_index, index_path, load_index
+from app.cli import app
+from app.database import get_db_session
+from app.vault import Vault
+
+runner = CliRunner()
+
+BREACHED = {"password": 3861493, "123456": 37359195, "hunter2": 17}
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    rng = random.Random(1)
+    lines = {
+        hashlib.sha1(password.encode()).hexdigest().upper(): count
+        for password, count in BREACHED.items()
+    }
+    for _ in range(2000):
+        lines[f"{rng.getrandbits(160):040X}"] = rng.randint(1, 50)
+    path = tmp_path / "pwned.txt"
+    path.write_bytes(
+        "".join(
+            f"{digest}:{count}\r\n" for digest, count in sorted(lines.items())
+        ).encode()
+    )
+    return str(path)
+
+
+@pytest.mark.parametrize("with_index", [False, True])
+def test_corpus_lookup(corpus, with_index):
+    if with_index:
+        build_index(corpus)
+
+    with BreachCorpus(corpus) as breach_corpus:
+        assert (breach_corpus.offsets is not None) == with_index
+        for password, count in BREACHED.items():
+            assert breach_corpus.count(password) == count
+        assert breach_corpus.count("correct horse battery staple") == 0
+        assert breach_corpus.count_hash(b"0" * 40) == 0
+        assert breach_corpus.count_hash(b"F" * 40) == 0
+
+
+def test_stale_index_is_ignored(corpus):
+    build_index(corpus)
+    with open(corpus, "ab") as corpus_file:
+        corpus_file.write(b"FFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFF\n")
+
+    assert os.path.exists(index_path(corpus))
+    assert load_index(corpus, os.path.getsize(corpus)) is None
+    with BreachCorpus(corpus) as breach_corpus:
+        assert breach_corpus.count_hash(b"F" * 40) == 1
+
+
+def test_empty_corpus(tmp_path):
+    path = tmp_path / "empty.txt"
+    path.write_bytes(b"")
+    build_index(str(path))
+
+    with BreachCorpus(str(path)) as breach_corpus:
+        assert breach_corpus.count("password") == 0
+
+
+def test_audit_breached(vault, corpus):
+    with get_db_session() as db:
+        passwords = Vault.open(db)
+        passwords.create("mail", "me", "hunter2")
+        passwords.create("bank", "me", "Xq7#long-and-unique")
+
+    result = runner.invoke(
+        app, ["audit", "breached", corpus, "--index", "--chunk-size", "1"]
+    )
+
+    assert result.exit_code == 0
+    assert "Präfixindex" in result.stdout
+    assert (
+        "1 von 2 Passwörtern sind in bekannten Datenlecks enthalten:" in result.stdout
+    )
+    assert "mail (17x gesehen)" in result.stdout
+    assert "bank" not in result.stdout
+
+    result = runner.invoke(app, ["audit", "breached", str(vault / "missing.txt")])
+    assert "nicht gefunden" in result.stdout
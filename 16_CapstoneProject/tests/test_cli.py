@@ -1,16 +1,20 @@
+from unittest.mock import MagicMock, patch
+
 import pytest
-from unittest.mock import patch, MagicMock
 from typer.testing import CliRunner
-from app.database import User, Password
+
 from app.cli import app
+from app.database import Password, User, get_db_session
 
 runner = CliRunner()
 
+
 @pytest.fixture
 def mock_os_path_exists():
     with patch("app.cli.os.path.exists", autospec=True) as mock_exists:
         yield mock_exists
 
+
 def test_init_already_initialized(mock_os_path_exists):
     mock_os_path_exists.return_value = True
 
@@ -22,8 +26,8 @@ def test_init_already_initialized(mock_os_path_exists):
 def test_init_successful(mock_os_path_exists):
     mock_os_path_exists.return_value = False
 
-    with patch("app.cli.create_env_file") as mock_create_env_file, \
-         patch("app.cli.create_tables") as mock_create_tables:
+    with patch("app.utils.create_env_file") as mock_create_env_file, \
+         patch("app.database.create_tables") as mock_create_tables:
 
         result = runner.invoke(app, ["init"])
 
@@ -40,9 +44,9 @@ def test_create_user():
     test_hashed_password = "hashed_test_password"
 
     with patch("typer.prompt") as mock_prompt, \
-         patch("app.cli.get_db_session") as mock_get_db_session, \
-         patch("app.cli.get_user_by_username") as mock_get_user_by_username, \
-         patch("app.cli.hash_password") as mock_hash_password:
+         patch("app.database.get_db_session") as mock_get_db_session, \
+         patch("app.database.get_user_by_username") as mock_get_user_by_username, \
+         patch("app.hashing.hash_password") as mock_hash_password:
 
         # Mock typer.prompt
         mock_prompt.side_effect = [test_username, test_password]
@@ -80,11 +84,15 @@ def test_login():
     test_password = "test_password"
     test_wrong_password = "wrong_password"
     test_hashed_password = "hashed_test_password"
+    test_rehashed_password = "rehashed_test_password"
 
     with patch("typer.prompt") as mock_prompt, \
-         patch("app.cli.get_db_session") as mock_get_db_session, \
-         patch("app.cli.get_user_by_username") as mock_get_user_by_username, \
-         patch("app.cli.hash_password") as mock_hash_password:
+         patch("app.database.get_db_session") as mock_get_db_session, \
+         patch("app.database.get_user_by_username") as mock_get_user_by_username, \
+         patch("app.hashing.verify_password") as mock_verify_password, \
+         patch("app.hashing.needs_rehash") as mock_needs_rehash, \
+         patch("app.hashing.hash_password") as mock_hash_password, \
+         patch("app.database.start_session") as mock_start_session:
 
         # Mock typer.prompt
         mock_prompt.side_effect = [test_username, test_password]
@@ -97,24 +105,37 @@ def test_login():
         user = User(username=test_username, hashed_password=test_hashed_password)
         mock_get_user_by_username.return_value = user
 
-        # Mock hash_password
-        mock_hash_password.return_value = test_hashed_password
+        # Mock verify_password and needs_rehash
+        mock_verify_password.return_value = True
+        mock_needs_rehash.return_value = False
 
         # Test successful login
         result = runner.invoke(app, ["login"])
 
-        assert user.is_logged_in
+        mock_start_session.assert_called_once_with(mock_db, user.id)
+        mock_verify_password.assert_called_with(test_password, test_hashed_password)
+        mock_hash_password.assert_not_called()
         mock_db.commit.assert_called_once()
         assert result.exit_code == 0
         assert "Erfolgreich eingeloggt." in result.stdout
 
+        # Test successful login with outdated hash parameters
+        mock_prompt.side_effect = [test_username, test_password]
+        mock_needs_rehash.return_value = True
+        mock_hash_password.return_value = test_rehashed_password
+        result = runner.invoke(app, ["login"])
+
+        mock_hash_password.assert_called_once_with(test_password)
+        assert user.hashed_password == test_rehashed_password
+        assert "Erfolgreich eingeloggt." in result.stdout
+
         # Test login with wrong password
         mock_prompt.side_effect = [test_username, test_wrong_password]
-        mock_hash_password.return_value = "hashed_wrong_password"
-        user.is_logged_in = False
+        mock_verify_password.return_value = False
+        mock_start_session.reset_mock()
         result = runner.invoke(app, ["login"])
 
-        assert not user.is_logged_in
+        mock_start_session.assert_not_called()
         assert result.exit_code == 0
         assert "Benutzername oder Passwort falsch." in result.stdout
 
@@ -131,8 +152,9 @@ def test_logout():
     test_username = "test_user"
     test_hashed_password = "hashed_test_password"
 
-    with patch("app.cli.get_db_session") as mock_get_db_session, \
-         patch("app.cli.get_logged_in_user") as mock_get_logged_in_user:
+    with patch("app.database.get_db_session") as mock_get_db_session, \
+         patch("app.database.get_logged_in_user") as mock_get_logged_in_user, \
+         patch("app.database.end_session") as mock_end_session:
 
         # Mock get_db_session
         mock_db = MagicMock()
@@ -142,18 +164,16 @@ def test_logout():
         user = User(username=test_username, hashed_password=test_hashed_password)
 
         # Test successful logout
-        user.is_logged_in = True
         mock_get_logged_in_user.return_value = user
 
         result = runner.invoke(app, ["logout"])
 
-        assert not user.is_logged_in
+        mock_end_session.assert_called_once_with(mock_db)
         mock_db.commit.assert_called_once()
         assert result.exit_code == 0
         assert "Erfolgreich ausgeloggt." in result.stdout
 
         # Test logout when not logged in
-        user.is_logged_in = False
         mock_get_logged_in_user.return_value = None
 
         result = runner.invoke(app, ["logout"])
@@ -163,7 +183,7 @@ def test_logout():
 
 
 @pytest.mark.parametrize("input, expected_message", [
-    (None, "Passwort für wurde erstellt."),
+    (None, "Passwort für test_password_title wurde erstellt."),
     ("belegt", "Ein Passwort mit diesem Titel existiert bereits."),
 ])
 def test_create_password(input, expected_message):
@@ -175,9 +195,9 @@ def test_create_password(input, expected_message):
     test_encrypted_password = "encrypted_test_service_password"
 
     with patch("typer.prompt") as mock_prompt, \
-         patch("app.cli.get_db_session") as mock_get_db_session, \
-         patch("app.cli.get_logged_in_user") as mock_get_logged_in_user, \
-         patch("app.cli.encrypt_password") as mock_encrypt_password:
+         patch("app.database.get_db_session") as mock_get_db_session, \
+         patch("app.database.get_logged_in_user") as mock_get_logged_in_user, \
+         patch("app.utils.encrypt_password") as mock_encrypt_password:
 
         # Mock typer.prompt
         mock_prompt.side_effect = [test_password_title, test_service_username, test_service_password]
@@ -187,7 +207,7 @@ def test_create_password(input, expected_message):
         mock_get_db_session.return_value.__enter__.return_value = mock_db
 
         # Mock get_logged_in_user
-        user = User(username=test_username, hashed_password=test_hashed_password, is_logged_in=True)
+        user = User(username=test_username, hashed_password=test_hashed_password)
         mock_get_logged_in_user.return_value = user
 
         # Mock encrypt_password
@@ -210,9 +230,9 @@ def test_get_passwords():
     test_encrypted_password = "encrypted_test_service_password"
     test_decrypted_password = "test_service_password"
 
-    with patch("app.cli.get_db_session") as mock_get_db_session, \
-         patch("app.cli.get_logged_in_user") as mock_get_logged_in_user, \
-         patch("app.cli.decrypt_password") as mock_decrypt_password, \
+    with patch("app.database.get_db_session") as mock_get_db_session, \
+         patch("app.database.get_logged_in_user") as mock_get_logged_in_user, \
+         patch("app.utils.decrypt_many") as mock_decrypt_many, \
          patch("typer.echo") as mock_echo:
 
         # Mock get_db_session
@@ -228,7 +248,7 @@ def test_get_passwords():
         mock_echo.assert_called_with("Bitte melde dich zuerst an.")
 
         # Scenario 2: User is logged in but has no stored passwords
-        user = User(username=test_username, hashed_password=test_hashed_password, is_logged_in=True)
+        user = User(username=test_username, hashed_password=test_hashed_password)
         mock_get_logged_in_user.return_value = user
         mock_db.query.return_value.filter.return_value.all.return_value = []
 
@@ -242,15 +262,17 @@ def test_get_passwords():
                             encrypted_password=test_encrypted_password, user_id=user.id)
         mock_db.query.return_value.filter.return_value.all.return_value = [password]
 
-        # Mock decrypt_password
-        mock_decrypt_password.return_value = test_decrypted_password
+        # Mock decrypt_many
+        mock_decrypt_many.return_value = [test_decrypted_password]
 
         result = runner.invoke(app, ["get_passwords"])
 
         assert result.exit_code == 0
 
         assert "Gespeicherte Passwörter:" in mock_echo.call_args_list[2][0][0]
-        mock_decrypt_password.assert_called_with(password.encrypted_password)
+        mock_decrypt_many.assert_called_with(
+            [password.encrypted_password], workers=0, use_processes=False
+        )
 
         # Check that the tabulate function is called with the expected data
         tabulate_data = [
@@ -258,7 +280,7 @@ def test_get_passwords():
         ]
         headers = ["Titel", "Benutzername", "Passwort"]
 
-        with patch("app.cli.tabulate") as mock_tabulate:
+        with patch("tabulate.tabulate") as mock_tabulate:
             mock_tabulate.return_value = "test_table"
             runner.invoke(app, ["get_passwords"])
             mock_tabulate.assert_called_with(tabulate_data, headers=headers, tablefmt="grid")
@@ -272,8 +294,8 @@ def test_delete_password():
     test_service_username = "test_service_username"
     test_encrypted_password = "encrypted_test_service_password"
 
-    with patch("app.cli.get_db_session") as mock_get_db_session, \
-         patch("app.cli.get_logged_in_user") as mock_get_logged_in_user, \
+    with patch("app.database.get_db_session") as mock_get_db_session, \
+         patch("app.database.get_logged_in_user") as mock_get_logged_in_user, \
          patch("typer.prompt") as mock_prompt, \
          patch("typer.echo") as mock_echo:
 
@@ -290,7 +312,7 @@ def test_delete_password():
         mock_echo.assert_called_with("Bitte melde dich zuerst an.")
 
         # Scenario 2: User is logged in, but the specified password is not found
-        user = User(username=test_username, hashed_password=test_hashed_password, is_logged_in=True)
+        user = User(username=test_username, hashed_password=test_hashed_password)
         mock_get_logged_in_user.return_value = user
         mock_prompt.return_value = test_password_title
         mock_db.query.return_value.filter.return_value.first.return_value = None
@@ -323,9 +345,9 @@ def test_update_password():
     new_service_password = "new_test_service_password"
     encrypted_new_password = "encrypted_new_test_service_password"
 
-    with patch("app.cli.get_db_session") as mock_get_db_session, \
-         patch("app.cli.get_logged_in_user") as mock_get_logged_in_user, \
-         patch("app.cli.encrypt_password") as mock_encrypt_password, \
+    with patch("app.database.get_db_session") as mock_get_db_session, \
+         patch("app.database.get_logged_in_user") as mock_get_logged_in_user, \
+         patch("app.utils.encrypt_many") as mock_encrypt_many, \
          patch("typer.prompt") as mock_prompt, \
          patch("typer.echo") as mock_echo:
 
@@ -342,7 +364,7 @@ def test_update_password():
         mock_echo.assert_called_with("Bitte melde dich zuerst an.")
 
         # Scenario 2: User is logged in, but the specified password is not found
-        user = User(username=test_username, hashed_password=test_hashed_password, is_logged_in=True)
+        user = User(username=test_username, hashed_password=test_hashed_password)
         mock_get_logged_in_user.return_value = user
         mock_prompt.side_effect = [test_password_title]
         mock_db.query.return_value.filter.return_value.first.return_value = None
@@ -358,13 +380,340 @@ def test_update_password():
         mock_db.query.return_value.filter.return_value.first.return_value = password
         mock_prompt.side_effect = [test_password_title, new_service_username, new_service_password]
 
-        # Mock encrypt_password
-        mock_encrypt_password.return_value = encrypted_new_password
+        # Mock encrypt_many
+        mock_encrypt_many.return_value = [encrypted_new_password]
 
         result = runner.invoke(app, ["update_password"])
 
         assert result.exit_code == 0
-        assert password.username == new_service_username
-        assert password.encrypted_password == encrypted_new_password
+        update_parameters = mock_db.execute.call_args[0][0].compile().params
+        assert update_parameters["username"] == new_service_username
+        assert update_parameters["encrypted_password"] == encrypted_new_password
         mock_db.commit.assert_called_once()
         mock_echo.assert_called_with("Passwort erfolgreich aktualisiert.")
+
+
+def test_get_passwords_masked_does_not_decrypt():
+    test_username = "test_user"
+    test_hashed_password = "hashed_test_password"
+
+    with patch("app.database.get_db_session") as mock_get_db_session, \
+         patch("app.database.get_logged_in_user") as mock_get_logged_in_user, \
+         patch("app.utils.decrypt_many") as mock_decrypt_many, \
+         patch("tabulate.tabulate") as mock_tabulate:
+
+        mock_db = MagicMock()
+        mock_get_db_session.return_value.__enter__.return_value = mock_db
+        user = User(username=test_username, hashed_password=test_hashed_password)
+        mock_get_logged_in_user.return_value = user
+        mock_db.query.return_value.filter.return_value.all.return_value = [
+            ("github", "octocat"),
+            ("gitlab", "tanuki"),
+        ]
+        mock_tabulate.return_value = "test_table"
+
+        result = runner.invoke(app, ["get_passwords", "--masked"])
+
+        assert result.exit_code == 0
+        mock_decrypt_many.assert_not_called()
+        mock_tabulate.assert_called_with(
+            [["github", "octocat", "********"], ["gitlab", "tanuki", "********"]],
+            headers=["Titel", "Benutzername", "Passwort"],
+            tablefmt="grid",
+        )
+
+
+def test_get_passwords_reveal_decrypts_matching_rows_only():
+    test_username = "test_user"
+    test_hashed_password = "hashed_test_password"
+
+    with patch("app.database.get_db_session") as mock_get_db_session, \
+         patch("app.database.get_logged_in_user") as mock_get_logged_in_user, \
+         patch("app.utils.decrypt_many") as mock_decrypt_many, \
+         patch("tabulate.tabulate") as mock_tabulate:
+
+        mock_db = MagicMock()
+        mock_get_db_session.return_value.__enter__.return_value = mock_db
+        user = User(username=test_username, hashed_password=test_hashed_password)
+        mock_get_logged_in_user.return_value = user
+        github = MagicMock(
+            title="GitHub", username="octocat", encrypted_password="enc_github"
+        )
+        mail = MagicMock(title="Mail", username="me", encrypted_password="enc_mail")
+        mock_db.query.return_value.filter.return_value.all.return_value = [github, mail]
+        mock_decrypt_many.return_value = ["github_password"]
+        mock_tabulate.return_value = "test_table"
+
+        result = runner.invoke(app, ["get_passwords", "--reveal", "git*"])
+
+        assert result.exit_code == 0
+        mock_decrypt_many.assert_called_once_with(["enc_github"])
+        mock_tabulate.assert_called_with(
+            [["GitHub", "octocat", "github_password"], ["Mail", "me", "********"]],
+            headers=["Titel", "Benutzername", "Passwort"],
+            tablefmt="grid",
+        )
+
+
+def test_get_passwords_streams_jsonl(vault):
+    import json
+
+    for title in ("github", "mail"):
+        runner.invoke(app, ["create_password"], input=f"{title}\nme\npw-{title}\n")
+
+    result = runner.invoke(
+        app, ["get_passwords", "--format", "jsonl", "--chunk-size", "1"]
+    )
+
+    assert result.exit_code == 0
+    assert [json.loads(line) for line in result.stdout.splitlines()] == [
+        {"title": "github", "username": "me", "password": "pw-github"},
+        {"title": "mail", "username": "me", "password": "pw-mail"},
+    ]
+
+
+@pytest.mark.parametrize(
+    "file_format, stdout, stderr",
+    [
+        ("csv", "title,username,password\n", ""),
+        ("tsv", "title\tusername\tpassword\n", ""),
+        ("jsonl", "", "Keine Passwörter gefunden.\n"),
+        ("plain", "", "Keine Passwörter gefunden.\n"),
+    ],
+)
+def test_get_passwords_streams_empty_vault(vault, file_format, stdout, stderr):
+    result = CliRunner(mix_stderr=False).invoke(
+        app, ["get_passwords", "--format", file_format]
+    )
+
+    assert result.exit_code == 0
+    assert (result.stdout, result.stderr) == (stdout, stderr)
+
+
+def test_get_passwords_unknown_format():
+    result = runner.invoke(app, ["get_passwords", "--format", "xml"])
+
+    assert result.exit_code == 0
+    assert "Unbekanntes Format" in result.stdout
+
+
+def test_show():
+    test_username = "test_user"
+    test_hashed_password = "hashed_test_password"
+
+    with patch("app.database.get_db_session") as mock_get_db_session, \
+         patch("app.database.get_logged_in_user") as mock_get_logged_in_user, \
+         patch("app.utils.decrypt_many") as mock_decrypt_many:
+
+        mock_db = MagicMock()
+        mock_get_db_session.return_value.__enter__.return_value = mock_db
+        user = User(username=test_username, hashed_password=test_hashed_password)
+        mock_get_logged_in_user.return_value = user
+
+        # Scenario 1: Title not found
+        mock_db.query.return_value.filter.return_value.first.return_value = None
+
+        result = runner.invoke(app, ["show", "github"])
+
+        assert result.exit_code == 0
+        assert "Kein Passwort mit diesem Titel gefunden." in result.stdout
+        mock_decrypt_many.assert_not_called()
+
+        # Scenario 2: Title found
+        mock_db.query.return_value.filter.return_value.first.return_value = MagicMock(
+            title="github", username="octocat", encrypted_password="enc_github"
+        )
+        mock_decrypt_many.return_value = ["github_password"]
+
+        result = runner.invoke(app, ["show", "github"])
+
+        assert result.exit_code == 0
+        mock_decrypt_many.assert_called_once_with(["enc_github"])
+        assert "github_password" in result.stdout
+
+
+def test_import_passwords(tmp_path):
+    import_file = tmp_path / "export.csv"
+    import_file.write_text("title,username,password\ngithub,octocat,pw\n")
+
+    with patch("app.database.get_db_session") as mock_get_db_session, \
+         patch("app.database.get_logged_in_user") as mock_get_logged_in_user, \
+         patch("app.transfer.import_records") as mock_import_records:
+
+        mock_db = MagicMock()
+        mock_get_db_session.return_value.__enter__.return_value = mock_db
+        user = User(id=1, username="test_user", hashed_password="hashed_test_password")
+        mock_get_logged_in_user.return_value = user
+        mock_import_records.return_value = MagicMock(
+            imported=1, skipped=2, conflicts=3, rows_per_second=600.0
+        )
+
+        result = runner.invoke(app, ["import", str(import_file)])
+
+        assert result.exit_code == 0
+        assert mock_import_records.call_args[0][:2] == (mock_db, 1)
+        assert (
+            "1 Passwörter importiert, 2 übersprungen, 3 Konflikte (600 Zeilen/s)."
+            in result.stdout
+        )
+
+        result = runner.invoke(app, ["import", str(tmp_path / "missing.csv")])
+
+        assert "nicht gefunden" in result.stdout
+
+        result = runner.invoke(app, ["import", str(import_file), "--format", "xml"])
+
+        assert result.exit_code == 0
+        assert "Unbekanntes Format" in result.stdout
+
+
+@pytest.mark.parametrize(
+    "tail, reason, titles",
+    [
+        ('{"title": "broken", "user', "Die Datei ist fehlerhaft", ["site0", "site1"]),
+        # The file is decoded in blocks, so the first read already fails.
+        ('{"title": "caf\xe9"}', "nicht UTF-8-kodiert", []),
+    ],
+)
+def test_import_reports_committed_rows_when_the_file_breaks(
+    vault, tail, reason, titles
+):
+    import json
+
+    records = [
+        json.dumps({"title": f"site{i}", "username": "me", "password": "pw"})
+        for i in range(3)
+    ]
+    import_file = vault / "export.jsonl"
+    import_file.write_bytes(
+        ("\n".join(records) + "\n").encode() + tail.encode("latin-1")
+    )
+
+    result = runner.invoke(app, ["import", str(import_file), "--chunk-size", "2"])
+
+    assert result.exit_code == 1
+    assert reason in result.stdout
+    assert f"{len(titles)} Passwörter importiert" in result.stdout
+    with get_db_session() as db:
+        assert [title for (title,) in db.query(Password.title)] == titles
+
+
+def test_import_encrypted_file_with_wrong_key(vault):
+    from cryptography.fernet import Fernet
+
+    token = Fernet(Fernet.generate_key()).encrypt(
+        b'{"title": "github", "username": "me", "password": "pw"}\n'
+    )
+    import_file = vault / "export.jsonl"
+    import_file.write_bytes(token + b"\n")
+
+    result = runner.invoke(app, ["import", str(import_file), "--encrypted"])
+
+    assert result.exit_code == 1
+    assert "nicht entschlüsseln" in result.stdout
+    assert "0 Passwörter importiert" in result.stdout
+
+
+def test_export(tmp_path):
+    export_file = tmp_path / "export.jsonl"
+
+    with patch("app.database.get_db_session") as mock_get_db_session, \
+         patch("app.database.get_logged_in_user") as mock_get_logged_in_user, \
+         patch("app.transfer.export_records") as mock_export_records:
+
+        mock_db = MagicMock()
+        mock_get_db_session.return_value.__enter__.return_value = mock_db
+        mock_get_logged_in_user.return_value = User(
+            id=1, username="test_user", hashed_password="x"
+        )
+        mock_export_records.return_value = 42
+
+        result = runner.invoke(
+            app, ["export", "--output", str(export_file), "--format", "csv"]
+        )
+
+        assert result.exit_code == 0
+        assert mock_export_records.call_args[0][3:5] == ("csv", False)
+        assert f"42 Passwörter nach {export_file} exportiert." in result.stdout
+
+        result = runner.invoke(app, ["export", "--format", "xml"])
+
+        assert "Unbekanntes Format" in result.stdout
+
+
+@pytest.mark.parametrize("existing", [False, True])
+def test_export_file_is_only_readable_by_the_owner(vault, existing):
+    import stat
+
+    export_file = vault / "export.csv"
+    if existing:
+        export_file.write_text("old")
+        export_file.chmod(0o644)
+    runner.invoke(app, ["create_password"], input="github\nme\npw\n")
+
+    result = runner.invoke(
+        app, ["export", "--output", str(export_file), "--format", "csv"]
+    )
+
+    assert result.exit_code == 0
+    assert stat.S_IMODE(export_file.stat().st_mode) == 0o600
+    assert "github,me,pw" in export_file.read_text()
+
+
+def test_search():
+    with patch("app.database.get_db_session") as mock_get_db_session, \
+         patch("app.database.get_logged_in_user") as mock_get_logged_in_user, \
+         patch("app.search.search_passwords") as mock_search_passwords:
+
+        mock_db = MagicMock()
+        mock_get_db_session.return_value.__enter__.return_value = mock_db
+        mock_get_logged_in_user.return_value = User(
+            id=1, username="test_user", hashed_password="x"
+        )
+
+        mock_search_passwords.return_value = []
+        result = runner.invoke(app, ["search", "git"])
+
+        assert "Keine Passwörter gefunden." in result.stdout
+
+        mock_search_passwords.return_value = [
+            MagicMock(title="GitHub", username="octocat")
+        ]
+        result = runner.invoke(app, ["search", "git", "--prefix"])
+
+        assert result.exit_code == 0
+        mock_search_passwords.assert_called_with(
+            mock_db, 1, "git", prefix=True, limit=50
+        )
+        assert "GitHub" in result.stdout
+
+
+def test_migrate():
+    with patch("app.database.migrate_database") as mock_migrate_database:
+        mock_migrate_database.return_value = []
+        result = runner.invoke(app, ["migrate"])
+
+        assert "Migration erfolgreich" in result.stdout
+
+        mock_migrate_database.return_value = [(1, "github", 2)]
+        result = runner.invoke(app, ["migrate"])
+
+        assert "Benutzer 1: github (2x)" in result.stdout
+
+
+def test_calibrate(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    with patch("app.hashing.calibrate") as mock_calibrate:
+        mock_calibrate.return_value = {"scrypt_n": 32768, "scrypt_r": 8, "scrypt_p": 1}
+
+        result = runner.invoke(app, ["calibrate", "--target-ms", "100", "--write"])
+
+        assert result.exit_code == 0
+        mock_calibrate.assert_called_with(100.0, "scrypt")
+        assert "PM_SCRYPT_N=32768" in result.stdout
+        assert "PM_SCRYPT_N=32768" in (tmp_path / ".env").read_text()
+
+        result = runner.invoke(app, ["calibrate", "--algorithm", "md5"])
+
+        assert "Unbekannter Algorithmus" in result.stdout
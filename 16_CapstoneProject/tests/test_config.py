@@ -0,0 +1,61 @@
+import pytest
+
+from app.config import Settings, load_settings
+from app.database import create_db_engine
+
+
+@pytest.fixture(autouse=True)
+def isolated_env(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    for name in ("PM_CONFIG", "PM_DATABASE_PATH", "PM_JOURNAL_MODE", "PM_CACHE_SIZE"):
+        # setenv first so that monkeypatch restores the variable afterwards,
+        # even if load_dotenv sets it during the test.
+        monkeypatch.setenv(name, "")
+        monkeypatch.delenv(name)
+
+
+def test_load_settings_defaults():
+    assert load_settings() == Settings()
+
+
+def test_load_settings_from_config_file_and_env(monkeypatch, tmp_path):
+    (tmp_path / "password_manager.ini").write_text(
+        "[database]\ndatabase_path = vault.db\n"
+        "journal_mode = delete\ncache_size = 100\n"
+    )
+    (tmp_path / ".env").write_text("PM_CACHE_SIZE=200\n")
+    monkeypatch.setenv("PM_JOURNAL_MODE", "truncate")
+
+    settings = load_settings()
+
+    assert settings.database_path == "vault.db"
+    assert settings.journal_mode == "truncate"
+    assert settings.cache_size == 200
+
+
+def test_settings_rejects_unknown_pragma_values():
+    with pytest.raises(ValueError):
+        Settings(journal_mode="WAL; DROP TABLE users")
+    with pytest.raises(ValueError):
+        Settings(synchronous="sometimes")
+
+
+def test_create_db_engine_applies_pragmas(tmp_path):
+    settings = Settings(
+        database_path=str(tmp_path / "app.db"),
+        synchronous="OFF",
+        cache_size=-2000,
+        busy_timeout=1234,
+    )
+    engine = create_db_engine(settings)
+
+    with engine.connect() as connection:
+
+        def pragma(name):
+            return connection.exec_driver_sql(f"PRAGMA {name}").scalar()
+
+        assert pragma("journal_mode") == "wal"
+        assert pragma("synchronous") == 0
+        assert pragma("cache_size") == -2000
+        assert pragma("busy_timeout") == 1234
+    engine.dispose()
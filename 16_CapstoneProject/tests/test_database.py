@@ -0,0 +1,95 @@
+import pytest
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.orm import sessionmaker
+
+from app import database
+from app.database import (Base, Password, User, insert_password,
+                          migrate_database, update_password)
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    engine = create_engine("sqlite://")
+    monkeypatch.setattr(database, "get_engine", lambda: engine)
+    return engine
+
+
+@pytest.fixture
+def db(engine):
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    user = User(username="test_user", hashed_password="x")
+    session.add(user)
+    session.commit()
+    yield session
+    session.close()
+
+
+def test_insert_password_ignores_conflicts(db):
+    user = db.query(User).one()
+
+    assert insert_password(db, user.id, "github", "octocat", "enc1")
+    assert not insert_password(db, user.id, "github", "other", "enc2")
+    db.commit()
+
+    stored = db.query(Password).one()
+    assert (stored.username, stored.encrypted_password) == ("octocat", "enc1")
+
+
+def test_update_password_updates_in_place(db):
+    user = db.query(User).one()
+    insert_password(db, user.id, "github", "octocat", "enc1")
+    stored_id = db.query(Password.id).scalar()
+
+    assert update_password(db, user.id, "github", "hubot", "enc2")
+    assert not update_password(db, user.id, "gitlab", "hubot", "enc2")
+    db.commit()
+
+    stored = db.query(Password).one()
+    assert (stored.id, stored.username, stored.encrypted_password) == (
+        stored_id,
+        "hubot",
+        "enc2",
+    )
+
+
+def _create_legacy_schema(engine):
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            "CREATE TABLE users (id INTEGER PRIMARY KEY, username VARCHAR NOT NULL, "
+            "hashed_password VARCHAR NOT NULL, is_logged_in BOOLEAN)"
+        )
+        connection.exec_driver_sql(
+            "CREATE TABLE passwords (id INTEGER PRIMARY KEY, title VARCHAR NOT NULL, "
+            "username VARCHAR NOT NULL, encrypted_password VARCHAR NOT NULL, "
+            "user_id INTEGER NOT NULL REFERENCES users (id))"
+        )
+        connection.exec_driver_sql("INSERT INTO users VALUES (1, 'test_user', 'x', 0)")
+
+
+def test_migrate_database_adds_unique_index(engine):
+    _create_legacy_schema(engine)
+
+    assert migrate_database() == []
+
+    indexes = {
+        index["name"]: index for index in inspect(engine).get_indexes("passwords")
+    }
+    assert indexes["ix_passwords_user_id_title"]["unique"]
+    assert "ix_passwords_user_id_fingerprint" in indexes
+    columns = {column["name"] for column in inspect(engine).get_columns("passwords")}
+    assert "fingerprint" in columns
+    assert migrate_database() == []
+
+
+def test_migrate_database_reports_duplicates(engine):
+    _create_legacy_schema(engine)
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            "INSERT INTO passwords (title, username, encrypted_password, user_id) "
+            "VALUES ('github', 'a', 'x', 1), ('github', 'b', 'y', 1)"
+        )
+
+    assert migrate_database() == [(1, "github", 2)]
+    index_names = {index["name"] for index in inspect(engine).get_indexes("passwords")}
+    assert "ix_passwords_user_id_title" not in index_names
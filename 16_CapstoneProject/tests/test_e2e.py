@@ -0,0 +1,149 @@
+import json
+
+from typer.testing import CliRunner
+
+from app.cli import app
+from app.database import Password, User, get_db_session
+
+runner = CliRunner()
+
+
+def invoke(*args, prompts=()):
+    return runner.invoke(
+        app, list(args), input="".join(f"{value}\n" for value in prompts)
+    )
+
+
+def stored_titles():
+    with get_db_session() as db:
+        return [title for (title,) in db.query(Password.title).order_by(Password.title)]
+
+
+def test_password_lifecycle(memory_vault):
+    # The vault is empty: nothing is left over from other tests.
+    assert stored_titles() == []
+    with get_db_session() as db:
+        assert db.query(User.username).all() == [("test_user",)]
+
+    result = invoke("create_password", prompts=["github", "octocat", "pw1"])
+    assert "Passwort für github wurde erstellt." in result.stdout
+    assert stored_titles() == ["github"]
+
+    assert "pw1" in invoke("show", "github").stdout
+
+    result = invoke("update_password", prompts=["github", "hubot", "neu"])
+    assert "erfolgreich aktualisiert" in result.stdout
+    assert "| hubot" in invoke("show", "github").stdout
+
+    result = invoke("delete_password", prompts=["github"])
+    assert "erfolgreich gelöscht" in result.stdout
+    assert stored_titles() == []
+
+
+def test_duplicate_title_is_rejected(memory_vault):
+    invoke("create_password", prompts=["github", "octocat", "pw1"])
+
+    result = invoke("create_password", prompts=["github"])
+
+    assert "existiert bereits" in result.stdout
+    assert "pw1" in invoke("show", "github").stdout
+
+
+def test_update_and_delete_of_missing_entries(memory_vault):
+    invoke("create_password", prompts=["github", "octocat", "pw1"])
+
+    result = invoke("update_password", prompts=["githbu"])
+    assert (
+        "Kein Passwort mit diesem Titel gefunden. Meintest du: github?" in result.stdout
+    )
+
+    result = invoke("delete_password", prompts=["gitlab"])
+    assert "Kein Passwort mit diesem Titel gefunden." in result.stdout
+    assert stored_titles() == ["github"]
+
+
+def test_listing(memory_vault):
+    assert "Keine Passwörter gefunden." in invoke("get_passwords").stdout
+
+    invoke("create_password", prompts=["github", "octocat", "pw1"])
+    invoke("create_password", prompts=["mail", "me", "pw2"])
+
+    result = invoke("get_passwords")
+    assert "pw1" in result.stdout and "pw2" in result.stdout
+    result = invoke("get_passwords", "--masked")
+    assert "pw1" not in result.stdout and "********" in result.stdout
+    result = invoke("get_passwords", "--reveal", "git*")
+    assert "pw1" in result.stdout and "pw2" not in result.stdout
+    result = invoke("get_passwords", "--format", "jsonl", "--chunk-size", "1")
+    assert [json.loads(line)["title"] for line in result.stdout.splitlines()] == [
+        "github",
+        "mail",
+    ]
+
+
+def test_stored_values_are_encrypted(memory_vault):
+    invoke("create_password", prompts=["github", "octocat", "geheim"])
+
+    row = memory_vault.exec_driver_sql(
+        "SELECT encrypted_password, typeof(encrypted_password) FROM passwords"
+    ).one()
+    assert row[1] == "blob"
+    assert b"geheim" not in row[0]
+
+
+def test_user_accounts(memory_vault):
+    result = invoke("create-user", prompts=["alice", "master"])
+    assert "Benutzer alice wurde erstellt." in result.stdout
+    result = invoke("create-user", prompts=["alice", "anders"])
+    assert "bereits vergeben" in result.stdout
+
+    assert (
+        "Benutzername oder Passwort falsch."
+        in invoke("login", prompts=["alice", "x"]).stdout
+    )
+    assert (
+        "Erfolgreich eingeloggt." in invoke("login", prompts=["alice", "master"]).stdout
+    )
+    with get_db_session() as db:
+        assert db.query(User).count() == 2
+
+    assert "Erfolgreich ausgeloggt." in invoke("logout").stdout
+    assert "Bitte melde dich zuerst an." in invoke("show", "github").stdout
+
+
+def test_search_and_suggestions(memory_vault):
+    for title in ("github", "gitlab", "bitbucket"):
+        invoke("create_password", prompts=[title, "me", "pw"])
+
+    result = invoke("search", "git")
+    assert "github" in result.stdout and "gitlab" in result.stdout
+    assert "bitbucket" not in result.stdout
+
+    assert "Meintest du: github" in invoke("show", "githbu").stdout
+    assert "| github" in invoke("show", "githbu", "--fuzzy").stdout
+
+
+def test_export_import_round_trip(memory_vault, tmp_path):
+    invoke("create_password", prompts=["github", "octocat", "pw1"])
+    invoke("create_password", prompts=["gitlab", "tanuki", "pw2"])
+    export_path = tmp_path / "export.jsonl"
+
+    assert "2 Passwörter" in invoke("export", "--output", str(export_path)).stdout
+    invoke("delete_password", prompts=["github"])
+    result = invoke("import", str(export_path))
+
+    assert "1 Passwörter importiert, 0 übersprungen, 1 Konflikte" in result.stdout
+    records = [json.loads(line) for line in export_path.read_text().splitlines()]
+    assert {record["title"] for record in records} == {"github", "gitlab"}
+    assert stored_titles() == ["github", "gitlab"]
+
+
+def test_audit_reuse(memory_vault):
+    invoke("create_password", prompts=["mail", "me", "same"])
+    invoke("create_password", prompts=["bank", "me", "same"])
+    invoke("create_password", prompts=["shop", "me", "other"])
+
+    result = invoke("audit", "reuse")
+
+    assert "1 Passwörter werden mehrfach verwendet:" in result.stdout
+    assert "bank, mail" in result.stdout
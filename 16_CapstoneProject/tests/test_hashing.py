@@ -0,0 +1,68 @@
+from base64 import urlsafe_b64encode
+from hashlib import sha256
+
+import pytest
+
+from app.config import Settings
+from app.hashing import (calibrate, hash_password, needs_rehash, pack_hash,
+                         unpack_hash, verify_password)
+
+FAST_SCRYPT = Settings(kdf_algorithm="scrypt", scrypt_n=2**10, scrypt_r=8, scrypt_p=1)
+FAST_PBKDF2 = Settings(kdf_algorithm="pbkdf2_sha256", pbkdf2_iterations=1000)
+
+
+@pytest.mark.parametrize("settings", [FAST_SCRYPT, FAST_PBKDF2])
+def test_hash_and_verify(settings):
+    hashed_password = hash_password("geheim", settings)
+
+    assert hashed_password.startswith(settings.kdf_algorithm + "$")
+    assert verify_password("geheim", hashed_password)
+    assert not verify_password("falsch", hashed_password)
+    assert not needs_rehash(hashed_password, settings)
+
+
+def test_hash_password_uses_random_salt():
+    assert hash_password("geheim", FAST_SCRYPT) != hash_password("geheim", FAST_SCRYPT)
+
+
+def test_verify_legacy_sha256_hash():
+    legacy_hash = urlsafe_b64encode(sha256(b"geheim").digest())
+
+    assert verify_password("geheim", legacy_hash)
+    assert verify_password("geheim", legacy_hash.decode())
+    assert not verify_password("falsch", legacy_hash)
+    assert needs_rehash(legacy_hash, FAST_SCRYPT)
+
+
+def test_needs_rehash_on_changed_parameters():
+    hashed_password = hash_password("geheim", FAST_SCRYPT)
+
+    assert needs_rehash(
+        hashed_password, Settings(kdf_algorithm="scrypt", scrypt_n=2**11)
+    )
+    assert needs_rehash(hashed_password, FAST_PBKDF2)
+
+
+def test_calibrate():
+    assert set(calibrate(1, "scrypt")) == {"scrypt_n", "scrypt_r", "scrypt_p"}
+    assert calibrate(1, "pbkdf2_sha256")["pbkdf2_iterations"] >= 100_000
+    with pytest.raises(ValueError):
+        calibrate(1, "md5")
+
+
+@pytest.mark.parametrize("settings", [FAST_SCRYPT, FAST_PBKDF2])
+def test_pack_hash_round_trip(settings):
+    hashed_password = hash_password("geheim", settings)
+    packed = pack_hash(hashed_password)
+
+    assert isinstance(packed, bytes)
+    assert len(packed) < len(hashed_password)
+    assert unpack_hash(packed) == hashed_password
+
+
+@pytest.mark.parametrize(
+    "hashed_password",
+    [urlsafe_b64encode(sha256(b"geheim").digest()).decode(), "kein-hash"],
+)
+def test_pack_hash_keeps_other_values(hashed_password):
+    assert unpack_hash(pack_hash(hashed_password)) == hashed_password
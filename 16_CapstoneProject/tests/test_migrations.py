@@ -0,0 +1,129 @@
+import os
+import sqlite3
+from base64 import urlsafe_b64encode
+from hashlib import sha256
+
+import pytest
+from cryptography.fernet import Fernet
+from sqlalchemy.orm import Session
+
+from app import database
+from app.config import Settings
+from app.database import (Base, Password, User, create_db_engine,
+                          migrate_database)
+from app.hashing import LEGACY, hash_password, verify_password
+from app.migrations import get_schema_version, run_migrations, vacuum
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    settings = Settings(database_path=str(tmp_path / "app.db"), scrypt_n=1024)
+    engine = create_db_engine(settings)
+    monkeypatch.setattr(database, "get_engine", lambda: engine)
+    yield engine
+    engine.dispose()
+
+
+def _create_version_1(path, tokens, hashed_password):
+    # The text-only schema as written before schema_version existed.
+    with sqlite3.connect(path) as connection:
+        connection.execute(
+            "CREATE TABLE users (id INTEGER PRIMARY KEY, username VARCHAR NOT NULL, "
+            "hashed_password VARCHAR NOT NULL)"
+        )
+        connection.execute(
+            "CREATE TABLE passwords (id INTEGER PRIMARY KEY, title VARCHAR NOT NULL, "
+            "username VARCHAR NOT NULL, encrypted_password VARCHAR NOT NULL, "
+            "user_id INTEGER NOT NULL REFERENCES users (id), fingerprint VARCHAR)"
+        )
+        connection.execute(
+            "INSERT INTO users VALUES (1, 'test_user', ?)", (hashed_password,)
+        )
+        connection.executemany(
+            "INSERT INTO passwords VALUES (?, ?, 'me', ?, 1, ?)",
+            [
+                (number, f"title-{number}", token, "ab" * 32)
+                for number, token in enumerate(tokens, 1)
+            ],
+        )
+
+
+def _stored_bytes(path):
+    with sqlite3.connect(path) as connection:
+        return connection.execute(
+            "SELECT SUM(length(CAST(encrypted_password AS BLOB))) FROM passwords"
+        ).fetchone()[0]
+
+
+def _storage_classes(path):
+    with sqlite3.connect(path) as connection:
+        return set(
+            connection.execute(
+                "SELECT typeof(encrypted_password), typeof(fingerprint) FROM passwords "
+                "UNION SELECT typeof(hashed_password), 'blob' FROM users"
+            )
+        )
+
+
+def test_migration_converts_text_columns_to_blobs(engine, tmp_path):
+    path = str(tmp_path / "app.db")
+    fernet = Fernet(Fernet.generate_key())
+    tokens = [
+        fernet.encrypt(f"secret-{number}".encode()).decode() for number in range(300)
+    ]
+    hashed_password = hash_password("master", Settings(scrypt_n=1024))
+    _create_version_1(path, tokens, hashed_password)
+
+    # Text rows stay readable before the migration.
+    with Session(engine) as db:
+        assert db.get(Password, 1).encrypted_password == tokens[0]
+    stored_before = _stored_bytes(path)
+
+    progress = []
+    assert (
+        migrate_database(chunk_size=128, progress=lambda *step: progress.append(step))
+        == []
+    )
+
+    assert _storage_classes(path) == {("blob", "blob")}
+    assert ("passwords.encrypted_password", 300) in progress
+    with engine.connect() as connection:
+        assert get_schema_version(connection) == 2
+    with Session(engine) as db:
+        assert [
+            row.encrypted_password for row in db.query(Password).order_by(Password.id)
+        ] == tokens
+        assert db.get(Password, 1).fingerprint == "ab" * 32
+        assert db.get(User, 1).hashed_password == hashed_password
+
+    assert _stored_bytes(path) < stored_before * 0.8
+    assert run_migrations(engine) == []
+    size_before = os.path.getsize(path)
+    vacuum(engine)
+    assert os.path.getsize(path) <= size_before
+
+
+def test_new_database_starts_at_current_version(engine):
+    Base.metadata.create_all(bind=engine)
+
+    with engine.connect() as connection:
+        assert get_schema_version(connection) == 2
+    assert run_migrations(engine) == []
+
+
+def test_migration_converts_baseline_bytes_hashes(engine, tmp_path):
+    # The original hash_password returned bytes, so SQLite stored a BLOB.
+    path = str(tmp_path / "app.db")
+    _create_version_1(path, [], urlsafe_b64encode(sha256(b"master").digest()))
+
+    with Session(engine) as db:
+        assert verify_password("master", db.get(User, 1).hashed_password)
+
+    migrate_database()
+
+    with sqlite3.connect(path) as connection:
+        (stored,) = connection.execute("SELECT hashed_password FROM users").fetchone()
+    assert stored[0] == LEGACY
+    with Session(engine) as db:
+        assert verify_password("master", db.get(User, 1).hashed_password)
+        assert not verify_password("falsch", db.get(User, 1).hashed_password)
@@ -0,0 +1,51 @@
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from typer.testing import CliRunner
+
+from app import profiling
+from app.cli import app
+
+runner = CliRunner()
+
+
+def test_phase_is_free_when_disabled():
+    assert not profiling.is_enabled()
+    assert profiling.phase("crypto") is profiling.phase("render")
+
+    with profiling.phase("crypto"):
+        pass
+
+    assert "crypto" not in profiling._timings
+
+
+def test_profile_option_reports_phases(vault):
+    runner.invoke(app, ["create_password"], input="github\noctocat\npw\n")
+
+    result = runner.invoke(app, ["--profile", "get_passwords"])
+
+    assert result.exit_code == 0
+    for name in (
+        "Profil:",
+        "startup",
+        "imports",
+        "query: SELECT",
+        "crypto",
+        "render",
+        "command total",
+    ):
+        assert name in result.output
+    assert not profiling.is_enabled()
+    assert not event.contains(
+        Engine, "before_cursor_execute", profiling._before_execute
+    )
+
+
+def test_profile_output_writes_pstats(vault):
+    import pstats
+
+    stats_file = vault / "profile.out"
+
+    result = runner.invoke(app, ["--profile-output", str(stats_file), "get_passwords"])
+
+    assert result.exit_code == 0
+    assert pstats.Stats(str(stats_file)).total_calls > 0
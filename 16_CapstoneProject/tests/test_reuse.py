@@ -0,0 +1,82 @@
+import sqlite3
+
+import pytest
+from typer.testing import CliRunner
+
+from app.cli import app
+from app.config import get_settings
+from app.database import get_db_session
+from app.reuse import backfill_fingerprints, find_reused
+from app.utils import reset_cipher
+from app.vault import Vault
+
+runner = CliRunner()
+
+
+@pytest.fixture
+def fingerprint_key(vault, monkeypatch):
+    monkeypatch.setenv("FINGERPRINT_KEY", "test-fingerprint-key")
+    reset_cipher()
+
+
+def _fingerprints():
+    with sqlite3.connect(get_settings().database_path) as connection:
+        return dict(connection.execute("SELECT title, fingerprint FROM passwords"))
+
+
+def test_fingerprints_are_written_on_every_write_path(fingerprint_key):
+    with get_db_session() as db:
+        passwords = Vault.open(db)
+        passwords.create("mail", "me", "shared")
+        passwords.import_records(
+            [
+                {"title": "bank", "password": "shared"},
+                {"title": "shop", "password": "own"},
+            ]
+        )
+        assert find_reused(db, passwords.user_id) == [["bank", "mail"]]
+
+        passwords.update("bank", "me", "changed")
+        assert find_reused(db, passwords.user_id) == []
+
+    fingerprints = _fingerprints()
+    assert all(len(fingerprint) == 32 for fingerprint in fingerprints.values())
+    assert "shared" not in fingerprints.values()
+
+
+def test_backfill_fills_rows_written_without_key(vault, monkeypatch):
+    with get_db_session() as db:
+        passwords = Vault.open(db)
+        for title in ("a", "b", "c"):
+            passwords.create(title, "me", "same" if title != "c" else "other")
+    assert set(_fingerprints().values()) == {None}
+
+    monkeypatch.setenv("FINGERPRINT_KEY", "test-fingerprint-key")
+    reset_cipher()
+    with get_db_session() as db:
+        user_id = Vault.open(db).user_id
+        assert backfill_fingerprints(db, user_id, chunk_size=2) == 3
+        assert backfill_fingerprints(db, user_id) == 0
+        assert find_reused(db, user_id) == [["a", "b"]]
+
+
+def test_audit_reuse(vault, monkeypatch):
+    # Registered with monkeypatch so the key the command stores is removed again.
+    monkeypatch.setenv("FINGERPRINT_KEY", "")
+    with get_db_session() as db:
+        passwords = Vault.open(db)
+        passwords.create("mail", "me", "shared")
+        passwords.create("bank", "me", "shared")
+        passwords.create("shop", "me", "own")
+
+    result = runner.invoke(app, ["audit", "reuse"])
+
+    assert result.exit_code == 0
+    assert "Neuer FINGERPRINT_KEY in .env gespeichert." in result.stdout
+    assert "3 bestehende Einträge mit Fingerabdruck versehen." in result.stdout
+    assert "1 Passwörter werden mehrfach verwendet:" in result.stdout
+    assert "  bank, mail" in result.stdout
+    assert "FINGERPRINT_KEY=" in (vault / ".env").read_text()
+
+    result = runner.invoke(app, ["audit", "reuse"])
+    assert "Fingerabdruck" not in result.stdout
@@ -0,0 +1,99 @@
+import pytest
+from dotenv import dotenv_values
+from typer.testing import CliRunner
+
+from app import rotation
+from app.cli import app
+from app.database import KeyRotation, Password, get_db_session
+from app.utils import reset_cipher
+from app.vault import Vault
+
+runner = CliRunner()
+
+
+@pytest.fixture
+def passwords(vault, monkeypatch):
+    # rotate-key writes the new keys to os.environ; restore them afterwards.
+    monkeypatch.setenv("FERNET_PREVIOUS_KEYS", "")
+    with get_db_session() as db:
+        entries = Vault.open(db)
+        for number in range(5):
+            entries.create(f"title-{number}", "me", f"pw-{number}")
+    return vault
+
+
+def _decrypted(db):
+    return [entry.password for entry in Vault.open(db).list()]
+
+
+def test_rotate_key_reencrypts_every_row(passwords):
+    old_key = dotenv_values(".env")["FERNET_KEY"]
+    with get_db_session() as db:
+        before = {row.id: row.encrypted_password for row in db.query(Password)}
+
+    result = runner.invoke(app, ["rotate-key", "--batch-size", "2"])
+
+    assert "Rotation abgeschlossen: 5 Passwörter" in result.stdout
+    env = dotenv_values(".env")
+    assert env["FERNET_KEY"] != old_key
+    # Backups from before the rotation stay readable.
+    assert env["FERNET_PREVIOUS_KEYS"] == old_key
+    reset_cipher()
+    with get_db_session() as db:
+        assert _decrypted(db) == [f"pw-{number}" for number in range(5)]
+        assert all(
+            row.encrypted_password != before[row.id] for row in db.query(Password)
+        )
+        assert db.get(KeyRotation, rotation.CHECKPOINT_ID) is None
+
+
+def test_rotate_key_drop_previous_removes_old_keys(passwords):
+    result = runner.invoke(app, ["rotate-key", "--drop-previous"])
+
+    assert "Alte Schlüssel entfernt." in result.stdout
+    assert "FERNET_PREVIOUS_KEYS" not in dotenv_values(".env")
+    reset_cipher()
+    with get_db_session() as db:
+        assert _decrypted(db) == [f"pw-{number}" for number in range(5)]
+
+
+def test_interrupted_rotation_resumes_from_checkpoint(passwords, monkeypatch):
+    rotate_many = rotation.rotate_many
+    calls = []
+
+    def failing_rotate_many(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 2:
+            raise KeyboardInterrupt
+        return rotate_many(*args, **kwargs)
+
+    monkeypatch.setattr(rotation, "rotate_many", failing_rotate_many)
+    runner.invoke(app, ["rotate-key", "--batch-size", "2"])
+
+    env = dotenv_values(".env")
+    assert env["FERNET_PREVIOUS_KEYS"]
+    with get_db_session() as db:
+        assert db.get(KeyRotation, rotation.CHECKPOINT_ID).last_id == 2
+        # Rotated and not yet rotated rows are both readable mid-rotation.
+        assert _decrypted(db) == [f"pw-{number}" for number in range(5)]
+
+    monkeypatch.setattr(rotation, "rotate_many", rotate_many)
+    result = runner.invoke(app, ["rotate-key", "--batch-size", "2"])
+
+    assert "Setze Rotation nach ID 2 fort." in result.stdout
+    assert "Rotation abgeschlossen: 5 Passwörter (3 in diesem Lauf)" in result.stdout
+    assert dotenv_values(".env")["FERNET_KEY"] == env["FERNET_KEY"]
+    with get_db_session() as db:
+        assert _decrypted(db) == [f"pw-{number}" for number in range(5)]
+
+
+def test_resume_refuses_a_different_key(passwords):
+    with get_db_session() as db:
+        db.add(
+            KeyRotation(id=rotation.CHECKPOINT_ID, key_fingerprint="other", last_id=0)
+        )
+        db.commit()
+
+    result = runner.invoke(app, ["rotate-key"])
+
+    assert "anderen FERNET_KEY" in result.stdout
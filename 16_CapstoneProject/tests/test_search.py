@@ -0,0 +1,118 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, Password, User, create_search_index
+from app.search import search_passwords, suggest_titles
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def users(db):
+    alice = User(username="alice", hashed_password="x")
+    bob = User(username="bob", hashed_password="x")
+    db.add_all([alice, bob])
+    db.commit()
+    for title, username in [
+        ("GitHub", "octocat"),
+        ("GitLab", "tanuki"),
+        ("Mailbox", "alice@example.com"),
+        ("x", "short"),
+    ]:
+        db.add(
+            Password(
+                title=title, username=username, encrypted_password="e", user_id=alice.id
+            )
+        )
+    db.add(
+        Password(title="GitHub", username="bob", encrypted_password="e", user_id=bob.id)
+    )
+    db.commit()
+    return alice, bob
+
+
+def titles(results):
+    return sorted(result.title for result in results)
+
+
+def test_search_substring(db, users):
+    alice, _ = users
+
+    assert titles(search_passwords(db, alice.id, "itl")) == ["GitLab"]
+    assert titles(search_passwords(db, alice.id, "git")) == ["GitHub", "GitLab"]
+    assert titles(search_passwords(db, alice.id, "example")) == ["Mailbox"]
+
+
+def test_search_prefix(db, users):
+    alice, _ = users
+
+    assert titles(search_passwords(db, alice.id, "git", prefix=True)) == [
+        "GitHub",
+        "GitLab",
+    ]
+    assert titles(search_passwords(db, alice.id, "hub", prefix=True)) == []
+
+
+def test_search_short_query_falls_back_to_like(db, users):
+    alice, _ = users
+
+    assert titles(search_passwords(db, alice.id, "x", prefix=True)) == ["x"]
+    assert titles(search_passwords(db, alice.id, "%")) == []
+
+
+def test_search_index_follows_updates_and_deletes(db, users):
+    alice, _ = users
+    github = db.query(Password).filter_by(user_id=alice.id, title="GitHub").one()
+
+    github.title = "Codeberg"
+    db.commit()
+    assert titles(search_passwords(db, alice.id, "git")) == ["GitLab"]
+    assert titles(search_passwords(db, alice.id, "berg")) == ["Codeberg"]
+
+    db.delete(github)
+    db.commit()
+    assert titles(search_passwords(db, alice.id, "berg")) == []
+
+
+def test_create_search_index_rebuilds_existing_rows(db, users):
+    alice, _ = users
+    for statement in (
+        "DROP TABLE passwords_fts",
+        "DROP TRIGGER passwords_fts_insert",
+        "DROP TRIGGER passwords_fts_delete",
+        "DROP TRIGGER passwords_fts_update",
+    ):
+        db.execute(text(statement))
+    db.commit()
+
+    assert titles(search_passwords(db, alice.id, "lab")) == ["GitLab"]
+    assert not create_search_index(db.connection())
+
+
+def test_suggest_titles_ranks_close_matches(db, users):
+    alice, bob = users
+
+    assert suggest_titles(db, alice.id, "GitHbu") == ["GitHub", "GitLab"]
+    assert suggest_titles(db, alice.id, "githib", limit=1) == ["GitHub"]
+    assert suggest_titles(db, alice.id, "mailbx") == ["Mailbox"]
+    assert suggest_titles(db, alice.id, "Bank") == []
+    assert suggest_titles(db, alice.id, "Gi") == []
+    # Only the user's own titles are suggested.
+    assert suggest_titles(db, alice.id, "GitLba") == ["GitLab", "GitHub"]
+    assert suggest_titles(db, bob.id, "GitLba") == ["GitHub"]
+
+
+def test_suggest_titles_without_search_index(db, users):
+    alice, _ = users
+    db.execute(text("DROP TABLE passwords_fts"))
+    db.commit()
+
+    assert suggest_titles(db, alice.id, "GitHbu") == []
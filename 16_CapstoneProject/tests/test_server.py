@@ -0,0 +1,123 @@
+import json
+import threading
+from http.client import HTTPConnection
+from unittest.mock import patch
+from urllib.error import HTTPError
+from urllib.parse import urlsplit
+from urllib.request import Request, urlopen
+
+import pytest
+from typer.testing import CliRunner
+
+from app.cli import app
+from app.server import create_server
+from app.sessions import read_session, session_file
+from benchmarks.load import run_load_test
+
+
+@pytest.fixture
+def server(vault):
+    server = create_server(port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def _call(url, method="GET", body=None, token=None):
+    token = token if token is not None else read_session()["token"]
+    request = Request(
+        url,
+        data=json.dumps(body).encode() if body is not None else None,
+        method=method,
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    try:
+        with urlopen(request) as response:
+            return response.status, json.loads(response.read())
+    except HTTPError as error:
+        return error.code, json.loads(error.read())
+
+
+def test_server_crud(server):
+    created = {"title": "git/hub", "username": "octocat", "password": "pw1"}
+
+    assert _call(f"{server}/passwords", "POST", created)[0] == 201
+    assert _call(f"{server}/passwords", "POST", created) == (
+        409,
+        {"ok": False, "error": "exists"},
+    )
+    assert _call(f"{server}/passwords/git%2Fhub") == (
+        200,
+        {"ok": True, "result": created},
+    )
+
+    update = {"username": "hubot", "password": "pw2"}
+    assert _call(f"{server}/passwords/git%2Fhub", "PUT", update)[0] == 200
+    status, body = _call(f"{server}/passwords?masked=1")
+    assert body["result"] == [
+        {"title": "git/hub", "username": "hubot", "password": "********"}
+    ]
+    assert _call(f"{server}/search?q=hub")[1]["result"] == [
+        {"title": "git/hub", "username": "hubot"}
+    ]
+
+    assert _call(f"{server}/passwords/git%2Fhub", "DELETE")[0] == 200
+    assert _call(f"{server}/passwords/git%2Fhub")[0] == 404
+
+
+def test_server_rejects_invalid_requests(server):
+    assert _call(f"{server}/passwords", token="wrong") == (
+        401,
+        {"ok": False, "error": "unauthorized"},
+    )
+    assert _call(f"{server}/passwords", "POST", {"title": "x"})[0] == 400
+    assert _call(f"{server}/unknown")[0] == 404
+
+
+@pytest.mark.parametrize("length", ["abc", "-5"])
+def test_server_rejects_invalid_content_length(server, length):
+    connection = HTTPConnection(urlsplit(server).netloc)
+    connection.putrequest("POST", "/passwords")
+    connection.putheader("Authorization", f"Bearer {read_session()['token']}")
+    connection.putheader("Content-Length", length)
+    connection.endheaders()
+    response = connection.getresponse()
+
+    assert response.status == 400
+    assert json.loads(response.read()) == {"ok": False, "error": "invalid_request"}
+    connection.close()
+
+
+def test_serve_points_to_the_session_file_instead_of_printing_the_token(vault):
+    with patch("app.server.create_server") as mock_create_server:
+        mock_create_server.return_value.server_port = 8765
+        mock_create_server.return_value.serve_forever.side_effect = KeyboardInterrupt
+
+        result = CliRunner().invoke(app, ["serve"])
+
+    assert result.exit_code == 0
+    assert read_session()["token"] not in result.stdout
+    assert session_file() in result.stdout
+
+
+def test_load_test_reports_latency_percentiles(server):
+    _call(
+        f"{server}/passwords",
+        "POST",
+        {"title": "mail", "username": "me", "password": "pw"},
+    )
+
+    results = run_load_test(
+        server,
+        read_session()["token"],
+        "/passwords/mail",
+        [1, 4],
+        requests_per_client=5,
+    )
+
+    assert [result["requests"] for result in results] == [5, 20]
+    assert all(result["errors"] == 0 for result in results)
+    assert all(0 < result["p50_ms"] <= result["p99_ms"] for result in results)
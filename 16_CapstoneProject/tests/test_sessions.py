@@ -0,0 +1,74 @@
+import os
+import sqlite3
+import stat
+
+from typer.testing import CliRunner
+
+from app.cli import app
+from app.database import (User, UserSession, get_db_session,
+                          get_logged_in_user, resolve_token, start_session)
+from app.hashing import hash_password
+from app.sessions import hash_token, read_session, session_file, write_session
+
+runner = CliRunner()
+
+
+def test_login_writes_private_session_file_and_hashed_token(vault):
+    with get_db_session() as db:
+        db.add(User(username="alice", hashed_password=hash_password("secret")))
+        db.commit()
+
+    result = runner.invoke(app, ["login"], input="alice\nsecret\n")
+
+    assert "Erfolgreich eingeloggt." in result.stdout
+    session = read_session()
+    assert stat.S_IMODE(os.stat(session_file()).st_mode) == 0o600
+    with get_db_session() as db:
+        assert get_logged_in_user(db).username == "alice"
+        assert db.get(UserSession, session["token"]) is None
+        assert db.get(UserSession, hash_token(session["token"])) is not None
+        assert resolve_token(db, session["token"]).username == "alice"
+
+
+def test_expired_session_is_ignored(vault):
+    session = read_session()
+    write_session(session["token"], session["user_id"], expires_at=0)
+
+    with get_db_session() as db:
+        assert get_logged_in_user(db) is None
+
+
+def test_logout_revokes_token(vault):
+    token = read_session()["token"]
+
+    result = runner.invoke(app, ["logout"])
+
+    assert "Erfolgreich ausgeloggt." in result.stdout
+    assert not os.path.exists(session_file())
+    with get_db_session() as db:
+        assert resolve_token(db, token) is None
+        assert get_logged_in_user(db) is None
+
+
+def test_start_session_purges_expired_sessions(vault):
+    with get_db_session() as db:
+        db.add(UserSession(token_hash="old", user_id=1, expires_at=0))
+        db.commit()
+
+        start_session(db, 1)
+        db.commit()
+
+        assert db.get(UserSession, "old") is None
+
+
+def test_login_before_migrate_asks_for_migration(vault):
+    with get_db_session() as db:
+        db.add(User(username="alice", hashed_password=hash_password("secret")))
+        db.commit()
+    with sqlite3.connect(vault / "app.db") as connection:
+        connection.execute("DROP TABLE sessions")
+
+    result = runner.invoke(app, ["login"], input="alice\nsecret\n")
+
+    assert result.exit_code == 0
+    assert "Bitte zuerst 'migrate' ausführen." in result.stdout
@@ -0,0 +1,80 @@
+from unittest.mock import patch
+
+import pytest
+import typer
+from typer.testing import CliRunner
+
+from app import database, shell
+from app.cli import app
+from app.database import Password, get_db_session, shared_session
+from app.shell import VaultShell
+
+runner = CliRunner()
+
+
+@pytest.fixture(autouse=True)
+def history_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(shell, "HISTORY_FILE", str(tmp_path / "history"))
+
+
+def test_shell_runs_commands_in_one_session(vault):
+    commands = (
+        "\n".join(
+            [
+                "create_password",
+                "github",
+                "octocat",
+                "pw",
+                "create_password",
+                "mail",
+                "me",
+                "secret",
+                "get_passwords",
+                "delete_password",
+                "mail",
+                "show mail",
+                "shell",
+                "exit",
+            ]
+        )
+        + "\n"
+    )
+
+    with patch(
+        "app.database.get_sessionmaker", wraps=database.get_sessionmaker
+    ) as sessionmaker:
+        result = runner.invoke(app, ["shell"], input=commands)
+
+    assert result.exit_code == 0, result.output
+    assert "Passwort für github wurde erstellt." in result.output
+    assert "Passwort für mail wurde erstellt." in result.output
+    assert "octocat" in result.output and "secret" in result.output
+    assert "Passwort erfolgreich gelöscht." in result.output
+    assert "Kein Passwort mit diesem Titel gefunden." in result.output
+    assert "Die Shell läuft bereits." in result.output
+    assert sessionmaker.call_count == 1
+    with get_db_session() as db:
+        assert [title for (title,) in db.query(Password.title)] == ["github"]
+
+
+def test_shell_reports_usage_errors(vault):
+    result = runner.invoke(app, ["shell"], input="show\nunknown\n")
+
+    assert result.exit_code == 0
+    assert "Missing argument" in result.output
+    assert "No such command" in result.output
+
+
+def test_shell_completion(vault):
+    with shared_session() as db:
+        runner.invoke(app, ["create_password"], input="github\noctocat\npw\n")
+        runner.invoke(app, ["create_password"], input="gitlab\ntanuki\npw\n")
+        vault_shell = VaultShell(typer.main.get_command(app), db)
+
+        assert vault_shell.completenames("get") == ["get_passwords"]
+        assert vault_shell.completenames("ex") == ["exit", "export"]
+        assert vault_shell.completedefault("git", "show git", 5, 8) == [
+            "github",
+            "gitlab",
+        ]
+        assert vault_shell.completedefault("git", "export git", 7, 10) == []
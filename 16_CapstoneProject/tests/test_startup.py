@@ -0,0 +1,99 @@
+import os
+import socketserver
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+# Cold start budget for "import app.cli", measured with python -X importtime.
+# Override with PM_STARTUP_BUDGET_MS on slow CI machines.
+STARTUP_BUDGET_MS = float(os.environ.get("PM_STARTUP_BUDGET_MS", "300"))
+HEAVY_MODULES = ("sqlalchemy", "cryptography", "tabulate", "dotenv")
+# Commands answered by a running agent must not load the vault stack either.
+AGENT_PATH_MODULES = HEAVY_MODULES + ("asyncio", "app.vault")
+SRC_DIR = Path(__file__).resolve().parents[1] / "src"
+
+
+def run_python(code, *flags, input=None, **environ):
+    env = dict(os.environ, **environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        filter(None, [str(SRC_DIR), env.get("PYTHONPATH")])
+    )
+    return subprocess.run(
+        [sys.executable, *flags, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=env,
+        input=input,
+    )
+
+
+def loaded_after_cli(args, modules, **kwargs):
+    code = (
+        "import sys\n"
+        "from app.cli import app\n"
+        "try:\n"
+        f"    app({args!r}, prog_name='password-manager')\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        f"loaded = [m for m in {modules!r} if m in sys.modules]\n"
+        "print('LOADED:' + ','.join(loaded))\n"
+    )
+    return run_python(code, **kwargs).stdout
+
+
+class _OkAgentHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for _ in self.rfile:
+            self.wfile.write(b'{"ok": true, "result": null}\n')
+            self.wfile.flush()
+
+
+@pytest.fixture
+def fake_agent(tmp_path):
+    path = str(tmp_path / "agent.sock")
+    server = socketserver.ThreadingUnixStreamServer(path, _OkAgentHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield path
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def import_time_ms():
+    stderr = run_python("import app.cli", "-X", "importtime").stderr
+    for line in stderr.splitlines():
+        _, cumulative, name = line.split("|")
+        if name.strip() == "app.cli":
+            return int(cumulative) / 1000
+    raise AssertionError("app.cli not found in -X importtime output")
+
+
+@pytest.mark.parametrize("args", [[], ["--help"], ["create_password", "--help"]])
+def test_cli_startup_does_not_import_heavy_modules(args):
+    output = loaded_after_cli(args, HEAVY_MODULES)
+
+    assert "LOADED:\n" in output
+
+
+def test_agent_backed_command_does_not_import_vault_stack(fake_agent):
+    output = loaded_after_cli(
+        ["delete_password"],
+        AGENT_PATH_MODULES,
+        input="GitHub\n",
+        PM_AGENT_SOCKET=fake_agent,
+    )
+
+    assert "Passwort erfolgreich gelöscht." in output
+    assert "LOADED:\n" in output
+
+
+def test_cli_import_time_within_budget():
+    best = min(import_time_ms() for _ in range(3))
+
+    assert best < STARTUP_BUDGET_MS, f"import app.cli took {best:.1f} ms"
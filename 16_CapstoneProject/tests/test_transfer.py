@@ -0,0 +1,233 @@
+import json
+from unittest.mock import MagicMock
+
+import pytest
+from cryptography.fernet import Fernet
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import transfer
+from app.database import Base, Password, User
+from app.output import serialize_chunk
+from app.transfer import (export_records, import_records,
+                          iter_decrypted_chunks, normalize_entry, read_records)
+from app.utils import decrypt_password, reset_cipher
+
+
+@pytest.fixture(autouse=True)
+def fernet_key(monkeypatch):
+    monkeypatch.setenv("FERNET_KEY", Fernet.generate_key().decode())
+    reset_cipher()
+    yield
+    reset_cipher()
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def user(db):
+    user = User(username="test_user", hashed_password="hashed_test_password")
+    db.add(user)
+    db.commit()
+    return user
+
+
+@pytest.mark.parametrize(
+    "record, expected",
+    [
+        (
+            {"title": "github", "username": "octocat", "password": "pw"},
+            {"title": "github", "username": "octocat", "password": "pw"},
+        ),
+        # Chrome
+        (
+            {
+                "name": "github.com",
+                "url": "https://github.com",
+                "username": "octocat",
+                "password": "pw",
+            },
+            {"title": "github.com", "username": "octocat", "password": "pw"},
+        ),
+        # Firefox
+        (
+            {"url": "https://github.com", "username": "octocat", "password": "pw"},
+            {"title": "https://github.com", "username": "octocat", "password": "pw"},
+        ),
+        # Bitwarden CSV
+        (
+            {
+                "name": "github",
+                "login_uri": "https://github.com",
+                "login_username": "octocat",
+                "login_password": "pw",
+            },
+            {"title": "github", "username": "octocat", "password": "pw"},
+        ),
+        # KeePass
+        (
+            {"Account": "github", "Login Name": "octocat", "Password": "pw"},
+            {"title": "github", "username": "octocat", "password": "pw"},
+        ),
+        # Bitwarden JSON
+        (
+            {"name": "github", "login": {"username": "octocat", "password": "pw"}},
+            {"title": "github", "username": "octocat", "password": "pw"},
+        ),
+        (
+            {"name": "github", "login": {"username": None, "password": "pw"}},
+            {"title": "github", "username": "", "password": "pw"},
+        ),
+        ({"title": "github", "username": "octocat"}, None),
+    ],
+)
+def test_normalize_entry(record, expected):
+    assert normalize_entry(record) == expected
+
+
+def test_read_records_csv_json_jsonl(tmp_path):
+    csv_file = tmp_path / "export.csv"
+    csv_file.write_text(
+        "name,url,username,password\ngithub,https://github.com,octocat,pw\n"
+    )
+    json_file = tmp_path / "export.json"
+    json_file.write_text(
+        json.dumps({"items": [{"name": "github", "login": {"password": "pw"}}]})
+    )
+    jsonl_file = tmp_path / "export.jsonl"
+    jsonl_file.write_text(
+        '{"title": "a", "password": "1"}\n\n{"title": "b", "password": "2"}\n'
+    )
+
+    assert [r["name"] for r in read_records(str(csv_file))] == ["github"]
+    assert [r["name"] for r in read_records(str(json_file))] == ["github"]
+    assert [r["title"] for r in read_records(str(jsonl_file))] == ["a", "b"]
+
+
+@pytest.mark.parametrize(
+    "document",
+    [
+        [{"title": "a", "password": 1}, {"title": "b", "password": 23}],
+        {
+            "encrypted": False,
+            "folders": [{"id": 1}],
+            "items": [{"title": "a"}, {"title": "b"}],
+        },
+        {"passwords": [{"title": "a"}, {"title": "b"}], "items": []},
+        [],
+    ],
+)
+def test_read_records_parses_json_incrementally(tmp_path, monkeypatch, document):
+    monkeypatch.setattr(transfer, "JSON_READ_SIZE", 3)
+    json_file = tmp_path / "export.json"
+    json_file.write_text(json.dumps(document, indent=2))
+    expected = (
+        document
+        if isinstance(document, list)
+        else (document.get("items") or document.get("passwords"))
+    )
+
+    assert list(read_records(str(json_file))) == expected
+
+
+def test_import_records(db, user):
+    db.add(
+        Password(
+            title="existing", username="me", encrypted_password="x", user_id=user.id
+        )
+    )
+    db.commit()
+    records = [
+        {"title": "github", "username": "octocat", "password": "pw1"},
+        {"title": "existing", "username": "me", "password": "pw2"},
+        {"title": "github", "username": "octocat", "password": "pw3"},
+        {"title": "incomplete"},
+        {"title": "mail", "username": "me", "password": "pw4"},
+    ]
+
+    result = import_records(db, user.id, records, chunk_size=2)
+
+    assert (result.imported, result.conflicts, result.skipped) == (2, 2, 1)
+    stored = {
+        p.title: p for p in db.query(Password).filter(Password.user_id == user.id)
+    }
+    assert set(stored) == {"existing", "github", "mail"}
+    assert decrypt_password(stored["github"].encrypted_password) == "pw1"
+    assert decrypt_password(stored["mail"].encrypted_password) == "pw4"
+
+
+@pytest.mark.parametrize(
+    "file_format, extension", [("jsonl", ".jsonl"), ("csv", ".csv")]
+)
+@pytest.mark.parametrize("encrypt", [False, True])
+def test_export_import_roundtrip(db, user, tmp_path, file_format, extension, encrypt):
+    records = [
+        {"title": f"title-{i}", "username": f"user-{i}", "password": f'pw,"{i}"'}
+        for i in range(7)
+    ]
+    # Characters str.splitlines() treats as line breaks must survive intact.
+    records.append(
+        {"title": "separators", "username": "me", "password": "a\u2028b\x85c\x1ed"}
+    )
+    import_records(db, user.id, records)
+    export_file = tmp_path / ("export" + extension + (".enc" if encrypt else ""))
+
+    with open(export_file, "w", newline="", encoding="utf-8") as output:
+        exported = export_records(
+            db, user.id, output, file_format, encrypt, chunk_size=3
+        )
+
+    assert exported == 8
+    if encrypt:
+        assert "title-0" not in export_file.read_text()
+    assert list(read_records(str(export_file), encrypted=encrypt)) == records
+
+
+def test_export_records_streams_chunks(db, user):
+    import_records(
+        db, user.id, [{"title": f"t{i}", "password": "pw"} for i in range(5)]
+    )
+    output = MagicMock()
+
+    export_records(db, user.id, output, "jsonl", chunk_size=2)
+
+    assert output.write.call_count == 3
+
+
+def test_iter_decrypted_chunks_reveal_decrypts_matching_rows_only(db, user):
+    import_records(
+        db,
+        user.id,
+        [
+            {"title": "github", "username": "octocat", "password": "pw1"},
+            {"title": "mail", "username": "me", "password": "pw2"},
+            {"title": "gitlab", "username": "tanuki", "password": "pw3"},
+        ],
+    )
+
+    chunks = list(iter_decrypted_chunks(db, user.id, chunk_size=2, reveal="git*"))
+
+    assert [[entry["password"] for entry in chunk] for chunk in chunks] == [
+        ["pw1", "********"],
+        ["pw3"],
+    ]
+    masked = list(iter_decrypted_chunks(db, user.id, masked=True))
+    assert {entry["password"] for entry in masked[0]} == {"********"}
+
+
+def test_serialize_chunk_plain_and_tsv():
+    entries = [{"title": "x" * 40, "username": "octocat", "password": "a\tb"}]
+
+    plain = serialize_chunk(entries, "plain", header=True).splitlines()
+    tsv = serialize_chunk(entries, "tsv", header=False).splitlines()
+
+    assert plain[0].startswith("Titel ")
+    assert plain[2] == "x" * 31 + "…  " + "octocat".ljust(24) + "  a\tb"
+    assert tsv == ["x" * 40 + '\toctocat\t"a\tb"']
@@ -1,3 +1,71 @@
+import pytest
+from cryptography.fernet import Fernet
 
+from app import utils
+from app.utils import (decrypt_many, decrypt_password, encrypt_many,
+                       encrypt_password, get_cipher, reset_cipher, rotate_many)
 
 
+@pytest.fixture(autouse=True)
+def fernet_key(monkeypatch):
+    monkeypatch.setenv("FERNET_KEY", Fernet.generate_key().decode())
+    reset_cipher()
+    yield
+    reset_cipher()
+
+
+def test_get_cipher_is_cached():
+    assert get_cipher() is get_cipher()
+
+
+def test_reset_cipher_reloads_key(monkeypatch):
+    encrypted_password = encrypt_password("geheim")
+
+    monkeypatch.setenv("FERNET_KEY", Fernet.generate_key().decode())
+    reset_cipher()
+
+    with pytest.raises(Exception):
+        decrypt_password(encrypted_password)
+
+
+def test_encrypt_decrypt_roundtrip():
+    assert decrypt_password(encrypt_password("geheim")) == "geheim"
+
+
+@pytest.mark.parametrize(
+    "workers, use_processes", [(None, False), (4, False), (2, True)]
+)
+def test_encrypt_many_decrypt_many_roundtrip(monkeypatch, workers, use_processes):
+    monkeypatch.setattr(utils, "BATCH_CHUNK_SIZE", 3)
+    passwords = [f"passwort-{i}" for i in range(10)]
+
+    encrypted_passwords = encrypt_many(
+        passwords, workers=workers, use_processes=use_processes
+    )
+
+    assert len(encrypted_passwords) == len(passwords)
+    assert (
+        decrypt_many(encrypted_passwords, workers=workers, use_processes=use_processes)
+        == passwords
+    )
+    assert [decrypt_password(token) for token in encrypted_passwords] == passwords
+
+
+def test_decrypt_many_empty():
+    assert decrypt_many([]) == []
+
+
+def test_previous_keys_stay_readable_and_rotate_to_the_new_key(monkeypatch):
+    old_token = encrypt_password("geheim")
+    old_key = utils.get_fernet_key().decode()
+
+    monkeypatch.setenv("FERNET_KEY", Fernet.generate_key().decode())
+    monkeypatch.setenv("FERNET_PREVIOUS_KEYS", old_key)
+    reset_cipher()
+
+    assert decrypt_password(old_token) == "geheim"
+    (new_token,) = rotate_many([old_token])
+
+    monkeypatch.delenv("FERNET_PREVIOUS_KEYS")
+    reset_cipher()
+    assert decrypt_password(new_token) == "geheim"
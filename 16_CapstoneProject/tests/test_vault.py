@@ -0,0 +1,162 @@
+import asyncio
+import sqlite3
+import threading
+
+import pytest
+
+from app.config import reset_settings
+from app.database import get_db_session, reset_engine
+from app.sessions import remove_session
+from app.vault import (AsyncVault, DatabaseBusyError, Entry, EntryExistsError,
+                       EntryNotFoundError, NotLoggedInError, Vault,
+                       create_async_session_factory)
+
+
+def test_vault_crud(vault):
+    with get_db_session() as db:
+        passwords = Vault.open(db)
+        passwords.create("github", "octocat", "pw1")
+        passwords.create("gitlab", "tanuki", "pw2")
+
+        with pytest.raises(EntryExistsError):
+            passwords.create("github", "octocat", "pw1")
+
+        passwords.update("github", "hubot", "pw3")
+        assert passwords.get("github") == Entry("github", "hubot", "pw3")
+        assert passwords.list(reveal="gitl*") == [
+            Entry("github", "hubot", "********"),
+            Entry("gitlab", "tanuki", "pw2"),
+        ]
+        assert [result.title for result in passwords.search("lab")] == ["gitlab"]
+
+        passwords.delete("gitlab")
+        assert passwords.titles() == ["github"]
+        with pytest.raises(EntryNotFoundError):
+            passwords.get("gitlab")
+        with pytest.raises(EntryNotFoundError):
+            passwords.update("gitlab", "tanuki", "pw")
+
+
+@pytest.fixture
+def locked_vault(vault, monkeypatch):
+    # No busy_timeout, so every blocked write goes through the retry loop.
+    monkeypatch.setenv("PM_BUSY_TIMEOUT", "0")
+    monkeypatch.setenv("PM_RETRY_DELAY", "0.01")
+    reset_settings()
+    reset_engine()
+    writer = sqlite3.connect(
+        vault / "app.db", isolation_level=None, check_same_thread=False
+    )
+    writer.execute("BEGIN IMMEDIATE")
+    yield writer
+    writer.close()
+
+
+def test_vault_write_retries_while_database_is_locked(locked_vault):
+    threading.Timer(0.05, locked_vault.execute, ["COMMIT"]).start()
+
+    with get_db_session() as db:
+        passwords = Vault.open(db)
+        passwords.create("github", "octocat", "pw1")
+        assert passwords.get("github") == Entry("github", "octocat", "pw1")
+
+
+def test_vault_write_gives_up_after_retries(locked_vault, monkeypatch):
+    monkeypatch.setenv("PM_WRITE_RETRIES", "2")
+    reset_settings()
+
+    with get_db_session() as db:
+        passwords = Vault.open(db)
+        with pytest.raises(DatabaseBusyError):
+            passwords.create("github", "octocat", "pw1")
+
+    locked_vault.execute("COMMIT")
+    with get_db_session() as db:
+        assert not Vault.open(db).exists("github")
+
+
+def test_vault_suggests_similar_titles(vault):
+    with get_db_session() as db:
+        passwords = Vault.open(db)
+        passwords.create("github", "octocat", "pw1")
+        passwords.create("gitlab", "tanuki", "pw2")
+
+        with pytest.raises(EntryNotFoundError) as error:
+            passwords.delete("githbu")
+        assert error.value.suggestions == ["github", "gitlab"]
+        assert str(error.value) == (
+            "Kein Passwort mit diesem Titel gefunden. Meintest du: github, gitlab?"
+        )
+        with pytest.raises(EntryNotFoundError) as error:
+            passwords.update("bank", "me", "pw")
+        assert error.value.suggestions == []
+
+        assert passwords.get("gtilab", fuzzy=True) == Entry("gitlab", "tanuki", "pw2")
+        with pytest.raises(EntryNotFoundError):
+            passwords.get("gtilab")
+
+
+def test_vault_update_is_a_single_statement(vault):
+    from sqlalchemy import event
+
+    statements = []
+
+    def record(connection, cursor, statement, *args):
+        statements.append(statement.split()[0].upper())
+
+    with get_db_session() as db:
+        passwords = Vault.open(db)
+        passwords.create("github", "octocat", "pw1")
+        engine = db.get_bind()
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            passwords.update("github", "hubot", "pw2")
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+
+    assert [name for name in statements if name != "BEGIN"] == ["UPDATE"]
+
+
+def test_vault_requires_login(vault):
+    remove_session()
+
+    with get_db_session() as db, pytest.raises(NotLoggedInError):
+        Vault.open(db)
+
+
+def test_async_vault(vault):
+    pytest.importorskip("aiosqlite")
+
+    session_factory = create_async_session_factory()
+
+    async def lookup(title):
+        # An AsyncSession must not be shared between concurrent tasks.
+        async with session_factory() as session:
+            return await (await AsyncVault.open(session)).get(title)
+
+    async def scenario():
+        async with session_factory() as session:
+            passwords = await AsyncVault.open(session)
+            await passwords.create("github", "octocat", "pw1")
+            await passwords.create("mail", "me", "pw2")
+            with pytest.raises(EntryExistsError):
+                await passwords.create("mail", "me", "pw2")
+            await passwords.update("mail", "me", "pw3")
+
+            lookups = await asyncio.gather(lookup("github"), lookup("mail"))
+            listed = await passwords.list(masked=True)
+            found = await passwords.search("git")
+            assert await passwords.get("githbu", fuzzy=True) == lookups[0]
+            with pytest.raises(EntryNotFoundError, match="Meintest du: github"):
+                await passwords.get("githbu")
+            await passwords.delete("github")
+            remaining = await passwords.exists("github")
+        await session_factory.kw["bind"].dispose()
+        return lookups, listed, found, remaining
+
+    lookups, listed, found, remaining = asyncio.run(scenario())
+
+    assert lookups == [Entry("github", "octocat", "pw1"), Entry("mail", "me", "pw3")]
+    assert [entry.password for entry in listed] == ["********", "********"]
+    assert [result.title for result in found] == ["github"]
+    assert remaining is False